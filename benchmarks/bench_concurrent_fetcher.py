@@ -0,0 +1,96 @@
+# -------------------------------------------------------------
+# NDN Hydra Concurrent Fetcher Benchmark
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+# Fetches a file through concurrent_fetcher over a simulated face, with a fixed semaphore and with
+# an AdaptiveWindow, under several loss and delay profiles.
+#
+# python benchmarks/bench_concurrent_fetcher.py --segments 1000
+
+import argparse
+import asyncio as aio
+import contextlib
+import io
+import logging
+import random
+import time
+from ndn.encoding import MetaInfo, NackReason
+from ndn.types import InterestNack, InterestTimeout
+from ndn_hydra.repo.utils.concurrent_fetcher import concurrent_fetcher, AdaptiveWindow
+
+SEGMENT_SIZE = 8000
+
+# delay (s), random loss, bottleneck rate (packets/s), bottleneck queue (packets), NACK on a full queue
+PROFILES = {
+    'clean, 20 ms': dict(delay=0.02, loss=0.0, rate=2000, queue=50, nack=False),
+    '1% loss, 20 ms': dict(delay=0.02, loss=0.01, rate=2000, queue=50, nack=False),
+    '5% loss, 50 ms': dict(delay=0.05, loss=0.05, rate=2000, queue=50, nack=False),
+    '200 ms delay': dict(delay=0.2, loss=0.0, rate=2000, queue=400, nack=False),
+    '500 pkt/s + NACKs, 20 ms': dict(delay=0.02, loss=0.0, rate=500, queue=8, nack=True),
+}
+
+
+class SimulatedFace:
+    """
+    Answers Interests like NDNApp.express_interest, through a bottleneck with a queue, a fixed
+    propagation delay and random loss. A full queue drops the Interest, or NACKs it for congestion.
+    """
+    def __init__(self, delay: float, loss: float, rate: float, queue: int, nack: bool):
+        self.delay, self.loss, self.rate, self.queue, self.nack = delay, loss, rate, queue, nack
+        self.next_free = 0.0
+
+    async def express_interest(self, name, lifetime=4000, **_kwargs):
+        now = time.monotonic()
+        start = max(now, self.next_free)
+        if (start - now) * self.rate > self.queue:
+            if self.nack:
+                await aio.sleep(self.delay / 2)
+                raise InterestNack(NackReason.CONGESTION)
+            await aio.sleep(lifetime / 1000)
+            raise InterestTimeout()
+        self.next_free = start + 1 / self.rate
+        rtt = (start - now) + self.delay
+        if random.random() < self.loss or rtt > lifetime / 1000:
+            await aio.sleep(lifetime / 1000)
+            raise InterestTimeout()
+        await aio.sleep(rtt)
+        return name, MetaInfo(), b'\x00' * SEGMENT_SIZE, b''
+
+
+async def fetch(face: SimulatedFace, semaphore, segments: int):
+    start = time.monotonic()
+    received = 0
+    async for _ in concurrent_fetcher(face, '/file', '/file', 0, segments - 1, semaphore):
+        received += 1
+    return received, time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='concurrent_fetcher benchmark over a simulated face')
+    parser.add_argument('--segments', type=int, default=1000, help='segments fetched per run')
+    parser.add_argument('--window', type=int, default=15, help='semaphore size, and initial adaptive window')
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    print(f'{"profile":<26}{"window":<22}{"segments":>10}{"time":>9}{"MB/s":>8}')
+    for profile, parameters in PROFILES.items():
+        for label in (f'Semaphore({args.window})', f'AdaptiveWindow({args.window})'):
+            random.seed(1)
+            if label.startswith('Semaphore'):
+                semaphore = aio.Semaphore(args.window)
+            else:
+                semaphore = AdaptiveWindow(initial_window=args.window)
+            # silence the progress bar
+            with contextlib.redirect_stderr(io.StringIO()):
+                received, duration = aio.run(fetch(SimulatedFace(**parameters), semaphore, args.segments))
+            throughput = received * SEGMENT_SIZE / 1e6 / duration
+            print(f'{profile:<26}{label:<22}{received:>10}{duration:>8.2f}s{throughput:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
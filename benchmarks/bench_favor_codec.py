@@ -0,0 +1,106 @@
+# -------------------------------------------------------------
+# NDN Hydra Favor Codec Benchmark
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+# Size, encode and decode time of the favor fields of a heartbeat and of a STORE message, as sent
+#   strings: by nodes of wire version 1, decimal strings only
+#   mixed:   by current nodes while the group has version 1 nodes, strings and packed doubles
+#   doubles: by current nodes once min_wire_version is pinned at 2 or later, packed doubles only
+# It also checks that what a current node sends to a mixed group still reads as strings.
+#
+# python benchmarks/bench_favor_codec.py --number 20000
+
+import argparse
+import timeit
+from ndn.encoding import Name, DecodeError
+from ndn_hydra.repo.modules.favor_calculator import FAVOR_WIRE_VERSION, PARAMETER_NAMES, WEIGHT_NAMES, \
+    encode_favor, decode_favor, encode_favor_parameters, encode_favor_weights
+from ndn_hydra.repo.group_messages.heartbeat import HeartbeatMessageTlv, HeartbeatMessage
+from ndn_hydra.repo.group_messages.store import StoreMessageTlv
+
+PARAMETERS = {'rtt': 0, 'num_users': 0, 'bandwidth': 0, 'network_cost': 0, 'storage_cost': 0,
+              'remaining_storage': 412345678901.0, 'rw_speed': 0}
+WEIGHTS = {'remaining_storage': 0.14, 'bandwidth': 0, 'rw_speed': 0}
+FAVOR = 57726794826
+
+ENCODINGS = ('strings', 'mixed', 'doubles')
+
+
+def encode_heartbeat(encoding: str) -> bytes:
+    wire_version = 1 if encoding != 'doubles' else FAVOR_WIRE_VERSION
+    message = HeartbeatMessageTlv()
+    message.node_name = b'/node1'
+    message.favor_parameters = encode_favor_parameters(PARAMETERS, wire_version)
+    message.favor_weights = encode_favor_weights(WEIGHTS, wire_version)
+    if encoding == 'strings':
+        # a version 1 node knows neither the packed values nor the wire version
+        message.favor_parameters.values = None
+        message.favor_weights.values = None
+    else:
+        message.wire_version = FAVOR_WIRE_VERSION
+    return bytes(message.encode())
+
+
+def encode_store(encoding: str) -> bytes:
+    message = StoreMessageTlv()
+    message.node_name = b'/node1'
+    message.file_name = Name.from_str('/some/file')
+    encode_favor(message, FAVOR, 1 if encoding != 'doubles' else FAVOR_WIRE_VERSION)
+    if encoding == 'strings':
+        message.favor_value = None
+    return bytes(message.encode())
+
+
+def decode_heartbeat(raw: bytes):
+    return HeartbeatMessage('/node1', 1, raw)
+
+
+def decode_store(raw: bytes):
+    return decode_favor(StoreMessageTlv.parse(raw))
+
+
+def check():
+    for encoding in ENCODINGS:
+        heartbeat = decode_heartbeat(encode_heartbeat(encoding)).message
+        assert heartbeat.favor_parameters == {name: float(value) for name, value in PARAMETERS.items()}, encoding
+        assert heartbeat.favor_weights == {name: float(value) for name, value in WEIGHTS.items()}, encoding
+        assert decode_store(encode_store(encoding)) == FAVOR, encoding
+    # a version 1 node reads the strings of what is sent to a mixed group
+    heartbeat = HeartbeatMessageTlv.parse(encode_heartbeat('mixed'))
+    for name in PARAMETER_NAMES:
+        assert float(bytes(getattr(heartbeat.favor_parameters, name))) == float(PARAMETERS[name]), name
+    for name in WEIGHT_NAMES:
+        assert float(bytes(getattr(heartbeat.favor_weights, name))) == float(WEIGHTS[name]), name
+    assert float(bytes(StoreMessageTlv.parse(encode_store('mixed')).favor)) == FAVOR
+    # a message with no favor at all is rejected as malformed
+    try:
+        decode_favor(StoreMessageTlv())
+    except DecodeError:
+        pass
+    else:
+        raise AssertionError('decoded a missing favor')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Favor codec benchmark')
+    parser.add_argument('--number', type=int, default=20000, help='encodes and decodes timed per message')
+    args = parser.parse_args()
+    check()
+
+    print(f'{"message":<12}{"encoding":<10}{"bytes":>8}{"encode":>12}{"decode":>12}')
+    for label, encode, decode in (('heartbeat', encode_heartbeat, decode_heartbeat),
+                                  ('STORE', encode_store, decode_store)):
+        for encoding in ENCODINGS:
+            raw = encode(encoding)
+            encode_time = timeit.timeit(lambda: encode(encoding), number=args.number) / args.number
+            decode_time = timeit.timeit(lambda: decode(raw), number=args.number) / args.number
+            print(f'{label:<12}{encoding:<10}{len(raw):>8}{encode_time * 1e6:>10.1f}us{decode_time * 1e6:>10.1f}us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+# -------------------------------------------------------------
+# NDN Hydra Global View Benchmark
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+# Compares the global view access paths on the same workload:
+#   per-statement: a connection opened, committed and closed for every statement (the original path)
+#   shared:        the same statements on one long-lived WAL connection
+#   GlobalView:    the current GlobalView
+#
+# python benchmarks/bench_global_view.py --files 10000
+
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from ndn_hydra.repo.modules.global_view import GlobalView
+
+SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS nodes (node_name TEXT PRIMARY KEY, favor REAL NOT NULL, "
+    "state_vector INTEGER NOT NULL, expired INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS files (file_name TEXT PRIMARY KEY, desired_copies INTEGER NOT NULL DEFAULT 3, "
+    "packets INTEGER NOT NULL DEFAULT 1, packet_size INTEGER NOT NULL DEFAULT 8800, size INTEGER NOT NULL, "
+    "origin_node_name TEXT NOT NULL, fetch_path TEXT NOT NULL, expiration_time INTEGER NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS stores (id INTEGER PRIMARY KEY, file_name TEXT NOT NULL, node_name NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS backups (id INTEGER PRIMARY KEY, file_name TEXT NOT NULL, node_name NOT NULL, "
+    "rank INTEGER NOT NULL, nonce TEXT NOT NULL)",
+]
+
+
+class PerStatement:
+    """
+    The original access path: every statement gets its own connection.
+    """
+    def __init__(self, db: str):
+        self.db = db
+        for sql in SCHEMA:
+            self.execute(sql)
+
+    def execute(self, sql, par=()):
+        conn = sqlite3.connect(self.db)
+        c = conn.cursor()
+        c.execute(sql, par)
+        conn.commit()
+        result = c.fetchall()
+        conn.close()
+        return result
+
+
+class Shared(PerStatement):
+    """
+    The same statements on one long-lived WAL connection.
+    """
+    def __init__(self, db: str):
+        self.conn = sqlite3.connect(db, cached_statements=256)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        super().__init__(db)
+
+    def execute(self, sql, par=()):
+        c = self.conn.cursor()
+        c.execute(sql, par)
+        self.conn.commit()
+        return c.fetchall()
+
+
+def populate_sql(view, files: int):
+    for i in range(files):
+        file_name = f'/file{i}'
+        view.execute("INSERT OR IGNORE INTO files (file_name, desired_copies, packets, packet_size, size, "
+                     "origin_node_name, fetch_path, expiration_time) VALUES (?, 3, 10, 8000, 80000, '/n0', '/c', 0)",
+                     (file_name,))
+        view.execute("DELETE FROM backups WHERE file_name = ?", (file_name,))
+        for rank, node_name in enumerate(('/n1', '/n2')):
+            view.execute("INSERT OR IGNORE INTO backups (file_name, node_name, rank, nonce) VALUES (?, ?, ?, 'x')",
+                         (file_name, node_name, rank))
+        view.execute("INSERT OR IGNORE INTO stores (file_name, node_name) VALUES (?, '/n0')", (file_name,))
+
+
+def get_files_sql(view):
+    # one query for the files, two per file for its stores and backups
+    files = view.execute("SELECT DISTINCT file_name, desired_copies, packets, size, origin_node_name, fetch_path, "
+                         "packet_size, expiration_time FROM files")
+    for file in files:
+        view.execute("SELECT DISTINCT node_name FROM stores WHERE file_name = ?", (file[0],))
+        view.execute("SELECT DISTINCT node_name, rank, nonce FROM backups WHERE file_name = ? ORDER BY rank",
+                     (file[0],))
+    return files
+
+
+def populate_global_view(global_view: GlobalView, files: int):
+    for i in range(files):
+        file_name = f'/file{i}'
+        global_view.add_file(file_name, 80000, '/n0', '/c', 8000, packets=10, desired_copies=3, expiration_time=0)
+        global_view.set_backups(file_name, [('/n1', 'x'), ('/n2', 'x')])
+        global_view.store_file(file_name, '/n0')
+    global_view.flush()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Global view access path benchmark')
+    parser.add_argument('--files', type=int, default=10000, help='files in the global view')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    print(f'{"path":<16}{"populate":>12}{"get_files":>12}')
+    for label, view_type in (('per-statement', PerStatement), ('shared', Shared)):
+        view = view_type(os.path.join(directory, f'{label}.db'))
+        populate = timed(populate_sql, view, args.files)
+        get_files = timed(get_files_sql, view)
+        print(f'{label:<16}{populate:>11.2f}s{get_files:>11.2f}s')
+
+    global_view = GlobalView(os.path.join(directory, 'global_view.db'))
+    populate = timed(populate_global_view, global_view, args.files)
+    get_files = timed(global_view.get_files)
+    print(f'{"GlobalView":<16}{populate:>11.2f}s{get_files:>11.2f}s')
+    global_view.close()
+
+
+if __name__ == '__main__':
+    main()
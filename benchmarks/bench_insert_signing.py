@@ -0,0 +1,94 @@
+# -------------------------------------------------------------
+# NDN Hydra Insert Signing Benchmark
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+# Segments a SegmentPublisher signs per second, on demand and with 1 to cores + 1 signing workers,
+# reading the segments in order as the repo would. Signs with a throwaway keychain in a temporary
+# home directory, so the user's keys are never touched.
+#
+# python benchmarks/bench_insert_signing.py --segments 2000
+
+import argparse
+import asyncio as aio
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+def setup_keychain(home: str):
+    # read_client_conf and the signing workers find the keychain through $HOME
+    os.environ['HOME'] = home
+    from ndn.client_conf import read_client_conf, default_keychain
+    from ndn.security import KeychainSqlite3
+    pib = os.path.join(home, '.ndn')
+    os.makedirs(pib)
+    KeychainSqlite3.initialize(os.path.join(pib, 'pib.db'), 'tpm-file', os.path.join(pib, 'ndnsec-key-file'))
+    config = read_client_conf()
+    keychain = default_keychain(config['pib'], config['tpm'])
+    keychain.touch_identity('/bench')
+    return keychain
+
+
+class App:
+    """
+    The part of NDNApp a SegmentPublisher uses.
+    """
+    def __init__(self, keychain):
+        from ndn.app import NDNApp
+        self.keychain = keychain
+        self.prepare_data = NDNApp.prepare_data.__get__(self)
+
+
+async def publish(keychain, path: str, segments: int, workers: int) -> float:
+    from ndn.encoding import Name
+    from ndn_hydra.client.functions.insert import SegmentPublisher, _init_signing_worker
+    executor = ProcessPoolExecutor(workers, initializer=_init_signing_worker) if workers else None
+    if executor is not None:
+        # start the processes before the clock does
+        list(executor.map(int, range(workers)))
+    publisher = SegmentPublisher(App(keychain), path, Name.from_str('/hydra/file'), Name.from_str('/client/file'),
+                                 executor=executor)
+    start = time.perf_counter()
+    publisher.start()
+    for seg_no in range(segments):
+        # wait for a segment signed ahead, unless the workers are done or gave up
+        while executor is not None and seg_no not in publisher.ready and seg_no not in publisher.packets \
+                and not publisher.signer_task.done():
+            await aio.sleep(0.0005)
+        publisher.get_packet(seg_no)
+    duration = time.perf_counter() - start
+    publisher.close()
+    if executor is not None:
+        executor.shutdown()
+    return duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Insert signing benchmark')
+    parser.add_argument('--segments', type=int, default=2000, help='segments in the published file')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    keychain = setup_keychain(os.path.join(directory, 'home'))
+    from ndn_hydra.client.functions.insert import SEGMENT_SIZE
+    path = os.path.join(directory, 'file')
+    with open(path, 'wb') as f:
+        f.write(os.urandom(SEGMENT_SIZE * args.segments))
+
+    cores = os.cpu_count() or 1
+    print(f'{cores} core(s)')
+    print(f'{"signing":<16}{"time":>9}{"segments/s":>12}')
+    for workers in range(0, cores + 2):
+        duration = aio.run(publish(keychain, path, args.segments, workers))
+        label = f'{workers} worker(s)' if workers else 'on demand'
+        print(f'{label:<16}{duration:>8.2f}s{args.segments / duration:>12.0f}')
+
+
+if __name__ == '__main__':
+    main()
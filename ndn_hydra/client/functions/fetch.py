@@ -8,14 +8,17 @@
 #  @Pip-Library:   https://pypi.org/project/ndn-hydra
 # -------------------------------------------------------------
 
-from asyncio import Semaphore
 import logging
+import struct
 import time
 from ndn.app import NDNApp
 from ndn.encoding import FormalName, Component, Name, ContentType
 import os
 from ndn_hydra.client.functions.query import HydraQueryClient
-from ndn_hydra.repo.utils.concurrent_fetcher import concurrent_fetcher
+from ndn_hydra.repo.utils.striped_fetcher import striped_fetcher
+
+BITMAP_HEADER = struct.Struct('!QQQ')  # size, packets, packet_size
+BITMAP_FLUSH_INTERVAL = 64  # segments received between two writes of the sidecar bitmap
 
 
 class HydraFetchClient(object):
@@ -57,33 +60,100 @@ class HydraFetchClient(object):
         if not target_file:
             print("Distribution Repo does not have that file.")
             return
-        source_repo = target_file["stores"][0]
         name_at_repo = name_at_repo[:-1]
-        start_index = 0
-        end_index = target_file["packets"] - 1
-        forwarding_hint = [(1, Name.to_str(self.repo_prefix) + source_repo + Name.to_str(file_name))]
-        b_array = bytearray()
+        packets, packet_size, size = target_file["packets"], target_file["packet_size"], target_file["size"]
+        forwarding_hints = [[(1, Name.to_str(self.repo_prefix) + source_repo + Name.to_str(file_name))]
+                            for source_repo in target_file["stores"]]
+
+        # Segments are written in place into a preallocated part file. A sidecar bitmap records
+        # which segments have landed, so an interrupted fetch resumes where it stopped.
+        part_filename = local_filename + '.part'
+        bitmap_filename = part_filename + '.bitmap'
+        header = BITMAP_HEADER.pack(size, packets, packet_size)
+        received = self._load_bitmap(bitmap_filename, header) if os.path.isfile(part_filename) else None
+        if received is None:
+            received = bytearray((packets + 7) // 8)
+        local_folder = os.path.dirname(local_filename)
+        if local_folder:
+            os.makedirs(local_folder, exist_ok=True)
 
-        # Fetch the file.
-        if start_index <= end_index:
-            async for (_, _, content, _, _) in concurrent_fetcher(self.app, name_at_repo, Name.from_str(local_filename), start_index, end_index, Semaphore(10), forwarding_hint=forwarding_hint):
-                b_array.extend(content)
+        try:
+            with open(part_filename, 'r+b' if os.path.isfile(part_filename) else 'w+b') as f:
+                f.truncate(size)
+                unsaved = 0
+                try:
+                    for start_index, end_index in self._missing_ranges(received, packets):
+                        async for (_, _, content, _, key) in striped_fetcher(self.app, name_at_repo, Name.from_str(local_filename), start_index, end_index, forwarding_hints, initial_window=10):
+                            seq = Component.to_number(key[-1])
+                            f.seek(seq * packet_size)
+                            f.write(content)
+                            received[seq >> 3] |= 1 << (seq & 7)
+                            unsaved += 1
+                            if unsaved >= BITMAP_FLUSH_INTERVAL:
+                                f.flush()
+                                self._save_bitmap(bitmap_filename, header, received)
+                                unsaved = 0
+                finally:
+                    f.flush()
+                    self._save_bitmap(bitmap_filename, header, received)
+        except Exception:
+            self._remove_part_files(part_filename, bitmap_filename)
+            raise
 
-        # After b_array is filled, sort out what to do with the data.
-        if len(b_array) > 0:
+        # After every segment is on disk, move the part file into place.
+        if packets > 0 and next(self._missing_ranges(received, packets), None) is None:
             print(f'Fetching completed, writing to file {local_filename}')
+            os.replace(part_filename, local_filename)
+            os.remove(bitmap_filename)
+            return name_at_repo
+        else:
+            self._remove_part_files(part_filename, bitmap_filename)
+            print("Client Fetch Command Failed.")
 
-            # Create folder hierarchy
-            local_folder = os.path.dirname(local_filename)
-            if local_folder:
-                os.makedirs(local_folder, exist_ok=True)
+    @staticmethod
+    def _missing_ranges(received: bytearray, packets: int):
+        """
+        Yield (start, end) of each run of segments not yet received.
+        """
+        start = None
+        for seq in range(packets):
+            if received[seq >> 3] & (1 << (seq & 7)):
+                if start is not None:
+                    yield start, seq - 1
+                    start = None
+            elif start is None:
+                start = seq
+        if start is not None:
+            yield start, packets - 1
 
-            # Write retrieved data to file
-            if os.path.isfile(local_filename) and overwrite:
-                os.remove(local_filename)
-            with open(local_filename, 'wb') as f:
-                f.write(b_array)
+    @staticmethod
+    def _load_bitmap(bitmap_filename: str, header: bytes):
+        """
+        Load the sidecar bitmap of a previous fetch, or None if it is missing or for another version of the file.
+        """
+        try:
+            with open(bitmap_filename, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if data[:len(header)] != header:
+            return None
+        return bytearray(data[len(header):])
 
-            return name_at_repo
-        else:
-            print("Client Fetch Command Failed.")
\ No newline at end of file
+    @staticmethod
+    def _remove_part_files(part_filename: str, bitmap_filename: str):
+        """
+        Remove the part file and its sidecar bitmap of a fetch that failed.
+        """
+        for filename in (part_filename, bitmap_filename, bitmap_filename + '.tmp'):
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _save_bitmap(bitmap_filename: str, header: bytes, received: bytearray):
+        tmp_filename = bitmap_filename + '.tmp'
+        with open(tmp_filename, 'wb') as f:
+            f.write(header + received)
+        os.replace(tmp_filename, bitmap_filename)
@@ -8,24 +8,191 @@
 #  @Pip-Library:   https://pypi.org/project/ndn-hydra
 # -------------------------------------------------------------
 
+import asyncio as aio
 import logging
+import mmap
+import os
 import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from ndn.app import NDNApp
-from ndn.encoding import Name, Component, FormalName
-from ndn_hydra.repo.protocol.base_models import InsertCommand, File
+from ndn.client_conf import read_client_conf, default_keychain
+from ndn.encoding import Name, Component, FormalName, MetaInfo, make_data
+from ndn_hydra.repo.protocol.base_models import InsertCommand, File, PacketFormats
 from ndn_hydra.repo.utils.pubsub import PubSub
 from ndn_hydra.client.functions.query import HydraQueryClient
 
 SEGMENT_SIZE = 8192
+MAX_PACKET_SIZE = 8800  # largest packet NFD forwards, NDNLPv2 only fragments below this
+PACKET_CACHE_SIZE = 256  # prepared packets kept for retransmissions
+SIGNING_BATCH_SIZE = 64  # segments a signing worker prepares per task
+
+_worker_signer = None
+
+
+def _init_signing_worker() -> None:
+    # each worker opens the default keychain, the same one NDNApp.prepare_data signs with
+    global _worker_signer
+    config = read_client_conf()
+    _worker_signer = default_keychain(config['pib'], config['tpm']).get_signer({})
+
+
+def _sign_segments(path: str, packet_prefix: FormalName, publish_prefix: FormalName, segment_size: int,
+                   final_block_id: bytes, first: int, last: int, direct: bool) -> list:
+    """
+    Prepare the packets of segments first to last (inclusive) in a signing worker.
+    """
+    packets = []
+    meta_info = MetaInfo(freshness_period=10000, final_block_id=final_block_id)
+    with open(path, "rb") as f:
+        f.seek(first * segment_size)
+        for seg_no in range(first, last + 1):
+            inner_packet = make_data(packet_prefix + [Component.from_segment(seg_no)], meta_info,
+                                     f.read(segment_size), signer=_worker_signer)
+            if direct:
+                packets.append(bytes(inner_packet))
+                continue
+            packets.append(bytes(make_data(publish_prefix + [Component.from_segment(seg_no)], meta_info,
+                                           inner_packet, signer=_worker_signer)))
+    return packets
+
+
+class SegmentPublisher(object):
+    def __init__(self, app: NDNApp, path: str, packet_prefix: FormalName, publish_prefix: FormalName,
+                 segment_size: int = SEGMENT_SIZE, cache_size: int = PACKET_CACHE_SIZE,
+                 executor: ProcessPoolExecutor = None, direct: bool = False) -> None:
+        """
+        Serves a file segment by segment, signing (and encapsulating) each segment only when it is
+        first requested. The file is memory-mapped, and only the last cache_size prepared packets
+        are kept, so memory stays flat regardless of the file size.
+        With an executor, segments are also signed ahead in batches across processes into a ready
+        cache of at most cache_size packets, which the interest handler drains.
+        :param app: NDNApp.
+        :param path: str. Path of the file to publish.
+        :param packet_prefix: FormalName. The prefix the inner packets are stored under in the repo.
+        :param publish_prefix: FormalName. The prefix the outer packets are published under.
+        :param segment_size: int. Bytes of file content per segment.
+        :param cache_size: int. Number of prepared packets to keep.
+        :param executor: ProcessPoolExecutor. Signing workers initialized with _init_signing_worker, or None.
+        :param direct: bool. If true, serve the inner packets as they are instead of wrapping them.
+        """
+        self.app = app
+        self.packet_prefix = packet_prefix
+        self.publish_prefix = publish_prefix
+        self.segment_size = segment_size
+        self.cache_size = cache_size
+        self.packets = OrderedDict()  # seg_no -> packet, least recently used first
+        self.ready = {}  # seg_no -> packet signed ahead, not served yet
+        self.drained = aio.Event()
+        self.executor = executor
+        self.direct = direct
+        self.signer_task = None
+        self.path = path
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        # mmap cannot map an empty file
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size > 0 else b''
+        self.seg_cnt = (self.size + segment_size - 1) // segment_size
+        self.final_block_id = Component.from_segment(max(self.seg_cnt - 1, 0))
+        self.served = bytearray((self.seg_cnt + 7) // 8)  # bitmap of segments already prepared for an interest
+
+    def get_packet(self, seg_no: int) -> bytes:
+        """
+        Return the packet of a segment, preparing it if it is not cached.
+        :param seg_no: int. Segment number, must be below seg_cnt.
+        """
+        packet = self.packets.get(seg_no)
+        if packet is not None:
+            self.packets.move_to_end(seg_no)
+            return packet
+        packet = self.ready.pop(seg_no, None)
+        if packet is not None:
+            self.drained.set()
+            self._cache(seg_no, packet)
+            return packet
+        inner_packet = self.app.prepare_data(self.packet_prefix + [Component.from_segment(seg_no)],
+                                             self.data[seg_no * self.segment_size:(seg_no + 1) * self.segment_size],
+                                             freshness_period=10000,
+                                             final_block_id=self.final_block_id)
+        if self.direct:
+            self._cache(seg_no, inner_packet)
+            return inner_packet
+        packet = self.app.prepare_data(self.publish_prefix + [Component.from_segment(seg_no)],
+                                       inner_packet,
+                                       freshness_period=10000,
+                                       final_block_id=self.final_block_id)
+        self._cache(seg_no, packet)
+        return packet
+
+    def start(self) -> None:
+        """
+        Start signing segments ahead of the interests, if an executor was given.
+        """
+        if self.executor is not None and self.seg_cnt > 0:
+            self.signer_task = aio.ensure_future(self._sign_ahead())
+
+    async def _sign_ahead(self) -> None:
+        loop = aio.get_event_loop()
+        workers = getattr(self.executor, '_max_workers', 1)
+        # keep every worker busy with two batches, but never run further ahead than that
+        ready_size = max(self.cache_size, 2 * workers * SIGNING_BATCH_SIZE)
+        pending = []
+        try:
+            for first in range(0, self.seg_cnt, SIGNING_BATCH_SIZE):
+                last = min(first + SIGNING_BATCH_SIZE, self.seg_cnt) - 1
+                while len(pending) >= 2 * workers or \
+                        len(self.ready) + SIGNING_BATCH_SIZE * (len(pending) + 1) > ready_size:
+                    if pending:
+                        self._collect(*(await pending.pop(0)))
+                    else:
+                        self.drained.clear()
+                        await self.drained.wait()
+                pending.append(self._submit(loop, first, last))
+            while pending:
+                self._collect(*(await pending.pop(0)))
+        except Exception as e:
+            # the interest handler still signs on demand
+            logging.warning(f'\nSigning workers failed, signing on demand: {e}')
+
+    def _submit(self, loop, first: int, last: int):
+        # name components may be memoryviews, which cannot be pickled
+        packet_prefix = [bytes(c) for c in self.packet_prefix]
+        publish_prefix = [bytes(c) for c in self.publish_prefix]
+
+        async def _run():
+            return first, await loop.run_in_executor(
+                self.executor, _sign_segments, self.path, packet_prefix, publish_prefix,
+                self.segment_size, bytes(self.final_block_id), first, last, self.direct)
+        return aio.ensure_future(_run())
+
+    def _collect(self, first: int, packets: list) -> None:
+        for seg_no, packet in enumerate(packets, first):
+            if not self.served[seg_no >> 3] & (1 << (seg_no & 7)):
+                self.ready[seg_no] = packet
+
+    def _cache(self, seg_no: int, packet: bytes) -> None:
+        self.served[seg_no >> 3] |= 1 << (seg_no & 7)
+        self.packets[seg_no] = packet
+        if len(self.packets) > self.cache_size:
+            self.packets.popitem(last=False)
+
+    def close(self) -> None:
+        if self.signer_task is not None:
+            self.signer_task.cancel()
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
 
 
 class HydraInsertClient(object):
-    def __init__(self, app: NDNApp, client_prefix: FormalName, repo_prefix: FormalName) -> None:
+    def __init__(self, app: NDNApp, client_prefix: FormalName, repo_prefix: FormalName, sign_workers: int = 1) -> None:
         """
         This client inserts data packets from the remote repo.
         :param app: NDNApp.
         :param client_prefix: NonStrictName. Routable name to client.
         :param repo_prefix: NonStrictName. Routable name to remote repo.
+        :param sign_workers: int. Processes signing segments ahead of the repo's interests. With one
+            (the default), no process pool is started and segments are only signed on demand.
         """
         self.app = app
         self.client_prefix = client_prefix
@@ -33,13 +200,30 @@ class HydraInsertClient(object):
         # Add a random component to the client prefix to avoid conflicts 
         # when multiple clients are running on the same host simultaneously
         self.pb = PubSub(self.app, self.client_prefix + [Component.from_str(str(int(time.time())))])
-        self.packets = []
+        self.publisher = None
+        self.sign_workers = sign_workers
+        self.executor = None
 
-    async def insert_file(self, file_name: FormalName, path: str) -> bool:
+    def close(self) -> None:
+        """
+        Stop publishing the last inserted file and shut the signing workers down.
+        """
+        if self.publisher:
+            self.publisher.close()
+            self.publisher = None
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+    async def insert_file(self, file_name: FormalName, path: str, segment_size: int = SEGMENT_SIZE,
+                          direct: bool = False) -> bool:
         """
         Insert a file associated with a file name to the remote repo
+        :param segment_size: int. Bytes of file content per packet, recorded per file by the repo.
+        :param direct: bool. Publish the repo packets themselves instead of wrapping each of them in
+            a packet under the client prefix. Halves the per-segment overhead but needs repo nodes
+            that understand the packet format field.
         """
-        size, seg_cnt = 0, 0
         # The prefix to be stored in the repo
         packet_prefix = self.repo_prefix + file_name
         # The prefix to be published from the client
@@ -54,40 +238,44 @@ class HydraInsertClient(object):
             return False
 
         tic = time.perf_counter()
-        with open(path, "rb") as f:
-            data = f.read()
-            size = len(data)
-            seg_cnt = (len(data) + SEGMENT_SIZE - 1) // SEGMENT_SIZE
-            final_block_id = Component.from_segment(seg_cnt - 1)
-            inner_packets = [self.app.prepare_data(packet_prefix + [Component.from_segment(i)],
-                                                  data[i * SEGMENT_SIZE:(i + 1) * SEGMENT_SIZE],
-                                                  freshness_period=10000,
-                                                  final_block_id=final_block_id)
-                            for i in range(seg_cnt)]
-            self.packets = [self.app.prepare_data(publish_prefix + [Component.from_segment(i)],
-                                                    packet,
-                                                    freshness_period=10000,
-                                                    final_block_id=final_block_id)
-                            for i, packet in enumerate(inner_packets)]
-
-        print(f'\nCreated {seg_cnt} chunks under name {Name.to_str(publish_prefix)}')
+        if self.publisher:
+            self.publisher.close()
+        if self.executor is None and self.sign_workers > 1:
+            self.executor = ProcessPoolExecutor(self.sign_workers, initializer=_init_signing_worker)
+        self.publisher = publisher = SegmentPublisher(self.app, path, packet_prefix, publish_prefix,
+                                                      segment_size=segment_size, executor=self.executor,
+                                                      direct=direct)
+        size, seg_cnt = publisher.size, publisher.seg_cnt
+        if seg_cnt > 0 and len(publisher.get_packet(0)) > MAX_PACKET_SIZE:
+            print(f'Segment size {segment_size} makes packets larger than {MAX_PACKET_SIZE} bytes, aborted insertion.')
+            publisher.close()
+            self.publisher = None
+            return False
+        publisher.start()
+
+        print(f'\nPublishing {seg_cnt} chunks under name {Name.to_str(publish_prefix)}')
 
         def on_interest(int_name, _int_param, _app_param):
             seg_no = Component.to_number(int_name[-1]) if Component.get_type(
                 int_name[-1]) == Component.TYPE_SEGMENT else 0
             if seg_no < seg_cnt:
-                self.app.put_raw_packet(self.packets[seg_no])
+                self.app.put_raw_packet(publisher.get_packet(seg_no))
             if seg_no == (seg_cnt - 1):
                 toc = time.perf_counter()
                 print(f"The publication is complete! - total time (with disk): {toc - tic:0.4f} secs")
 
         self.app.route(publish_prefix)(on_interest)
+        if direct:
+            # Repo nodes ask for the repo names with the client prefix as forwarding hint
+            self.app.set_interest_filter(packet_prefix, on_interest)
 
         file = File()
         file.file_name = file_name
         file.packets = seg_cnt
-        file.packet_size = SEGMENT_SIZE
+        file.packet_size = segment_size
         file.size = size
+        if direct:
+            file.packet_format = PacketFormats.DIRECT
         cmd = InsertCommand()
         cmd.file = file
         cmd.fetch_path = publish_prefix
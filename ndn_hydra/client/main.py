@@ -18,6 +18,7 @@ import os
 import time
 import pkg_resources
 from ndn_hydra.client.functions import *
+from ndn_hydra.client.functions.insert import SEGMENT_SIZE
 
 
 def parse_hydra_cmd_opts() -> Namespace:
@@ -43,11 +44,15 @@ def parse_hydra_cmd_opts() -> Namespace:
                 print("  -v, --version                   |   shows the current version and exits.")
                 print("")
                 print("* function 'insert':")
-                print("     usage: ndn-hydra-client insert -r REPO -f FILENAME -p PATH [-c COPIES]")
+                print("     usage: ndn-hydra-client insert -r REPO -f FILENAME -p PATH [-c COPIES] [-s SIZE] [-d] [-j WORKERS]")
                 print("     required args:")
                 print("        -r, --repoprefix REPO     |   a proper name of the repo prefix.")
                 print("        -f, --filename FILENAME   |   a proper name for the input file.")
                 print("        -p, --path PATH           |   path of the file desired to be the input i.e. input path.")
+                print("     optional args:")
+                print("        -s, --segment_size SIZE   |   bytes of file content per packet, default 8192.")
+                print("        -d, --direct              |   publish repo packets directly instead of encapsulated.")
+                print("        -j, --sign_workers WORKERS|   processes signing segments ahead, default 1 (on demand).")
                 print("")
                 print("* function 'delete':")
                 print("     usage: ndn-hydra-client delete -r REPO -f FILENAME")
@@ -86,6 +91,9 @@ def parse_hydra_cmd_opts() -> Namespace:
     insertsp.add_argument("-p","--path",action="store",dest="path",required=True)
     insertsp.add_argument("-w","--wait",action="store",dest="wait",required=True)
     insertsp.add_argument("-c","--client_prefix",action="store",dest="client_prefix",default="/client1", required=False)
+    insertsp.add_argument("-s","--segment_size",action="store",dest="segment_size",type=int,default=SEGMENT_SIZE, required=False)
+    insertsp.add_argument("-d","--direct",action="store_true",dest="direct",default=False, required=False)
+    insertsp.add_argument("-j","--sign_workers",action="store",dest="sign_workers",type=int,default=1, required=False)
 
     deletesp = subparsers.add_parser('delete',add_help=False)
     deletesp.add_argument("-r","--repoprefix",action="store",dest="repo",required=True)
@@ -121,14 +129,17 @@ def parse_hydra_cmd_opts() -> Namespace:
 
 
 class HydraClient:
-    def __init__(self, app: NDNApp, client_prefix: FormalName, repo_prefix: FormalName) -> None:
-        self.cinsert = HydraInsertClient(app, client_prefix, repo_prefix)
+    def __init__(self, app: NDNApp, client_prefix: FormalName, repo_prefix: FormalName, sign_workers: int = 1) -> None:
+        self.cinsert = HydraInsertClient(app, client_prefix, repo_prefix, sign_workers)
         self.cdelete = HydraDeleteClient(app, client_prefix, repo_prefix)
         self.cfetch = HydraFetchClient(app, client_prefix, repo_prefix)
         self.cquery = HydraQueryClient(app, client_prefix, repo_prefix)
 
-    async def insert(self, file_name: FormalName, path: str) -> bool:
-        return await self.cinsert.insert_file(file_name, path)
+    async def insert(self, file_name: FormalName, path: str, segment_size: int = SEGMENT_SIZE, direct: bool = False) -> bool:
+        return await self.cinsert.insert_file(file_name, path, segment_size, direct)
+
+    def close(self) -> None:
+        self.cinsert.close()
 
     async def delete(self, file_name: FormalName) -> bool:
         return await self.cdelete.delete_file(file_name)
@@ -144,15 +155,16 @@ async def run_hydra_client(app: NDNApp, args: Namespace) -> None:
     repo_prefix = Name.from_str(args.repo)
     client_prefix = Name.from_str(args.client_prefix)
     filename = None
-    client = HydraClient(app, client_prefix, repo_prefix)
+    client = HydraClient(app, client_prefix, repo_prefix, getattr(args, 'sign_workers', 1))
 
     if args.function != "query":
         filename = Name.from_str(args.filename)
 
     if args.function == "insert":
-        await client.insert(filename, args.path)
+        await client.insert(filename, args.path, args.segment_size, args.direct)
         print("\nClient finished Insert Command!")
         await asyncio.sleep(float(args.wait))
+        client.close()
     elif args.function == "delete":
         tic = time.perf_counter()
         await client.delete(filename)
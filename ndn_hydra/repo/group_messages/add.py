@@ -13,13 +13,15 @@ from ndn.encoding import *
 import time
 from ndn.storage import Storage
 from ndn_hydra.repo.modules.global_view import GlobalView
+from ndn_hydra.repo.modules.favor_calculator import decode_favor
 from ndn_hydra.repo.group_messages.specific_message import SpecificMessage
-from ndn_hydra.repo.protocol.base_models import File
+from ndn_hydra.repo.protocol.base_models import File, PacketFormats
 
 
 class AddMessageTypes:
     NODE_NAME = 84
     FAVOR = 86
+    FAVOR_VALUE = 88  # even: nodes that do not know it skip it
 
     FILE = 91
     DESIRED_COPIES = 92
@@ -50,6 +52,7 @@ class AddMessageTlv(TlvModel):
     is_stored_by_origin = UintField(AddMessageTypes.IS_STORED_BY_ORIGIN)
     expiration_time = UintField(AddMessageTypes.EXPIRATION_DATE)
     backup_list = RepeatedField(ModelField(AddMessageTypes.BACKUP, BackupTlv))
+    favor_value = BytesField(AddMessageTypes.FAVOR_VALUE)
 
 
 class AddMessage(SpecificMessage):
@@ -59,12 +62,13 @@ class AddMessage(SpecificMessage):
 
     async def apply(self, global_view: GlobalView, data_storage: Storage, fetch_file: Callable, svs, config):
         node_name = self.message.node_name.tobytes().decode()
-        favor = float(self.message.favor.tobytes().decode())
+        favor = decode_favor(self.message)
         file = self.message.file
         file_name = Name.to_str(file.file_name)
         packets = file.packets
         packet_size = file.packet_size
         size = file.size
+        packet_format = file.packet_format if file.packet_format is not None else PacketFormats.ENCAPSULATED
         desired_copies = self.message.desired_copies
         fetch_path = self.message.fetch_path.prefix
         is_stored_by_origin = False if (self.message.is_stored_by_origin == 0) else True
@@ -78,37 +82,38 @@ class AddMessage(SpecificMessage):
 
         self.logger.info(f"\n[MSG][ADD]      nam={node_name};fil={file_name};cop={desired_copies};pck={packets};pck_size={packet_size};siz={size};bak={bak};exp={expiration_time}")
 
-        global_view.add_file(
-            file_name,
-            size,
-            node_name,
-            Name.to_str(fetch_path),
-            packet_size,
-            packets=packets,
-            desired_copies=desired_copies,
-            expiration_time=expiration_time,
-        )
-
-        global_view.set_backups(file_name, backup_list)
-
-        # get pending stores
-        copies_needed = desired_copies
-        pending_stores = global_view.get_pending_stores(file_name)
-        for pending_store in pending_stores:
-            global_view.store_file(file_name, pending_store)
-            copies_needed -= 1
-
-        # if I need to store this file
-        # if is_stored_by_origin:
-        #     copies_needed -= 1
-        need_to_store = False
-        for i in range(copies_needed):
-            backup = backup_list[i]
-            if backup[0] == config['node_name']:
-                need_to_store = True
-                break
-        if need_to_store:
-            fetch_file(file_name, packets, packet_size, Name.to_str(fetch_path))
-
-        # update session
-        global_view.update_node(node_name, favor, self.seqno)
+        with global_view.batch():
+            global_view.add_file(
+                file_name,
+                size,
+                node_name,
+                Name.to_str(fetch_path),
+                packet_size,
+                packets=packets,
+                desired_copies=desired_copies,
+                expiration_time=expiration_time,
+            )
+
+            global_view.set_backups(file_name, backup_list)
+
+            # get pending stores
+            copies_needed = desired_copies
+            pending_stores = global_view.get_pending_stores(file_name)
+            for pending_store in pending_stores:
+                global_view.store_file(file_name, pending_store)
+                copies_needed -= 1
+
+            # if I need to store this file
+            # if is_stored_by_origin:
+            #     copies_needed -= 1
+            need_to_store = False
+            for i in range(copies_needed):
+                backup = backup_list[i]
+                if backup[0] == config['node_name']:
+                    need_to_store = True
+                    break
+            if need_to_store:
+                fetch_file(file_name, packets, packet_size, Name.to_str(fetch_path), packet_format)
+
+            # update session
+            global_view.update_node(node_name, favor, self.seqno)
@@ -13,7 +13,8 @@ from ndn.encoding import *
 import json
 import struct
 from ndn_hydra.repo.modules.global_view import GlobalView
-from ndn_hydra.repo.modules.favor_calculator import FavorCalculator, FavorParameters, FavorWeights
+from ndn_hydra.repo.modules.favor_calculator import FavorCalculator, FavorParameters, FavorWeights, \
+    decode_favor_parameters, decode_favor_weights
 from ndn_hydra.repo.group_messages.specific_message import SpecificMessage
 
 
@@ -21,12 +22,14 @@ class HeartbeatMessageTypes:
     NODE_NAME = 84
     FAVOR_PARAMETERS = 85
     FAVOR_WEIGHTS = 86
+    WIRE_VERSION = 88  # even: nodes that do not know it skip it
 
 
 class HeartbeatMessageTlv(TlvModel):
     node_name = BytesField(HeartbeatMessageTypes.NODE_NAME)
     favor_parameters = ModelField(HeartbeatMessageTypes.FAVOR_PARAMETERS, FavorParameters)
     favor_weights = ModelField(HeartbeatMessageTypes.FAVOR_WEIGHTS, FavorWeights)
+    wire_version = UintField(HeartbeatMessageTypes.WIRE_VERSION)  # group wire version, absent means 1
 
 
 class HeartbeatMessage(SpecificMessage):
@@ -38,25 +41,11 @@ class HeartbeatMessage(SpecificMessage):
 
     @staticmethod
     def decode_favor_weights(favor_weights):
-        decoded_weights = {
-            'remaining_storage': float(bytes(favor_weights.remaining_storage)),
-            'bandwidth': float(bytes(favor_weights.bandwidth)),
-            'rw_speed': float(bytes(favor_weights.rw_speed))
-        }
-        return decoded_weights
+        return decode_favor_weights(favor_weights)
 
     @staticmethod
     def decode_favor_parameters(favor_parameters):
-        decoded_params = {
-            'rtt': float(bytes(favor_parameters.rtt)),
-            'num_users': float(bytes(favor_parameters.num_users)),
-            'bandwidth': float(bytes(favor_parameters.bandwidth)),
-            'network_cost': float(bytes(favor_parameters.network_cost)),
-            'storage_cost': float(bytes(favor_parameters.storage_cost)),
-            'remaining_storage': float(bytes(favor_parameters.remaining_storage)),
-            'rw_speed': float(bytes(favor_parameters.rw_speed))
-        }
-        return decoded_params
+        return decode_favor_parameters(favor_parameters)
 
     async def apply(self, global_view, data_storage, fetch_file, svs, config):
         node_name = self.message.node_name.tobytes().decode()
@@ -69,4 +58,7 @@ class HeartbeatMessage(SpecificMessage):
         self.logger.debug(f"\n[MSG][HB]   "
                           f"\n\tNode Name={node_name};"
                           f"\n\tfavor={favor}")
-        global_view.update_node(node_name, favor, self.seqno)
+        with global_view.batch():
+            global_view.update_node(node_name, favor, self.seqno)
+            global_view.update_node_load(node_name, favor_parameters)
+            global_view.update_node_wire_version(node_name, self.message.wire_version or 1)
@@ -10,8 +10,10 @@
 
 from __future__ import annotations
 
+import asyncio as aio
+import logging
 from ndn.encoding import *
-from typing import Optional
+from typing import Dict, List, Optional
 from ndn_hydra.repo.protocol.tlv import HydraTlvTypes
 from ndn_hydra.repo.group_messages.specific_message import SpecificMessage
 from ndn_hydra.repo.group_messages.add import AddMessage
@@ -29,6 +31,17 @@ class MessageTypes:
     STORE = 4
     CLAIM = 5
     HEARTBEAT = 6
+    BATCH = 7
+
+
+BATCH_MAX_BYTES = 7000  # a batch stays within one SVS data packet
+BATCH_WIRE_VERSION = 3  # group wire version from which nodes read BatchMessages
+
+# group wire version this node advertises in its heartbeats:
+# 1: favors travel as decimal strings.
+# 2: favors also travel as doubles, and only as doubles once the whole group reads them (FAVOR_WIRE_VERSION).
+# 3: group messages may travel together in a BatchMessage (BATCH_WIRE_VERSION).
+GROUP_WIRE_VERSION = 3
 
 
 class Message(TlvModel):
@@ -51,5 +64,113 @@ class Message(TlvModel):
             return ClaimMessage(nid, seqno, message_bytes)
         elif message_type == MessageTypes.HEARTBEAT:
             return HeartbeatMessage(nid, seqno, message_bytes)
+        elif message_type == MessageTypes.BATCH:
+            return BatchMessage(nid, seqno, message_bytes)
+        else:
+            return None
+
+
+class BatchMessageTlv(TlvModel):
+    messages = RepeatedField(BytesField(HydraTlvTypes.BATCHED_MESSAGE))  # encoded Message
+
+
+class BatchMessage(SpecificMessage):
+    """
+    Several group messages published as one SVS publication, applied in the order they were batched.
+    """
+    def __init__(self, nid: str, seqno: int, raw_bytes: bytes):
+        super(BatchMessage, self).__init__(nid, seqno)
+        self.message = BatchMessageTlv.parse(raw_bytes)
+
+    async def apply(self, global_view, data_storage, fetch_file, svs, config):
+        messages = self.message.messages or []
+        self.logger.debug(f"\n[MSG][BATCH]    nid={self.nid};seq={self.seqno};messages={len(messages)}")
+        for message_bytes in messages:
+            message = Message.specify(self.nid, self.seqno, bytes(message_bytes))
+            if message is None or isinstance(message, BatchMessage):
+                continue
+            await message.apply(global_view, data_storage, fetch_file, svs, config)
+
+
+class MessageBatcher:
+    """
+    Publishes group messages to SVS, holding them for up to window_ms so that those produced
+    close together go out as one BatchMessage, with one sync update and one signature.
+    Nodes that predate BatchMessages drop them, so messages are only batched while the group
+    wire version (see GlobalView.get_wire_version) is at least BATCH_WIRE_VERSION.
+    Has SVSync's publishData, so it can be handed wherever messages are published.
+    """
+    def __init__(self, svs, window_ms: int, max_messages: int, max_bytes: int = BATCH_MAX_BYTES,
+                 global_view=None):
+        """
+        :param svs: SVSync.
+        :param window_ms: int. How long a message may wait for others, 0 publishes every message on its own.
+        :param max_messages: int. Messages per publication.
+        :param max_bytes: int. Encoded size of the messages of one publication.
+        :param global_view: Global View, knowing the wire version of the group. Without it, messages are batched.
+        """
+        self.svs = svs
+        self.global_view = global_view
+        self.window_ms = window_ms
+        self.max_messages = max_messages
+        self.max_bytes = max_bytes
+        self.pending: List[bytes] = []
+        self.pending_bytes = 0
+        self.timer = None
+        self.messages = 0
+        self.publications = 0
+        self.logger = logging.getLogger()
+
+    def publishData(self, message_bytes: bytes):
+        """
+        :param message_bytes: bytes. An encoded Message.
+        """
+        self.messages += 1
+        if self.window_ms <= 0 or self.max_messages <= 1 or not self._can_batch():
+            self._publish(message_bytes)
+            return
+        if self.pending and self.pending_bytes + len(message_bytes) > self.max_bytes:
+            self.flush()
+        self.pending.append(bytes(message_bytes))
+        self.pending_bytes += len(message_bytes)
+        if len(self.pending) >= self.max_messages:
+            self.flush()
+        elif self.timer is None:
+            self.timer = aio.get_event_loop().call_later(self.window_ms / 1000.0, self.flush)
+
+    def flush(self):
+        """
+        Publish the messages held so far.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending:
+            return
+        if len(self.pending) == 1 or not self._can_batch():
+            # a lone message goes out as it is, and so does each while some node cannot read a batch
+            for message_bytes in self.pending:
+                self._publish(message_bytes)
         else:
-            return None
\ No newline at end of file
+            batch = BatchMessageTlv()
+            batch.messages = self.pending
+            message = Message()
+            message.type = MessageTypes.BATCH
+            message.value = batch.encode()
+            self._publish(message.encode())
+        self.pending = []
+        self.pending_bytes = 0
+
+    def _can_batch(self) -> bool:
+        return self.global_view is None or self.global_view.get_wire_version() >= BATCH_WIRE_VERSION
+
+    def _publish(self, message_bytes: bytes):
+        self.svs.publishData(message_bytes)
+        self.publications += 1
+
+    def metrics(self) -> Dict:
+        return {
+            'messages': self.messages,
+            'publications': self.publications,
+            'pending': len(self.pending),
+        }
\ No newline at end of file
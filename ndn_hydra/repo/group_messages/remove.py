@@ -12,6 +12,7 @@ import asyncio as aio
 from typing import Callable
 from ndn.encoding import *
 from ndn_hydra.repo.modules.global_view import GlobalView
+from ndn_hydra.repo.modules.favor_calculator import decode_favor
 from ndn_hydra.repo.group_messages.specific_message import SpecificMessage
 from ndn_hydra.repo.modules.file_remover import remove_file
 
@@ -19,12 +20,14 @@ from ndn_hydra.repo.modules.file_remover import remove_file
 class RemoveMessageTypes:
     NODE_NAME = 84
     FAVOR = 86
+    FAVOR_VALUE = 88  # even: nodes that do not know it skip it
 
 
 class RemoveMessageTlv(TlvModel):
     node_name = BytesField(RemoveMessageTypes.NODE_NAME)
     favor = BytesField(RemoveMessageTypes.FAVOR)
     file_name = NameField()
+    favor_value = BytesField(RemoveMessageTypes.FAVOR_VALUE)
 
 
 class RemoveMessage(SpecificMessage):
@@ -38,14 +41,15 @@ class RemoveMessage(SpecificMessage):
 
         self.logger.info(f"\n[MSG][REMOVE]   "
                          f"\n\tFile name={file_name}")
-        file = global_view.get_file(file_name)
-        if not file:
-            self.logger.warning('nothing to remove')
-        else:
-            # Delete from global view
-            global_view.delete_file(file_name)
-            # Remove from data_storage from this node if present
-            if config['node_name'] in file['stores']:
-                remove_file(data_storage, file, config)
-
-        global_view.update_node(node_name, float(self.message.favor.tobytes().decode()), self.seqno)
+        with global_view.batch():
+            file = global_view.get_file(file_name)
+            if not file:
+                self.logger.warning('nothing to remove')
+            else:
+                # Delete from global view
+                global_view.delete_file(file_name)
+                # Remove from data_storage from this node if present
+                if config['node_name'] in file['stores']:
+                    remove_file(data_storage, file, config)
+
+            global_view.update_node(node_name, decode_favor(self.message), self.seqno)
@@ -13,5 +13,9 @@ import logging
 
 
 class SpecificMessage:
+    """
+    A group message of one type. Its apply() makes its global view mutations within one
+    global_view.batch(), so they are journaled together, and never awaits within that scope.
+    """
     def __init__(self, nid:str, seqno:int) -> None:
         self.nid, self.seqno, self.logger = nid, seqno, logging.getLogger()
\ No newline at end of file
@@ -12,17 +12,20 @@ from typing import Callable
 from ndn.encoding import *
 from ndn_hydra.repo.group_messages.specific_message import SpecificMessage
 from ndn_hydra.repo.modules.global_view import GlobalView
+from ndn_hydra.repo.modules.favor_calculator import decode_favor
 
 
 class StoreMessageTypes:
     NODE_NAME = 84
     FAVOR = 86
+    FAVOR_VALUE = 88  # even: nodes that do not know it skip it
 
 
 class StoreMessageTlv(TlvModel):
     node_name = BytesField(StoreMessageTypes.NODE_NAME)
     favor = BytesField(StoreMessageTypes.FAVOR)
     file_name = NameField()
+    favor_value = BytesField(StoreMessageTypes.FAVOR_VALUE)
 
 
 class StoreMessage(SpecificMessage):
@@ -37,11 +40,12 @@ class StoreMessage(SpecificMessage):
         self.logger.info(f"\n[MSG][STORE]    "
                          f"\n\tNode name={node_name};"
                          f"\n\tFile name={file_name}")
-        file = global_view.get_file(file_name)
-        if not file:
-            self.logger.warning('\n*** Add to pending store')
-            global_view.add_pending_store(file_name, node_name)
-        else:
-            global_view.store_file(file_name, node_name)
-
-        global_view.update_node(node_name, float(self.message.favor.tobytes().decode()), self.seqno)
+        with global_view.batch():
+            file = global_view.get_file(file_name)
+            if not file:
+                self.logger.warning('\n*** Add to pending store')
+                global_view.add_pending_store(file_name, node_name)
+            else:
+                global_view.store_file(file_name, node_name)
+
+            global_view.update_node(node_name, decode_favor(self.message), self.seqno)
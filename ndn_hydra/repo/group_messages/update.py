@@ -11,12 +11,14 @@
 from typing import Callable
 from ndn.encoding import *
 from ndn_hydra.repo.modules.global_view import GlobalView
+from ndn_hydra.repo.modules.favor_calculator import decode_favor
 from ndn_hydra.repo.group_messages.specific_message import SpecificMessage
 
 
 class UpdateMessageTypes:
     NODE_NAME = 84
     FAVOR = 86
+    FAVOR_VALUE = 88  # even: nodes that do not know it skip it
     EXPIRATION_DATE = 95
 
 
@@ -25,6 +27,7 @@ class UpdateMessageTlv(TlvModel):
     favor = BytesField(UpdateMessageTypes.FAVOR)
     file_name = NameField()
     expiration_time = UintField(UpdateMessageTypes.EXPIRATION_DATE)
+    favor_value = BytesField(UpdateMessageTypes.FAVOR_VALUE)
 
 
 class UpdateMessage(SpecificMessage):
@@ -39,10 +42,11 @@ class UpdateMessage(SpecificMessage):
 
         self.logger.info(f"\n[MSG][UPDATE]   "
                          f"\n\tFile name={file_name}")
-        file = global_view.get_file(file_name)
-        if not file:
-            self.logger.warning('\n*** Nothing to update')
-        else:
-            global_view.update_file(file_name, expiration_time)
-
-        global_view.update_node(node_name, float(self.message.favor.tobytes().decode()), self.seqno)
+        with global_view.batch():
+            file = global_view.get_file(file_name)
+            if not file:
+                self.logger.warning('\n*** Nothing to update')
+            else:
+                global_view.update_file(file_name, expiration_time)
+
+            global_view.update_node(node_name, decode_favor(self.message), self.seqno)
@@ -11,3 +11,4 @@ from .query_handle import QueryHandle
 from .protocol_handle_base import ProtocolHandle
 from .insert_command_handle import InsertCommandHandle
 from .delete_command_handle import DeleteCommandHandle
+from .snapshot_handle import SnapshotHandle
@@ -21,6 +21,7 @@ from ndn_hydra.repo.main.main_loop import MainLoop
 from ndn_hydra.repo.handles.protocol_handle_base import ProtocolHandle
 from ndn_hydra.repo.modules.global_view import GlobalView
 from ndn_hydra.repo.modules.file_remover import remove_file
+from ndn_hydra.repo.modules.favor_calculator import encode_favor
 
 
 class DeleteCommandHandle(ProtocolHandle):
@@ -90,12 +91,12 @@ class DeleteCommandHandle(ProtocolHandle):
         favor = self.global_view.get_node(self.config['node_name'])['favor']
         remove_message = RemoveMessageTlv()
         remove_message.node_name = self.config['node_name'].encode()
-        remove_message.favor = str(favor).encode()
+        encode_favor(remove_message, favor, self.global_view.get_wire_version())
         remove_message.file_name = cmd.file_name
         # remove msg
         message = Message()
         message.type = MessageTypes.REMOVE
         message.value = remove_message.encode()
 
-        self.main_loop.svs.publishData(message.encode())
+        self.main_loop.publisher.publishData(message.encode())
         self.logger.info(f"\n[MSG][REMOVE]*  file={file_name}")
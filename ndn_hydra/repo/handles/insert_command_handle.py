@@ -17,13 +17,13 @@ from ndn.app import NDNApp
 from ndn.encoding import Name, NonStrictName, Component, DecodeError
 from ndn.storage import Storage
 from ndn_hydra.repo.handles.protocol_handle_base import ProtocolHandle
-from ndn_hydra.repo.protocol.base_models import InsertCommand, File
+from ndn_hydra.repo.protocol.base_models import InsertCommand, File, PacketFormats
 from ndn_hydra.repo.utils.pubsub import PubSub
 from ndn_hydra.repo.modules.global_view import GlobalView
 from ndn_hydra.repo.group_messages.add import FetchPathTlv, BackupTlv, AddMessageTlv
 from ndn_hydra.repo.group_messages.message import Message, MessageTypes
 from ndn_hydra.repo.main.main_loop import MainLoop
-from ndn_hydra.repo.modules.favor_calculator import FavorCalculator
+from ndn_hydra.repo.modules.favor_calculator import FavorCalculator, encode_favor
 from ndn_hydra.repo.modules.read_remaining_space import get_remaining_space
 
 
@@ -83,6 +83,7 @@ class InsertCommandHandle(ProtocolHandle):
         packets = cmd.file.packets
         packet_size = cmd.file.packet_size
         size = cmd.file.size
+        packet_format = cmd.file.packet_format if cmd.file.packet_format is not None else PacketFormats.ENCAPSULATED
         fetch_path = cmd.fetch_path
         expiration_time = int(time.time() + (self.config['file_expiration'] * 60 * 60))  # convert hours to seconds
         # Set file to not expire if file_expiration in config is set to 0
@@ -143,7 +144,7 @@ class InsertCommandHandle(ProtocolHandle):
         )
         if pickself:
             # self.global_view.store_file(insertion_id, self.config['session_id'])
-            self.main_loop.fetch_file_from_client(file_name, packets, packet_size, Name.to_str(fetch_path))
+            self.main_loop.fetch_file_from_client(file_name, packets, packet_size, Name.to_str(fetch_path), packet_format)
 
         self.global_view.set_backups(file_name, backup_list)
 
@@ -151,12 +152,14 @@ class InsertCommandHandle(ProtocolHandle):
         favor = self.global_view.get_node(self.config['node_name'])['favor']
         add_message = AddMessageTlv()
         add_message.node_name = self.config['node_name'].encode()
-        add_message.favor = str(favor).encode()
+        encode_favor(add_message, favor, self.global_view.get_wire_version())
         add_message.file = File()
         add_message.file.file_name = cmd.file.file_name
         add_message.file.packets = packets
         add_message.file.packet_size = packet_size
         add_message.file.size = size
+        if packet_format != PacketFormats.ENCAPSULATED:
+            add_message.file.packet_format = packet_format
         add_message.desired_copies = desired_copies
         add_message.fetch_path = FetchPathTlv()
         add_message.fetch_path.prefix = fetch_path
@@ -167,7 +170,7 @@ class InsertCommandHandle(ProtocolHandle):
         message = Message()
         message.type = MessageTypes.ADD
         message.value = add_message.encode()
-        self.main_loop.svs.publishData(message.encode())
+        self.main_loop.publisher.publishData(message.encode())
 
         bak = ""
         for backup in backup_list:
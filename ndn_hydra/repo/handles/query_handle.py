@@ -11,11 +11,11 @@
 import asyncio as aio
 import json
 import logging
-import random
 from ndn.app import NDNApp
 from ndn.encoding import Name, ContentType, Component
 from ndn.storage import Storage
 from ndn_hydra.repo.modules.global_view import GlobalView
+from ndn_hydra.repo.modules.replica_selector import ReplicaSelector
 from ndn_hydra.repo.protocol.base_models import FileList, File
 
 
@@ -23,14 +23,16 @@ class QueryHandle(object):
     """
     QueryHandle processes query interests, and return informational data.
     """
-    def __init__(self, app: NDNApp, global_view: GlobalView, config: dict):
+    def __init__(self, app: NDNApp, global_view: GlobalView, replica_selector: ReplicaSelector, config: dict):
         """
         :param app: NDNApp.
         :param global_view: Global View.
+        :param replica_selector: ReplicaSelector, ordering the stores of a file query.
         :param config: All config Info.
         """
         self.app = app
         self.global_view = global_view
+        self.replica_selector = replica_selector
         self.node_name = config['node_name']
         self.repo_prefix = config['repo_prefix']
 
@@ -101,16 +103,9 @@ class QueryHandle(object):
             file = self.global_view.get_file(filename)
 
             if file:
-                # If this node has the file, it should serve the file.
-                # Otherwise, randomly pick a node to serve the file. We shuffle to disregard
-                # any potential previous order. This decision can later be improved by selecting a 
-                # node based on factors like proximity, load, etc.
-                file_stores = file["stores"]
-                if self.node_name in file_stores:
-                    file_stores.remove(self.node_name)
-                    file_stores.insert(0, self.node_name)
-                else:
-                    random.shuffle(file_stores)
+                # If this node has the file, it should serve the file. The other stores follow
+                # from the most to the least preferable source, by load, RTT and recent failures.
+                file["stores"] = self.replica_selector.rank(file["stores"])
 
                 file = json.dumps(file).encode()
             self.app.put_data(int_name, content=file, freshness_period=3000, content_type=ContentType.BLOB)
@@ -11,34 +11,42 @@
 import asyncio as aio
 import logging
 import time
-from secrets import choice
 from ndn.app import NDNApp
 from ndn.encoding import Name, ContentType, Component
 from ndn.storage import Storage
 from ndn_hydra.repo.main.main_loop import MainLoop
 from ndn_hydra.repo.modules.global_view import GlobalView
+from ndn_hydra.repo.modules.replica_selector import ReplicaSelector
+from ndn_hydra.repo.modules.read_ahead import ReadAhead
+from ndn_hydra.repo.modules.favor_calculator import encode_favor
 from ndn_hydra.repo.group_messages.update import UpdateMessageTlv
 from ndn_hydra.repo.group_messages.message import Message, MessageTypes
 
+LINK_REPLICAS = 3  # replicas listed in a redirect, in order of preference
+
 
 class ReadHandle(object):
     """
     ReadHandle processes ordinary interests, and return corresponding data if exists.
     """
-    def __init__(self, app: NDNApp, data_storage: Storage, global_view: GlobalView, main_loop: MainLoop, config: dict):
+    def __init__(self, app: NDNApp, data_storage: Storage, global_view: GlobalView, main_loop: MainLoop,
+                 replica_selector: ReplicaSelector, config: dict):
         """
         :param app: NDNApp.
         :param data_storage: Storage.
         :param global_view: Global View.
+        :param replica_selector: ReplicaSelector, ordering the nodes a redirect lists.
         :param config: All config Info.
         """
         self.app = app
         self.data_storage = data_storage
         self.global_view = global_view
+        self.replica_selector = replica_selector
         self.main_loop = main_loop
         self.node_name = config['node_name']
         self.repo_prefix = config['repo_prefix']
         self.file_expiration = config['file_expiration']
+        self.read_ahead = ReadAhead(data_storage, config['read_ahead'])
         self.node_comp = "/node"
         self.logger = logging.getLogger()
 
@@ -68,20 +76,21 @@ class ReadHandle(object):
         Repo will:
         - Reply with data of its own
         - Nack if data can not be found within the repo
-        - Reply with a redirect to another node
+        - Reply with a redirect listing the best nodes that have the file, most preferable first
         Assumptions:
         - A node on the on list will have the file in complete form
         """
 
         # get rid of the security part if any on the int_name
         file_name = self._get_file_name_from_interest(Name.to_str(int_name[:-1]))
-        best_id = self._best_id_for_file(file_name)
+        location = self.global_view.get_file_location(file_name) if file_name else None
+        best_ids = self._best_ids_for_file(location)
         segment_comp = "/" + Component.to_str(int_name[-1])
 
         if int_param.must_be_fresh:
             return
 
-        if best_id is None:
+        if not best_ids:
             if segment_comp == "/seg=0":
                 self.logger.info(f'\n[CMD][FETCH]    nacked due to no file')
 
@@ -90,8 +99,8 @@ class ReadHandle(object):
             self.logger.info(f"\nRead handle: data not found {Name.to_str(int_name)}")
             return
 
-        total_segments = int(self.global_view.get_file(file_name)["packets"])
-        if best_id == self.node_name:
+        total_segments = int(location.packets)
+        if best_ids[0] == self.node_name:
             if segment_comp == "/seg=0":
                 self.logger.info(f'\n[CMD][FETCH]    serving file: {file_name}')
                 # self._reset_file_expiration(file_name)
@@ -102,13 +111,15 @@ class ReadHandle(object):
                 return
 
             self.app.put_raw_packet(data_bytes)
+            if Component.get_type(int_name[-1]) == Component.TYPE_SEGMENT:
+                self.read_ahead.on_read(file_name, Component.to_number(int_name[-1]), total_segments)
         else:
             if segment_comp == "/seg=0":
                 self.logger.info(f'\n[CMD][FETCH]    linked to another node')
 
-            # create a link to a node who has the content
-            new_name = self.repo_prefix + best_id + file_name
-            link_content = bytes(new_name.encode())
+            # create a link to the nodes who have the content, as a sequence of names (LinkContent)
+            link_content = b''.join(Name.encode(Name.from_str(self.repo_prefix + best_id + file_name))
+                                    for best_id in best_ids)
             final_id = Component.from_number(total_segments-1, Component.TYPE_SEGMENT)
             self.app.put_data(int_name, content=link_content, content_type=ContentType.LINK, final_block_id=final_id)
 
@@ -118,19 +129,12 @@ class ReadHandle(object):
             return file_name[len(self.node_name):]
         return file_name
 
-    def _best_id_for_file(self, file_name: str):
-        file_info = self.global_view.get_file(file_name)
-        if not file_name or not file_info:
-            return None
-        active_nodes = set( [x['node_name'] for x in self.global_view.get_nodes()] )
-        on_list = file_info["stores"]
-        if not on_list:
-            return None
-        if self.node_name in on_list:
-            return self.node_name
-        else:
-            on_list = [x for x in on_list if x in active_nodes]
-            return choice(on_list)
+    def _best_ids_for_file(self, location):
+        if location is None or not location.stores:
+            return []
+        if self.node_name in location.stores:
+            return [self.node_name]
+        return self.replica_selector.rank(location.active_stores)[:LINK_REPLICAS]
 
     def _reset_file_expiration(self, file_name):
         if self.file_expiration == 0:  # no need to reset if file_expiration in config is set to 0
@@ -141,7 +145,7 @@ class ReadHandle(object):
         favor = self.global_view.get_node(self.node_name)['favor']
         update_message = UpdateMessageTlv()
         update_message.node_name = self.node_name.encode()
-        update_message.favor = str(favor).encode()
+        encode_favor(update_message, favor, self.global_view.get_wire_version())
         update_message.file_name = file_name
         update_message.expiration_time = expiration_time
         # update msg
@@ -151,4 +155,4 @@ class ReadHandle(object):
 
         # publish
         self.global_view.update_file(file_name, expiration_time)
-        self.main_loop.svs.publishData(message.encode())
\ No newline at end of file
+        self.main_loop.publisher.publishData(message.encode())
\ No newline at end of file
@@ -0,0 +1,116 @@
+# -------------------------------------------------------------
+# NDN Hydra Snapshot Handle
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+import asyncio as aio
+import logging
+import time
+from collections import OrderedDict
+from typing import List
+from ndn.app import NDNApp
+from ndn.encoding import Name, Component, FormalName, MetaInfo, Signer, make_data
+from ndn_hydra.repo.main.main_loop import MainLoop
+from ndn_hydra.repo.modules.global_view import GlobalView
+from ndn_hydra.repo.modules.global_view_snapshot import encode_snapshot
+
+SNAPSHOT_SEGMENT_SIZE = 8000
+SNAPSHOT_LIFETIME = 10  # seconds a snapshot is handed out before a new one is taken
+SNAPSHOT_VERSIONS = 2  # snapshots kept, so fetches in progress survive a new one
+
+
+def _sign_segments(name: FormalName, content: bytes, signer: Signer) -> List[bytes]:
+    """
+    Segment and sign a snapshot, off the event loop.
+    """
+    chunks = [content[i:i + SNAPSHOT_SEGMENT_SIZE] for i in range(0, len(content), SNAPSHOT_SEGMENT_SIZE)] or [b'']
+    meta_info = MetaInfo(freshness_period=SNAPSHOT_LIFETIME * 1000,
+                         final_block_id=Component.from_segment(len(chunks) - 1))
+    return [make_data(name + [Component.from_segment(seq)], meta_info, chunk, signer=signer)
+            for seq, chunk in enumerate(chunks)]
+
+
+class SnapshotHandle(object):
+    """
+    SnapshotHandle serves snapshots of the global view to joining nodes, as segmented data under
+    /<repo_prefix>/<node_name>/snapshot/<version>. An interest for the unversioned prefix gets the
+    first segment of the latest snapshot.
+    Snapshots are taken in the background and cached, an interest never waits for one unless
+    none was taken yet.
+    """
+    def __init__(self, app: NDNApp, global_view: GlobalView, main_loop: MainLoop, config: dict):
+        """
+        :param app: NDNApp.
+        :param global_view: Global View.
+        :param main_loop: MainLoop, knowing which group messages the view reflects.
+        :param config: All config Info.
+        """
+        self.app = app
+        self.global_view = global_view
+        self.main_loop = main_loop
+        self.prefix = Name.from_str(config['repo_prefix'] + config['node_name'] + "/snapshot")
+        self.snapshots = OrderedDict()  # version -> segments, oldest first
+        self.taken_at = 0.0
+        self.taking = None  # task taking the next snapshot
+        self.logger = logging.getLogger()
+
+        self.listen(self.prefix)
+
+    def listen(self, prefix):
+        """
+        :param prefix: NonStrictName.
+        """
+        self.app.route(prefix)(self._on_interest)
+        self.logger.info(f'\nSnapshot handle: listening to {Name.to_str(prefix)}')
+
+    def unlisten(self, prefix):
+        """
+        :param name: NonStrictName.
+        """
+        aio.ensure_future(self.app.unregister(prefix))
+        self.logger.info(f'\nSnapshot handle: stop listening to {Name.to_str(prefix)}')
+
+    def _on_interest(self, int_name, int_param, _app_param):
+        if len(int_name) == len(self.prefix):
+            if time.time() - self.taken_at > SNAPSHOT_LIFETIME and (self.taking is None or self.taking.done()):
+                self.taking = aio.ensure_future(self._take_snapshot())
+            if self.snapshots:
+                self.app.put_raw_packet(next(reversed(self.snapshots.values()))[0])
+            else:
+                aio.ensure_future(self._serve_first_snapshot())
+            return
+        if len(int_name) != len(self.prefix) + 2 or Component.get_type(int_name[-1]) != Component.TYPE_SEGMENT:
+            return
+        segments = self.snapshots.get(Component.to_number(int_name[-2]))
+        seq = Component.to_number(int_name[-1])
+        if segments is not None and seq < len(segments):
+            self.app.put_raw_packet(segments[seq])
+
+    async def _serve_first_snapshot(self):
+        await self.taking
+        if self.snapshots:
+            self.app.put_raw_packet(next(reversed(self.snapshots.values()))[0])
+
+    async def _take_snapshot(self):
+        # the view and the vector it reflects are read together, with no await in between
+        content = encode_snapshot(self.global_view, self.main_loop.applied_vector())
+        version = int(time.time() * 1000)
+        self.taken_at = time.time()
+        name = self.prefix + [Component.from_version(version)]
+        signer = self.app.keychain.get_signer({})
+        try:
+            segments = await aio.get_event_loop().run_in_executor(None, _sign_segments, name, content, signer)
+        except Exception as e:
+            self.taken_at = 0.0
+            self.logger.warning(f'\nSnapshot handle: signing snapshot version={version} failed: {e}')
+            return
+        self.snapshots[version] = segments
+        while len(self.snapshots) > SNAPSHOT_VERSIONS:
+            self.snapshots.popitem(last=False)
+        self.logger.info(f'\nSnapshot handle: took snapshot version={version}; '
+                         f'bytes={len(content)}; segments={len(segments)}')
@@ -21,6 +21,7 @@ from ndn.svs import SVSyncLogger
 from ndn_hydra.repo import *
 from ndn_hydra.repo.modules.file_fetcher import FileFetcher
 from ndn_hydra.repo.modules.data_storage import DataStorage
+from ndn_hydra.repo.modules.blob_storage import BlobStorage
 from ndn_hydra.repo.modules.read_config import read_config_file
 
 
@@ -119,6 +120,10 @@ def process_cmd_opts():
             "beats_to_renew": default_config_file['default_config']['timers']['beats_to_renew'],
             "replication_degree": default_config_file['default_config']['timers']['replication_degree'],
             "file_expiration": default_config_file['default_config']['timers']['file_expiration'],
+            "claims_per_tick": default_config_file['default_config']['timers']['claims_per_tick'],
+            "claim_timeout": default_config_file['default_config']['timers']['claim_timeout'],
+            "batch_window": default_config_file['default_config']['timers']['batch_window'],
+            "batch_size": default_config_file['default_config']['timers']['batch_size'],
             "rtt": default_config_file['default_config']['favor']['rtt'],
             "num_users": default_config_file['default_config']['favor']['num_users'],
             "bandwidth": default_config_file['default_config']['favor']['bandwidth'],
@@ -127,6 +132,10 @@ def process_cmd_opts():
             "remaining_storage": default_config_file['default_config']['favor']['remaining_storage'],
             "rw_speed": default_config_file['default_config']['favor']['rw_speed'],
             "logger_level": default_config_file['default_config']['logger_level'],
+            "storage_engine": default_config_file['default_config']['storage_engine'],
+            "packet_cache_size": default_config_file['default_config']['packet_cache_size'],
+            "read_ahead": default_config_file['default_config']['read_ahead'],
+            "min_wire_version": default_config_file['default_config']['min_wire_version'],
         }
 
         if cli_args.repo_prefix is not False:
@@ -202,22 +211,28 @@ class HydraNodeThread(Thread):
         # Post-start
         async def start_main_loop():
             # databases
-            data_storage = DataStorage(self.config['data_storage_path'])
-            global_view = GlobalView(self.config['global_view_path'])
+            if self.config['storage_engine'] == 'blob':
+                data_storage = BlobStorage(os.path.splitext(self.config['data_storage_path'])[0])
+            else:
+                data_storage = DataStorage(self.config['data_storage_path'],
+                                           packet_cache_size=self.config['packet_cache_size'] * 1024 * 1024)
+            global_view = GlobalView(self.config['global_view_path'], self.config['min_wire_version'])
             svs_storage = SqliteStorage(self.config['svs_storage_path'])
             pb = PubSub(app)
 
-            # file fetcher module
-            file_fetcher = FileFetcher(app, global_view, data_storage, self.config)
+            # replica selection and file fetcher modules
+            replica_selector = ReplicaSelector(global_view, self.config['node_name'])
+            file_fetcher = FileFetcher(app, global_view, data_storage, replica_selector, self.config)
 
             # main_loop (svs)
             main_loop = MainLoop(app, self.config, global_view, data_storage, svs_storage, file_fetcher)
 
             # handles (reads, commands & queries)
-            read_handle = ReadHandle(app, data_storage, global_view, main_loop, self.config)
+            read_handle = ReadHandle(app, data_storage, global_view, main_loop, replica_selector, self.config)
             insert_handle = InsertCommandHandle(app, data_storage, pb, self.config, main_loop, global_view)
             delete_handle = DeleteCommandHandle(app, data_storage, pb, self.config, main_loop, global_view)
-            query_handle = QueryHandle(app, global_view, self.config)
+            query_handle = QueryHandle(app, global_view, replica_selector, self.config)
+            snapshot_handle = SnapshotHandle(app, global_view, main_loop, self.config)
 
             await listen(Name.normalize(self.config['repo_prefix']), pb, insert_handle, delete_handle)
             await main_loop.start()
@@ -12,21 +12,28 @@ import asyncio as aio
 import logging
 import secrets
 import time
-import random
 from typing import Dict, List
 from ndn.app import NDNApp
-from ndn.encoding import Name, Component
+from ndn.encoding import Name, Component, DecodeError
 from ndn.types import InterestNack, InterestTimeout
 from ndn.svs import SVSync
 from ndn.storage import Storage, SqliteStorage
 from ndn_hydra.repo.modules import *
 from ndn_hydra.repo.group_messages import *
 from ndn_hydra.repo.modules.file_fetcher import FileFetcher
+from ndn_hydra.repo.modules.claim_scheduler import ClaimScheduler
+from ndn_hydra.repo.modules.sync_catch_up import SyncCatchUp
+from ndn_hydra.repo.modules.apply_pipeline import ApplyPipeline
+from ndn_hydra.repo.modules.global_view_snapshot import decode_snapshot
+from ndn_hydra.repo.protocol.base_models import PacketFormats
 from ndn_hydra.repo.utils.garbage_collector import collect_db_garbage
-from ndn_hydra.repo.utils.concurrent_fetcher import concurrent_fetcher
-from ndn_hydra.repo.modules.favor_calculator import FavorCalculator
+from ndn_hydra.repo.utils.concurrent_fetcher import concurrent_fetcher, AdaptiveWindow
+from ndn_hydra.repo.modules.favor_calculator import FavorCalculator, encode_favor, encode_favor_parameters, \
+    encode_favor_weights
 from ndn_hydra.repo.modules.read_remaining_space import get_remaining_space
 
+BOOTSTRAP_THRESHOLD = 100  # missed group messages above which a node starts from a peer's snapshot
+
 
 class MainLoop:
     def __init__(self, app: NDNApp, config: Dict, global_view: GlobalView, data_storage: Storage, svs_storage: Storage, file_fetcher: FileFetcher):
@@ -38,9 +45,14 @@ class MainLoop:
         self.file_fetcher = file_fetcher
         self.file_fetcher.store_func = self.store
         self.svs = None
+        self.publisher = None
         self.logger = logging.getLogger('ndn')
         self.node_name = self.config['node_name']
         self.tracker = HeartbeatTracker(self.node_name, global_view, config['loop_period'], config['heartbeat_rate'], config['tracker_rate'], config['beats_to_fail'], config['beats_to_renew'])
+        self.claim_scheduler = ClaimScheduler(self.node_name, global_view, config['claims_per_tick'], config['claim_timeout'])
+        self.catch_up = SyncCatchUp(self.fetch_svs_message, self.apply_svs_message)
+        self.apply_pipeline = ApplyPipeline(global_view, self._apply_svs_message)
+        self.bootstrap_task = None
         self.last_garbage_collect_t = time.time()  # time in seconds
         self.last_cache_garbage_collect_t = time.time()  # time in seconds
         self.favor = 0
@@ -51,6 +63,8 @@ class MainLoop:
                           Name.normalize(self.node_name),
                           self.svs_missing_callback,
                           storage=self.svs_storage)
+        self.publisher = MessageBatcher(self.svs, self.config['batch_window'], self.config['batch_size'],
+                                        global_view=self.global_view)
         await aio.sleep(5)
         while True:
             await aio.sleep(self.config['loop_period'] / 1000.0)
@@ -69,20 +83,83 @@ class MainLoop:
         aio.ensure_future(self.on_missing_svs_messages(missing_list))
 
     async def on_missing_svs_messages(self, missing_list):
-        # if missing list is greater than 100 messages, bootstrap
+        missing_list = [i for i in missing_list if i.lowSeqno <= i.highSeqno]
         for i in missing_list:
             if i.nid == self.config["node_name"]:
                 self.tracker.restart(self.config["node_name"])
-                # bootstrap
-                continue
-            while i.lowSeqno <= i.highSeqno:
-                message_bytes = await self.svs.fetchData(Name.from_str(i.nid), i.lowSeqno)
-                if message_bytes is None:
+        missing_list = [i for i in missing_list if i.nid != self.config["node_name"]]
+        # if missing list is greater than 100 messages, bootstrap (once, when joining)
+        if self.bootstrap_task is None and \
+                sum(i.highSeqno - i.lowSeqno + 1 for i in missing_list) > BOOTSTRAP_THRESHOLD:
+            peers = [i.nid for i in sorted(missing_list, key=lambda i: i.highSeqno - i.lowSeqno, reverse=True)]
+            self.bootstrap_task = aio.ensure_future(self.bootstrap(peers))
+        if self.bootstrap_task is not None and not self.bootstrap_task.done():
+            await aio.shield(self.bootstrap_task)
+        for i in missing_list:
+            # messages the snapshot already reflects are skipped
+            low_seqno = max(i.lowSeqno, self.apply_pipeline.applied_seqno(i.nid) + 1)
+            if low_seqno <= i.highSeqno:
+                self.catch_up.add(i.nid, low_seqno, i.highSeqno)
+
+    async def bootstrap(self, peers: List[str]) -> bool:
+        """
+        Replace the global view with a snapshot fetched from the first peer that serves one.
+        """
+        for peer in peers:
+            prefix = Name.from_str(self.config['repo_prefix'] + peer + "/snapshot")
+            start = time.time()
+            try:
+                data_name, meta_info, content = await self.app.express_interest(
+                    prefix, must_be_fresh=True, can_be_prefix=True, lifetime=4000)
+                segments = int(Component.to_number(meta_info.final_block_id)) + 1
+                chunks = [bytes(content)]
+                if segments > 1:
+                    version_name = data_name[:-1]
+                    async for (_, _, content, _, _) in concurrent_fetcher(self.app, version_name, version_name, 1, segments - 1,
+                                                                          AdaptiveWindow(initial_window=8)):
+                        chunks.append(bytes(content))
+                if len(chunks) != segments:
                     continue
-                message = Message.specify(i.nid, i.lowSeqno, message_bytes)
-                self.tracker.reset(i.nid)
-                aio.ensure_future(message.apply(self.global_view, self.data_storage, self.fetch_file_from_client, self.svs, self.config))
-                i.lowSeqno = i.lowSeqno + 1
+                vector, nodes, files = decode_snapshot(b''.join(chunks))
+            except (InterestNack, InterestTimeout) as e:
+                self.logger.info(f"\n[ACT][BOOTSTRAP] no snapshot from {peer}: {type(e).__name__}")
+                continue
+            except (ValueError, TypeError, DecodeError) as e:
+                self.logger.warning(f"\n[ACT][BOOTSTRAP] bad snapshot from {peer}: {e}")
+                continue
+            self.global_view.restore(nodes, files)
+            for nid, seqno in vector.items():
+                if nid != self.node_name:
+                    self.apply_pipeline.skip_to(nid, seqno)
+            self.logger.info(f"\n[ACT][BOOTSTRAP] restored snapshot from {peer}: "
+                             f"nodes={len(nodes)}; files={len(files)}; segments={segments}; "
+                             f"duration={time.time() - start:0.2f}s")
+            return True
+        self.logger.info("\n[ACT][BOOTSTRAP] no peer served a snapshot, replaying the group messages")
+        return False
+
+    def applied_vector(self) -> Dict[str, int]:
+        """
+        The last group message reflected in the global view, per producer, including this node.
+        """
+        vector = {nid: producer.applied_seqno for nid, producer in self.apply_pipeline.producers.items()}
+        if self.svs is not None:
+            # messages still held by the batcher are already in the view, publish them first
+            if self.publisher is not None:
+                self.publisher.flush()
+            vector[self.node_name] = self.svs.getCore().getSeqno()
+        return vector
+
+    async def fetch_svs_message(self, nid: str, seqno: int, retries: int):
+        return await self.svs.fetchData(Name.from_str(nid), seqno, retries)
+
+    def apply_svs_message(self, nid: str, seqno: int, message_bytes: bytes):
+        self.tracker.reset(nid)
+        self.apply_pipeline.submit(nid, seqno, message_bytes)
+
+    async def _apply_svs_message(self, nid: str, seqno: int, message_bytes: bytes):
+        message = Message.specify(nid, seqno, message_bytes)
+        await message.apply(self.global_view, self.data_storage, self.fetch_file_from_client, self.publisher, self.config)
 
     def send_heartbeat(self):
         heartbeat_message = HeartbeatMessageTlv()
@@ -94,26 +171,29 @@ class MainLoop:
         logging.debug(f"\n[MAIN LOOP][SEND_HEARTBEAT] "
                           f"\n\tRemaining space for node {self.config['node_name']} is: {remaining_space}")
 
-        # Create FavorParameter and fill its fields
-        favor_parameters = FavorParameters()
-        favor_parameters.rtt = str(self.config['rtt'])
-        favor_parameters.num_users = str(self.config['num_users'])
-        favor_parameters.bandwidth = str(self.config['bandwidth'])
-        favor_parameters.network_cost = str(self.config['network_cost'])
-        favor_parameters.storage_cost = str(self.config['storage_cost'])
-        favor_parameters.remaining_storage = str(remaining_space)
-        favor_parameters.rw_speed = str(self.config['rw_speed'])
+        # favors go out as doubles, and also as strings while the group may have nodes reading only those
+        self.global_view.update_node_wire_version(self.config['node_name'], GROUP_WIRE_VERSION)
+        wire_version = self.global_view.get_wire_version()
+        heartbeat_message.wire_version = GROUP_WIRE_VERSION
 
-        heartbeat_message.favor_parameters = favor_parameters
+        # Create FavorParameter and fill its fields
+        heartbeat_message.favor_parameters = encode_favor_parameters({
+            'rtt': self.config['rtt'],
+            'num_users': self.config['num_users'],
+            'bandwidth': self.config['bandwidth'],
+            'network_cost': self.config['network_cost'],
+            'storage_cost': self.config['storage_cost'],
+            'remaining_storage': remaining_space,
+            'rw_speed': self.config['rw_speed']
+        }, wire_version)
 
         # Create FavorWeights and set its fields
-        favor_weights = FavorWeights()
-        favor_weights.remaining_storage = '0.14'
-        favor_weights.bandwidth = '0'
-        favor_weights.rw_speed = '0'
-
-        # Assign the encoded FavorWeights
-        heartbeat_message.favor_weights = favor_weights
+        favor_weights = {
+            'remaining_storage': 0.14,
+            'bandwidth': 0,
+            'rw_speed': 0
+        }
+        heartbeat_message.favor_weights = encode_favor_weights(favor_weights, wire_version)
 
         self_favor = FavorCalculator.calculate_favor(
             {
@@ -121,11 +201,7 @@ class MainLoop:
                 'bandwidth': self.config['bandwidth'],
                 'rw_speed': self.config['rw_speed']
             },
-            {
-                'remaining_storage': 0.14,
-                'bandwidth': 0,
-                'rw_speed': 0
-            })
+            favor_weights)
 
         message_to_send = Message()
         message_to_send.type = MessageTypes.HEARTBEAT
@@ -138,11 +214,25 @@ class MainLoop:
 
         # Update favor for this node in global_view
         self.global_view.update_node(self.config['node_name'], self_favor, next_state_vector)
-        self.svs.publishData(message_to_send.encode())
+        self.publisher.publishData(message_to_send.encode())
 
         self.logger.debug(f"\n[MAIN LOOP][SEND_HEARTBEAT] "
                           f"\n\tNode {self.config['node_name']} favor is: {self_favor}")
 
+        self.logger.debug(f"\n[MAIN LOOP][SEND_HEARTBEAT] "
+                          f"\n\tClaim scheduler for node {self.config['node_name']}: {self.claim_scheduler.metrics()}")
+        self.logger.debug(f"\n[MAIN LOOP][SEND_HEARTBEAT] "
+                          f"\n\tSync catch-up for node {self.config['node_name']}: {self.catch_up.metrics()}")
+        self.logger.debug(f"\n[MAIN LOOP][SEND_HEARTBEAT] "
+                          f"\n\tApply pipeline for node {self.config['node_name']}: {self.apply_pipeline.metrics()}")
+        if self.logger.isEnabledFor(logging.DEBUG):
+            # the worst latency is reported per heartbeat
+            self.apply_pipeline.reset_metrics()
+        self.logger.debug(f"\n[MAIN LOOP][SEND_HEARTBEAT] "
+                          f"\n\tMessage batcher for node {self.config['node_name']}: {self.publisher.metrics()}")
+        self.logger.debug(f"\n[MAIN LOOP][SEND_HEARTBEAT] "
+                          f"\n\tData storage for node {self.config['node_name']}: {self.data_storage.metrics()}")
+
         self.logger.debug(f"\n[MAIN LOOP][SEND_HEARTBEAT] "
                           f"\n\tGlobal view for node {self.config['node_name']} is:"
                           f"\n\n----------/----------/----------/----------"
@@ -150,36 +240,19 @@ class MainLoop:
                           f"----------/----------/----------/----------\n")
 
     def backup_list_check(self):
-        underreplicated_files = self.global_view.get_underreplicated_files()
+        # only visit files whose replication deficit or backup ranks changed since the last check
+        underreplicated_files = self.global_view.pop_replication_changes()
         for underreplicated_file in underreplicated_files:
             deficit = underreplicated_file['desired_copies'] - len(underreplicated_file['stores'])
             for backuped_by in underreplicated_file['backups']:
                 if (backuped_by['node_name'] == self.config['node_name']) and (backuped_by['rank'] < deficit):
-                    self.fetch_file_from_node(underreplicated_file['file_name'], underreplicated_file['packets'], underreplicated_file['packet_size'])
+                    # a fetch that cannot start yet (no active store, or one in progress) is retried next tick
+                    if not self.fetch_file_from_node(underreplicated_file['file_name'], underreplicated_file['packets'], underreplicated_file['packet_size']):
+                        self.global_view.retry_replication(underreplicated_file['file_name'])
 
     def claim(self):
-        # TODO: possibility based on # active sessions and period
-        if random.random() < 0.618:
-            return
-        backupable_files = self.global_view.get_backupable_files()
-        for backupable_file in backupable_files:
-            if random.random() < 0.618:
-                continue
-            # print(json.dumps(backupable_insertion['stores']))
-            # print(json.dumps(backupable_insertion['backups']))
-            already_in = False
-            for stored_by in backupable_file['stores']:
-                if stored_by == self.config['node_name']:
-                    already_in = True
-                    break
-            for backuped_by in backupable_file['backups']:
-                if backuped_by['node_name'] == self.config['node_name']:
-                    already_in = True
-                    break
-            if already_in is True:
-                continue
-            if len(backupable_file['backups']) == 0 and len(backupable_file['stores']) == 0:
-                continue
+        # files are picked by gap and age, rate limited to claims_per_tick per loop period
+        for backupable_file in self.claim_scheduler.next_claims():
             authorizer = None
             if len(backupable_file['backups']) == 0:
                 authorizer = {
@@ -193,7 +266,8 @@ class MainLoop:
             # claim tlv
             claim_message = ClaimMessageTlv()
             claim_message.node_name = self.config['node_name'].encode()
-            claim_message.favor = str(self.global_view.get_node(self.config['node_name'])['favor']).encode()
+            encode_favor(claim_message, self.global_view.get_node(self.config['node_name'])['favor'],
+                         self.global_view.get_wire_version())
             claim_message.file_name = Name.from_str(backupable_file['file_name'])
             claim_message.type = ClaimTypes.REQUEST
             claim_message.claimer_node_name = self.config['node_name'].encode()
@@ -205,7 +279,7 @@ class MainLoop:
             message = Message()
             message.type = MessageTypes.CLAIM
             message.value = claim_message.encode()
-            self.svs.publishData(message.encode())
+            self.publisher.publishData(message.encode())
             self.logger.info(f"\n[MSG][CLAIM.R]* "
                              f"\n\tNode name={self.config['node_name']};"
                              f"\n\tFile name={backupable_file['file_name']}")
@@ -214,23 +288,25 @@ class MainLoop:
         store_message = StoreMessageTlv()
         store_message.node_name = self.config['node_name'].encode()
 
-        store_message.favor = str(self.global_view.get_node(self.config['node_name'])['favor']).encode()
+        encode_favor(store_message, self.global_view.get_node(self.config['node_name'])['favor'],
+                     self.global_view.get_wire_version())
         store_message.file_name = Name.from_str(file_name)
         message = Message()
         message.type = MessageTypes.STORE
         message.value = store_message.encode()
 
         self.global_view.store_file(file_name, self.config['node_name'])
-        self.svs.publishData(message.encode())
+        self.publisher.publishData(message.encode())
         self.logger.info(f"\n[MSG][STORE]* "
                          f"\n\tNode name={self.config['node_name']};"
                          f"\n\tfile={file_name}")
 
-    def fetch_file_from_client(self, file_name: str, packets: int, packet_size: int, fetch_path: str):
-        self.file_fetcher.fetch_file_from_client(file_name, packets, packet_size, fetch_path)
+    def fetch_file_from_client(self, file_name: str, packets: int, packet_size: int, fetch_path: str,
+                               packet_format: int = PacketFormats.ENCAPSULATED):
+        self.file_fetcher.fetch_file_from_client(file_name, packets, packet_size, fetch_path, packet_format)
 
-    def fetch_file_from_node(self, file_name: str, packets: int, packet_size: int):
-        self.file_fetcher.fetch_file_from_node(file_name, packets, packet_size)
+    def fetch_file_from_node(self, file_name: str, packets: int, packet_size: int) -> bool:
+        return self.file_fetcher.fetch_file_from_node(file_name, packets, packet_size)
 
     def check_garbage(self):
         """
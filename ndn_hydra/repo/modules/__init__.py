@@ -8,4 +8,10 @@
 
 from .command_table import CommandTable, InsertCommandBlock, DeleteCommandBlock
 from .global_view import GlobalView
-from .heartbeat_tracker import HeartbeatTracker
\ No newline at end of file
+from .heartbeat_tracker import HeartbeatTracker
+from .packet_cache import PacketCache
+from .replica_selector import ReplicaSelector
+from .read_ahead import ReadAhead
+from .blob_storage import BlobStorage
+from .sync_catch_up import SyncCatchUp
+from .apply_pipeline import ApplyPipeline
@@ -0,0 +1,139 @@
+# -------------------------------------------------------------
+# NDN Hydra Apply Pipeline
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+import asyncio as aio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict
+from ndn_hydra.repo.modules.global_view import GlobalView
+
+APPLY_BATCH_SIZE = 64  # group messages applied before the writer yields to the event loop
+
+
+class ProducerQueue:
+    __slots__ = ('nid', 'messages', 'applied_seqno')
+
+    def __init__(self, nid: str, applied_seqno: int) -> None:
+        self.nid = nid
+        self.messages = deque()  # (seqno, message bytes, time queued), in seqno order
+        self.applied_seqno = applied_seqno  # last message applied
+
+
+class ApplyPipeline:
+    """
+    Applies group messages to the global view through a single writer.
+    Each producer has a FIFO queue, so its messages are applied one at a time and in seqno order.
+    The writer takes messages from the producers in turn, and applies up to batch_size of them
+    before it yields to the event loop. Each message journals its own mutations as one global
+    view batch (see SpecificMessage), which is never held across an await.
+    """
+
+    def __init__(self, global_view: GlobalView, apply: Callable[[str, int, bytes], Awaitable[None]],
+                 batch_size: int = APPLY_BATCH_SIZE):
+        """
+        :param global_view: Global View.
+        :param apply: async (nid, seqno, message) -> None, applying a message to the global view.
+        :param batch_size: int. Messages applied before yielding to the event loop.
+        """
+        self.global_view = global_view
+        self.apply = apply
+        self.batch_size = batch_size
+        self.producers: OrderedDict = OrderedDict()  # nid -> ProducerQueue, next to take from first
+        self.writer = None
+        self.wakeup = aio.Event()
+        self.queued = 0
+        self.applied = 0
+        self.batches = 0
+        self.stale = 0
+        self.latency_avg = 0.0  # seconds from queued to applied, moving average
+        self.latency_max = 0.0
+        self.logger = logging.getLogger()
+
+    def applied_seqno(self, nid: str) -> int:
+        """
+        :return: int. The last message of the producer applied, 0 if none.
+        """
+        producer = self.producers.get(nid)
+        return producer.applied_seqno if producer is not None else 0
+
+    def skip_to(self, nid: str, seqno: int):
+        """
+        Mark the messages of a producer up to seqno as applied, e.g. after restoring a snapshot
+        reflecting them. Those still queued are dropped when their turn comes.
+        """
+        producer = self.producers.get(nid)
+        if producer is None:
+            self.producers[nid] = ProducerQueue(nid, seqno)
+        else:
+            producer.applied_seqno = max(producer.applied_seqno, seqno)
+
+    def submit(self, nid: str, seqno: int, message_bytes: bytes):
+        """
+        Queue a message. Messages of a producer must be submitted in seqno order.
+        """
+        producer = self.producers.get(nid)
+        if producer is None:
+            producer = self.producers[nid] = ProducerQueue(nid, 0)
+        producer.messages.append((seqno, message_bytes, time.monotonic()))
+        self.queued += 1
+        self.wakeup.set()
+        if self.writer is None or self.writer.done():
+            self.writer = aio.ensure_future(self._write())
+
+    async def _write(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+            while self.queued > 0:
+                applied = 0
+                while applied < self.batch_size and self.queued > 0:
+                    applied += await self._apply_next()
+                self.batches += 1
+                # let the producers queue more before the next batch
+                await aio.sleep(0)
+
+    async def _apply_next(self) -> int:
+        # one message from the next producer with any queued, which then goes last
+        for nid, producer in self.producers.items():
+            if producer.messages:
+                break
+        self.producers.move_to_end(nid)
+        seqno, message_bytes, queued = producer.messages.popleft()
+        self.queued -= 1
+        if seqno <= producer.applied_seqno:
+            self.stale += 1
+            return 0
+        try:
+            await self.apply(nid, seqno, message_bytes)
+        except Exception as e:
+            self.logger.warning(f'\nApply pipeline: message {seqno} of {nid} failed: {e}')
+        producer.applied_seqno = seqno
+        latency = time.monotonic() - queued
+        self.latency_avg += (latency - self.latency_avg) / 16
+        self.latency_max = max(self.latency_max, latency)
+        self.applied += 1
+        return 1
+
+    def metrics(self) -> Dict:
+        return {
+            'depth': self.queued,
+            'applied': self.applied,
+            'batches': self.batches,
+            'stale': self.stale,
+            'latency_avg_ms': round(self.latency_avg * 1000, 2),
+            'latency_max_ms': round(self.latency_max * 1000, 2),
+        }
+
+    def reset_metrics(self):
+        """
+        Start measuring the maximum latency anew.
+        """
+        self.latency_max = 0.0
@@ -0,0 +1,315 @@
+# -------------------------------------------------------------
+# NDN Hydra Blob Storage
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+import hashlib
+import mmap
+import os
+import struct
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from ndn.storage import Storage
+from ndn.encoding import Name, NonStrictName, Component, BinaryStr
+from ndn_hydra.repo.modules.data_storage import _read_data
+
+INDEX_RECORD = struct.Struct('!QQIQ')  # seq, offset, length, expire_time_ms
+MAX_OPEN_BLOBS = 256  # blobs kept open (file handles and maps) at once
+COMPACT_MIN_BYTES = 1 << 20  # dead bytes a blob may hold regardless of its size
+
+
+class Blob:
+    """
+    The segments of one file: an append-only blob of packets and an append-only index of
+    where each segment lies in it. A later record of a segment replaces the earlier one.
+    The bytes of replaced and removed segments are dead until the blob is compacted.
+    """
+    __slots__ = ('path', 'index', 'size', 'dead', 'writer', 'index_writer', 'unflushed', 'map')
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.index: Dict[int, Tuple[int, int, int]] = {}  # seq -> offset, length, expire_time_ms
+        self._recover_compaction()
+        self.size = os.path.getsize(path + '.blob') if os.path.exists(path + '.blob') else 0
+        self.writer = None
+        self.index_writer = None
+        self.unflushed = False
+        self.map = None
+        if os.path.exists(path + '.idx'):
+            with open(path + '.idx', 'rb') as f:
+                records = f.read()
+            # a record torn by a crash, or pointing past the end of the blob, is ignored
+            for pos in range(0, len(records) - INDEX_RECORD.size + 1, INDEX_RECORD.size):
+                seq, offset, length, expire_time_ms = INDEX_RECORD.unpack_from(records, pos)
+                if offset + length <= self.size:
+                    self.index[seq] = (offset, length, expire_time_ms)
+        self.dead = self.size - sum(length for _, length, _ in self.index.values())
+
+    def _recover_compaction(self) -> None:
+        # A compaction writes .blob.compact and .idx.compact, then moves the blob and then the index
+        # into place. Finish one that was interrupted after the blob moved, drop one that was not.
+        if os.path.exists(self.path + '.blob.compact'):
+            for suffix in ('.blob.compact', '.idx.compact'):
+                try:
+                    os.remove(self.path + suffix)
+                except FileNotFoundError:
+                    pass
+        elif os.path.exists(self.path + '.idx.compact'):
+            os.replace(self.path + '.idx.compact', self.path + '.idx')
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(path + '.idx') or os.path.exists(path + '.idx.compact')
+
+    def append(self, seq: int, data: BinaryStr, expire_time_ms: int) -> None:
+        if self.writer is None:
+            self.writer = open(self.path + '.blob', 'ab')
+            self.index_writer = open(self.path + '.idx', 'ab')
+        self.writer.write(data)
+        self.index_writer.write(INDEX_RECORD.pack(seq, self.size, len(data), expire_time_ms))
+        if seq in self.index:
+            self.dead += self.index[seq][1]
+        self.index[seq] = (self.size, len(data), expire_time_ms)
+        self.size += len(data)
+        self.unflushed = True
+
+    def view(self, seq: int, must_be_fresh: bool = False) -> Optional[memoryview]:
+        entry = self.index.get(seq)
+        if entry is None:
+            return None
+        offset, length, expire_time_ms = entry
+        if must_be_fresh and expire_time_ms <= int(time.time() * 1000):
+            return None
+        return memoryview(self.mapping())[offset:offset + length]
+
+    def mapping(self) -> mmap.mmap:
+        if self.unflushed:
+            self.writer.flush()
+            self.index_writer.flush()
+            self.unflushed = False
+        if self.map is None or len(self.map) < self.size:
+            # views of the previous map keep it alive until they are released
+            with open(self.path + '.blob', 'rb') as f:
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.map
+
+    def remove(self, seq: int) -> None:
+        self.dead += self.index.pop(seq)[1]
+
+    def needs_compaction(self) -> bool:
+        return self.dead > COMPACT_MIN_BYTES and self.dead > self.size - self.dead
+
+    def rewrite_index(self) -> None:
+        """
+        Rewrite the index with only the current record of each segment, and compact the blob
+        if most of it is dead.
+        """
+        if self.needs_compaction():
+            self.compact()
+            return
+        self._close_writers()
+        tmp_path = self.path + '.idx.tmp'
+        self._write_index(tmp_path, self.index)
+        os.replace(tmp_path, self.path + '.idx')
+
+    def compact(self) -> None:
+        """
+        Copy the live segments into a new blob, in their order in the old one, and drop the dead bytes.
+        """
+        source = self.mapping() if self.size > 0 else b''
+        self._close_writers()
+        index = {}
+        size = 0
+        with open(self.path + '.blob.compact', 'wb') as f:
+            for seq, (offset, length, expire_time_ms) in sorted(self.index.items(), key=lambda item: item[1][0]):
+                f.write(source[offset:offset + length])
+                index[seq] = (size, length, expire_time_ms)
+                size += length
+        self._write_index(self.path + '.idx.compact', index)
+        os.replace(self.path + '.blob.compact', self.path + '.blob')
+        os.replace(self.path + '.idx.compact', self.path + '.idx')
+        # views of the old map keep it alive until they are released
+        self.index, self.size, self.dead, self.map = index, size, 0, None
+
+    def _close_writers(self) -> None:
+        if self.index_writer is not None:
+            self.index_writer.close()
+            self.index_writer = None
+            self.writer.close()
+            self.writer = None
+            self.unflushed = False
+
+    @staticmethod
+    def _write_index(path: str, index: Dict[int, Tuple[int, int, int]]) -> None:
+        with open(path, 'wb') as f:
+            for seq, (offset, length, expire_time_ms) in index.items():
+                f.write(INDEX_RECORD.pack(seq, offset, length, expire_time_ms))
+
+    def close(self) -> None:
+        self._close_writers()
+        self.map = None
+
+
+class BlobStorage(Storage):
+    """
+    Keeps the segments of each file in one append-only blob file with an offset index,
+    and serves them as memoryviews sliced from a read-only map of the blob.
+    Deleting a file unlinks its blob, and a blob mostly made of replaced or removed segments
+    is compacted. Has the same interface as DataStorage.
+    Packet names must end with a segment component; the rest of the name is the file.
+    """
+
+    def __init__(self, path: str, max_open_blobs: int = MAX_OPEN_BLOBS):
+        """
+        :param path: str. Directory the blobs are kept in.
+        :param max_open_blobs: int. Blobs kept open at once, least recently used first out.
+        """
+        super().__init__()
+        self.path = os.path.expanduser(path)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+        except PermissionError:
+            raise PermissionError(f'Could not create blob storage directory: {self.path}') from None
+        self.max_open_blobs = max_open_blobs
+        self.blobs: OrderedDict = OrderedDict()  # file key -> Blob, least recently used first
+
+    @staticmethod
+    def _split_name(name: NonStrictName) -> Tuple[bytes, Optional[int]]:
+        # the file key (file name bytes) and segment number of a packet name
+        name = Name.normalize(name)
+        if name and Component.get_type(name[-1]) == Component.TYPE_SEGMENT:
+            return bytes(Name.to_bytes(name[:-1])), Component.to_number(name[-1])
+        return bytes(Name.to_bytes(name)), None
+
+    def _blob(self, file_key: bytes, create: bool = True) -> Optional[Blob]:
+        """
+        The blob of a file, opened if it is not. Unless create, None if the file has no blob,
+        so lookups of files not stored do not take the place of open blobs.
+        """
+        blob = self.blobs.get(file_key)
+        if blob is not None:
+            self.blobs.move_to_end(file_key)
+            return blob
+        path = os.path.join(self.path, hashlib.sha256(file_key).hexdigest())
+        if not create and not Blob.exists(path):
+            return None
+        blob = self.blobs[file_key] = Blob(path)
+        if len(self.blobs) > self.max_open_blobs:
+            _, evicted = self.blobs.popitem(last=False)
+            evicted.close()
+        return blob
+
+    def put_packet(self, name: NonStrictName, data: BinaryStr, internal: bool = False) -> None:
+        """
+        :param data: BinaryStr. The encoded packet, or unless internal, a packet wrapping it as its content.
+        """
+        file_key, seq = self._split_name(name)
+        if seq is None:
+            raise ValueError(f'Blob storage needs segmented names, got {Name.to_str(name)}')
+        if not internal:
+            data, _ = _read_data(data)
+        _, freshness_period = _read_data(data)
+        blob = self._blob(file_key)
+        blob.append(seq, data, self._time_ms() + (freshness_period or 0))
+        if blob.needs_compaction():
+            blob.compact()
+
+    def get_packet(self, name: NonStrictName, can_be_prefix: bool = False, must_be_fresh: bool = False) -> Optional[memoryview]:
+        file_key, seq = self._split_name(name)
+        if seq is None:
+            if not can_be_prefix:
+                return None
+            # the first segment of the file named
+            blob = self._blob(file_key, create=False)
+            if blob is None or not blob.index:
+                return None
+            seq = min(blob.index)
+            return blob.view(seq, must_be_fresh)
+        blob = self._blob(file_key, create=False)
+        return blob.view(seq, must_be_fresh) if blob is not None else None
+
+    def get_packets(self, name: NonStrictName, start: int, end: int) -> Dict[int, memoryview]:
+        """
+        Get the stored segments start to end (inclusive) of a file.
+        :return: Dict[int, memoryview]. Segment number -> packet, for the segments that are stored.
+        """
+        blob = self._blob(self._split_name(name)[0], create=False)
+        if blob is None:
+            return {}
+        return {seq: blob.view(seq) for seq in range(start, end + 1) if seq in blob.index}
+
+    def prefetch_packets(self, name: NonStrictName, start: int, end: int) -> int:
+        """
+        Ask the kernel to read the segments start to end (inclusive) of a file into the page cache.
+        :return: int. Number of segments prefetched.
+        """
+        blob = self._blob(self._split_name(name)[0], create=False)
+        if blob is None:
+            return 0
+        entries = [blob.index[seq] for seq in range(start, end + 1) if seq in blob.index]
+        if not entries or not hasattr(mmap, 'MADV_WILLNEED'):
+            return 0
+        first = min(offset for offset, _, _ in entries)
+        last = max(offset + length for offset, length, _ in entries)
+        first -= first % mmap.PAGESIZE
+        blob.mapping().madvise(mmap.MADV_WILLNEED, first, last - first)
+        return len(entries)
+
+    def invalidate_packets(self, names: List[NonStrictName]) -> None:
+        # packets are served straight from the blobs, nothing is cached
+        return
+
+    def enqueue_removal(self, names: List[NonStrictName]) -> None:
+        # unlinking a blob is cheap enough to do right away
+        self.remove_packets(names)
+
+    def remove_packet(self, name: NonStrictName) -> bool:
+        return self.remove_packets([name]) > 0
+
+    def remove_packets(self, names: List[NonStrictName]) -> int:
+        files = defaultdict(set)
+        for name in names:
+            file_key, seq = self._split_name(name)
+            if seq is not None:
+                files[file_key].add(seq)
+        total_deleted = 0
+        for file_key, seqs in files.items():
+            blob = self._blob(file_key, create=False)
+            if blob is None:
+                continue
+            removed = seqs & blob.index.keys()
+            total_deleted += len(removed)
+            if not removed:
+                continue
+            for seq in removed:
+                blob.remove(seq)
+            if blob.index:
+                blob.rewrite_index()
+                continue
+            # the whole file is gone, unlink it
+            blob.close()
+            del self.blobs[file_key]
+            for suffix in ('.blob', '.idx', '.blob.compact', '.idx.compact'):
+                try:
+                    os.remove(blob.path + suffix)
+                except FileNotFoundError:
+                    pass
+        return total_deleted
+
+    def metrics(self) -> Dict:
+        return {
+            'open_blobs': len(self.blobs),
+            'dead_bytes': sum(blob.dead for blob in self.blobs.values()),  # of the open blobs
+        }
+
+    def close(self) -> None:
+        for blob in self.blobs.values():
+            blob.close()
+        self.blobs.clear()
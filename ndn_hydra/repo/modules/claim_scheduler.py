@@ -0,0 +1,143 @@
+# -------------------------------------------------------------
+# NDN Hydra Claim Scheduler
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+import heapq
+import logging
+import time
+import zlib
+from collections import deque
+from typing import Dict, List, Tuple
+from ndn_hydra.repo.modules.global_view import GlobalView
+
+CLAIM_JITTER = 10.0  # seconds of age by which nodes order the files they claim differently
+
+
+class ClaimScheduler:
+    """
+    A class to pick which backupable files this node should claim.
+    Backupable files wait in a priority queue ordered by replication gap (largest first) and
+    then by age (oldest first). The queue is fed by the global view's backupable changes, so a
+    tick only costs as much as the files that changed since the previous one.
+    Each node shifts the age of a file by a jitter hashed from its own name and the file name,
+    so nodes do not all claim the same file in the same tick when files arrive close together.
+    """
+
+    def __init__(self, node_name: str, global_view: GlobalView, claims_per_tick: int, claim_timeout: int):
+        """
+        :param node_name: name of this node.
+        :param global_view: Global View.
+        :param claims_per_tick: maximum number of CLAIM requests to publish per tick.
+        :param claim_timeout: milliseconds after which an unanswered claim is queued again.
+        """
+        self.node_name = node_name
+        self.global_view = global_view
+        self.claims_per_tick = claims_per_tick
+        self.claim_timeout = claim_timeout / 1000.0
+        self.logger = logging.getLogger()
+        self.heap: List[Tuple[int, float, float, str]] = []  # (-gap, first_seen + jitter, first_seen, file_name)
+        self.queued: Dict[str, Tuple[int, float]] = {}  # file_name -> (gap, first_seen) of its live heap entry
+        self.pending: Dict[str, Tuple[float, float]] = {}  # file_name -> (first_seen, claimed_at)
+        # metrics
+        self.claims_sent = 0
+        self.claims_granted = 0
+        self.claims_expired = 0
+        self.latencies = deque(maxlen=256)  # seconds between a CLAIM request and its commitment
+
+    def next_claims(self) -> List[Dict]:
+        """
+        Return the files (as global view dicts) to claim during this tick, at most claims_per_tick.
+        """
+        now = time.time()
+        for file_name in self.global_view.pop_backupable_changes():
+            self._on_change(file_name, now)
+        for file_name, (first_seen, claimed_at) in list(self.pending.items()):
+            if now - claimed_at > self.claim_timeout:
+                # nobody committed our claim, try again later
+                del self.pending[file_name]
+                self.claims_expired += 1
+                self._push(file_name, first_seen)
+
+        claims = []
+        while self.heap and len(claims) < self.claims_per_tick:
+            neg_gap, _, first_seen, file_name = heapq.heappop(self.heap)
+            if self.queued.get(file_name) != (-neg_gap, first_seen):
+                continue  # superseded entry
+            del self.queued[file_name]
+            file = self.global_view.get_file(file_name)
+            if not self._claimable(file):
+                continue
+            gap = self._gap(file)
+            if gap != -neg_gap:
+                self._push(file_name, first_seen, gap)
+                continue
+            self.pending[file_name] = (first_seen, now)
+            self.claims_sent += 1
+            claims.append(file)
+        return claims
+
+    def metrics(self) -> Dict:
+        latencies = list(self.latencies)
+        return {
+            'queued': len(self.queued),
+            'pending': len(self.pending),
+            'claims_sent': self.claims_sent,
+            'claims_granted': self.claims_granted,
+            'claims_expired': self.claims_expired,
+            'latency_avg': (sum(latencies) / len(latencies)) if latencies else 0.0,
+            'latency_max': max(latencies) if latencies else 0.0,
+        }
+
+    def _on_change(self, file_name: str, now: float):
+        holds = self.global_view.holds_file(file_name, self.node_name)
+        if file_name in self.pending:
+            first_seen, claimed_at = self.pending[file_name]
+            if holds:
+                del self.pending[file_name]
+                self.claims_granted += 1
+                self.latencies.append(now - claimed_at)
+                self.logger.debug(f"\n[ACT][CLAIMED]* "
+                                  f"\n\tFile name={file_name};"
+                                  f"\n\tlatency={now - claimed_at:0.3f}s")
+            elif not self.global_view.is_backupable(file_name):
+                del self.pending[file_name]
+            return
+        if holds or not self.global_view.is_backupable(file_name):
+            self.queued.pop(file_name, None)
+            return
+        first_seen = self.queued[file_name][1] if file_name in self.queued else now
+        self._push(file_name, first_seen)
+
+    def _push(self, file_name: str, first_seen: float, gap: int = None):
+        if gap is None:
+            file = self.global_view.get_file(file_name)
+            if not self._claimable(file):
+                self.queued.pop(file_name, None)
+                return
+            gap = self._gap(file)
+        if self.queued.get(file_name) == (gap, first_seen):
+            return
+        self.queued[file_name] = (gap, first_seen)
+        heapq.heappush(self.heap, (-gap, first_seen + self._jitter(file_name), first_seen, file_name))
+
+    def _jitter(self, file_name: str) -> float:
+        # stable for a node and a file, different across nodes
+        return zlib.crc32(f'{self.node_name}{file_name}'.encode()) / 0xFFFFFFFF * CLAIM_JITTER
+
+    def _claimable(self, file) -> bool:
+        if file is None or not self.global_view.is_backupable(file['file_name']):
+            return False
+        if self.global_view.holds_file(file['file_name'], self.node_name):
+            return False
+        # a claim must be authorized by the last store or backup
+        return len(file['stores']) > 0 or len(file['backups']) > 0
+
+    @staticmethod
+    def _gap(file) -> int:
+        return (file['desired_copies'] * 2) - len(file['stores']) - len(file['backups'])
@@ -1,28 +1,248 @@
+import asyncio as aio
 import sqlite3
-from typing import List
+from contextlib import suppress
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
 
 from ndn.storage import SqliteStorage
-from ndn.encoding import Name, NonStrictName, parse_data
+from ndn.encoding import Name, NonStrictName, Component, TypeNumber, BinaryStr, DecodeError, parse_tl_num
+from ndn_hydra.repo.modules.packet_cache import PacketCache
+
+REMOVAL_PERIOD = 0.5  # seconds between two ticks of the deletion queue
+REMOVALS_PER_TICK = 1024  # packets deleted per tick
+VACUUM_PAGES_PER_TICK = 256  # free pages returned to the file system per tick
+
+
+def _read_data(wire: BinaryStr) -> Tuple[memoryview, Optional[int]]:
+    """
+    Locate the Content and the FreshnessPeriod of an encoded Data packet by walking its TLV headers,
+    without decoding (or copying) the rest of the packet.
+    :return: a view of the Content in wire, and the FreshnessPeriod or None.
+    """
+    wire = memoryview(wire)
+    typ, size = parse_tl_num(wire, 0)
+    offset = size
+    length, size = parse_tl_num(wire, offset)
+    offset += size
+    if typ != TypeNumber.DATA:
+        raise DecodeError(f'Expected a Data packet, got TLV type {typ}')
+    end = offset + length
+    content, freshness_period = wire[end:end], None
+    while offset < end:
+        typ, size = parse_tl_num(wire, offset)
+        offset += size
+        length, size = parse_tl_num(wire, offset)
+        offset += size
+        if typ == TypeNumber.META_INFO:
+            meta_end = offset + length
+            while offset < meta_end:
+                meta_typ, size = parse_tl_num(wire, offset)
+                offset += size
+                meta_length, size = parse_tl_num(wire, offset)
+                offset += size
+                if meta_typ == TypeNumber.FRESHNESS_PERIOD:
+                    freshness_period = int.from_bytes(wire[offset:offset + meta_length], 'big')
+                offset += meta_length
+            continue
+        if typ == TypeNumber.CONTENT:
+            content = wire[offset:offset + length]
+            break
+        offset += length
+    return content, freshness_period
+
+
+def _read_name_key(wire: BinaryStr) -> memoryview:
+    """
+    Locate the Name of an encoded Data packet, without its TL, as it is keyed in the database.
+    """
+    wire = memoryview(wire)
+    _, size = parse_tl_num(wire, 0)
+    offset = size
+    _, size = parse_tl_num(wire, offset)
+    offset += size
+    _, size = parse_tl_num(wire, offset)
+    offset += size
+    length, size = parse_tl_num(wire, offset)
+    offset += size
+    return wire[offset:offset + length]
+
 
 # DataStorage adds additional methods to the SqliteStorage
+# Packets are stored and returned as memoryviews over their encoded wire bytes, so the serving
+# path hands them to the face without copying or re-encoding them.
 class DataStorage(SqliteStorage):
-    def __init__(self, db_path: str, write_period: int = 10, initialize: bool = True):
-        super().__init__(db_path, write_period, initialize)
+    def __init__(self, db_path: str, write_period: int = 10, initialize: bool = True, packet_cache_size: int = 0,
+                 removal_period: float = REMOVAL_PERIOD, removals_per_tick: int = REMOVALS_PER_TICK,
+                 vacuum_pages_per_tick: int = VACUUM_PAGES_PER_TICK):
+        """
+        :param packet_cache_size: int. Byte budget of the packet cache, 0 disables it.
+        :param removal_period: float. Seconds between two ticks of the deletion queue, 0 disables the queue.
+        :param removals_per_tick: int. Packets the deletion queue deletes per tick.
+        :param vacuum_pages_per_tick: int. Free pages returned to the file system per tick.
+        """
         self.batch_size = 900
+        # files are deleted in the background: their keys are queued, and each tick deletes a bounded
+        # number of them and incrementally vacuums a bounded number of pages on the shared connection.
+        # The queue is mirrored in the removals table, so a restart does not serve deleted files again.
+        self.removals: Dict[bytes, None] = {}  # keys waiting for deletion, in the order they were queued
+        self.removal_period = removal_period
+        self.removals_per_tick = removals_per_tick
+        self.vacuum_pages_per_tick = vacuum_pages_per_tick
+        self.removed = 0
+        self.vacuumed = 0
+        super().__init__(db_path, write_period, initialize)
+        # hot packets served without a database lookup (SqliteStorage already uses self.cache for write-back)
+        self.packet_cache = PacketCache(packet_cache_size)
         # self.conn.execute('PRAGMA journal_mode=wal')  # Enable WAL mode
 
-    def put_packet(self, name: NonStrictName, data: bytes, internal: bool = False) -> None:
+    def _initialize_storage(self) -> None:
+        super()._initialize_storage()
+        if self.conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            # an existing database only switches to incremental vacuum after one full VACUUM
+            self.conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+            self.conn.execute('VACUUM')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS removals (id INTEGER PRIMARY KEY, key BLOB NOT NULL UNIQUE)')
+        self.conn.commit()
+        for key, in self.conn.execute('SELECT key FROM removals ORDER BY id'):
+            self.removals[bytes(key)] = None
+        if self.removal_period > 0:
+            self.removal_task = aio.get_event_loop().create_task(self._periodic_removal())
+
+    def put_packet(self, name: NonStrictName, data: BinaryStr, internal: bool = False) -> None:
+        """
+        :param data: BinaryStr. The encoded packet, or unless internal, a packet wrapping it as its content.
+        """
         if not self.initialized:
             raise self.UninitializedError("The storage is not initialized.")
         if not internal:
-            _, _, data, _ = parse_data(data)
-        super().put_packet(name, data)
+            data, _ = _read_data(data)
+        _, freshness_period = _read_data(data)
+        expire_time_ms = self._time_ms() + (freshness_period or 0)
+        name = Name.normalize(name)
+        key = self._get_name_bytes_wo_tl(name)
+        self.packet_cache.invalidate(key)
+        if self.removals and bytes(key) in self.removals:
+            # a file stored again under the name of a deleted one
+            del self.removals[bytes(key)]
+            self._execute_many('DELETE FROM removals WHERE key = ?', [(bytes(key),)])
+        if self.write_period > 0:
+            self.cache[name] = (data, expire_time_ms)
+        else:
+            self._put(key, data, expire_time_ms)
+
+    def get_packet(self, name: NonStrictName, can_be_prefix: bool = False, must_be_fresh: bool = False) -> Optional[memoryview]:
+        if can_be_prefix or must_be_fresh or not self.packet_cache.max_bytes:
+            data = super().get_packet(name, can_be_prefix, must_be_fresh)
+            # a packet queued for deletion is gone, even before the deletion queue gets to it
+            if data is None or (self.removals and bytes(_read_name_key(data)) in self.removals):
+                return None
+            return memoryview(data)
+        key = self._get_name_bytes_wo_tl(Name.normalize(name))
+        if self.removals and bytes(key) in self.removals:
+            return None
+        data = self.packet_cache.get(key)
+        if data is None:
+            data = super().get_packet(name)
+            if data is None:
+                return None
+            data = memoryview(data)
+            self.packet_cache.put(key, data)
+        return data
+
+    def get_packets(self, name: NonStrictName, start: int, end: int) -> Dict[int, memoryview]:
+        """
+        Get the stored segments start to end (inclusive) of a name with one range query.
+        Segment components sort in numeric order, so the segments of a name are contiguous keys.
+        :return: Dict[int, memoryview]. Segment number -> packet, for the segments that are stored.
+        """
+        if not self.initialized:
+            raise self.UninitializedError('The storage is not initialized.')
+        name = Name.normalize(name)
+        prefix_key = bytes(self._get_name_bytes_wo_tl(name))
+        packets = {}
+        cursor = self.conn.execute('SELECT key, value FROM data WHERE key >= ? AND key <= ?',
+                                   (prefix_key + Component.from_segment(start), prefix_key + Component.from_segment(end)))
+        for key, value in cursor:
+            seq = self._segment_of(memoryview(key)[len(prefix_key):])
+            if seq is not None and not (self.removals and bytes(key) in self.removals):
+                packets[seq] = memoryview(value)
+        # packets not written back yet are newer than the database
+        if self.write_period > 0:
+            try:
+                for packet_name, (data, _) in self.cache.iteritems(prefix=name, shallow=True):
+                    if len(packet_name) == len(name) + 1:
+                        seq = self._segment_of(packet_name[-1])
+                        if seq is not None and start <= seq <= end:
+                            packets[seq] = memoryview(data)
+            except KeyError:
+                pass  # nothing under this name is waiting for write-back
+        return packets
+
+    def prefetch_packets(self, name: NonStrictName, start: int, end: int) -> int:
+        """
+        Load the segments start to end (inclusive) of a name into the packet cache with one range query.
+        :return: int. Number of packets loaded.
+        """
+        if not self.packet_cache.max_bytes:
+            return 0
+        name = Name.normalize(name)
+        prefix_key = bytes(self._get_name_bytes_wo_tl(name))
+        packets = self.get_packets(name, start, end)
+        for seq, data in packets.items():
+            self.packet_cache.put(prefix_key + Component.from_segment(seq), data)
+        return len(packets)
+
+    @staticmethod
+    def _segment_of(component: BinaryStr) -> Optional[int]:
+        # the segment number if component is exactly one segment component
+        typ, size = parse_tl_num(component, 0)
+        length, length_size = parse_tl_num(component, size)
+        if typ != Component.TYPE_SEGMENT or size + length_size + length != len(component):
+            return None
+        return Component.to_number(component)
+
+    def invalidate_packets(self, names: List[NonStrictName]) -> None:
+        for name in names:
+            self.packet_cache.invalidate(self._get_name_bytes_wo_tl(Name.normalize(name)))
+
+    def enqueue_removal(self, names: List[NonStrictName]) -> None:
+        """
+        Stop serving the packets and queue them for deletion in the background.
+        """
+        keys = []
+        for name in names:
+            name = Name.normalize(name)
+            key = bytes(self._get_name_bytes_wo_tl(name))
+            self.packet_cache.invalidate(key)
+            if self.write_period > 0:
+                with suppress(KeyError):
+                    del self.cache[name]
+            self.removals[key] = None
+            keys.append((key,))
+        self._execute_many('INSERT OR IGNORE INTO removals (key) VALUES (?)', keys)
+
+    def _execute_many(self, sql: str, rows: List[tuple]) -> None:
+        # one transaction for all rows
+        try:
+            self.conn.execute('BEGIN TRANSACTION')
+            self.conn.executemany(sql, rows)
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f'SQLite error: {e}')
 
     def remove_packets(self, names: List[NonStrictName]) -> int:
         if not self.initialized:
             raise self.UninitializedError('The storage is not initialized.')
+        keys = [bytes(self._get_name_bytes_wo_tl(Name.normalize(name))) for name in names]
+        for key in keys:
+            self.packet_cache.invalidate(key)
+        return self._delete_keys(keys)
 
-        keys = [self._get_name_bytes_wo_tl(Name.normalize(name)) for name in names]
+    def _delete_keys(self, keys: List[bytes], dequeue: bool = False) -> int:
+        """
+        Delete the packets of keys, and with dequeue, their entries of the removals table in the same transaction.
+        """
         if not keys:
             return 0
 
@@ -40,6 +260,8 @@ class DataStorage(SqliteStorage):
 
                 cursor.execute(query, batch_keys)
                 total_deleted += cursor.rowcount
+                if dequeue:
+                    cursor.execute(f'DELETE FROM removals WHERE key IN ({placeholders})', batch_keys)
 
             self.conn.commit()
 
@@ -51,13 +273,42 @@ class DataStorage(SqliteStorage):
             if cursor:
                 cursor.close()
 
-        try:
-            self.conn.execute('VACUUM')
+        return total_deleted
 
-        except sqlite3.Error as e:
-            print(f'SQLite error during VACUUM: {e}')
+    async def _periodic_removal(self) -> None:
+        with suppress(aio.CancelledError):
+            while True:
+                self._removal_tick()
+                await aio.sleep(self.removal_period)
 
-        # Close connection (remove_packets is performed with a separate connection)
-        self.conn.close()
+    def _removal_tick(self) -> None:
+        keys = list(islice(self.removals, self.removals_per_tick))
+        for key in keys:
+            del self.removals[key]
+        self.removed += self._delete_keys(keys, dequeue=True)
+        if not self.vacuum_pages_per_tick:
+            return
+        try:
+            free_pages = self.conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if free_pages:
+                # execute() only steps the pragma once, freeing one page; executescript() would run it to
+                # completion but commits any open transaction first, so step it once per page, in one transaction
+                self.conn.execute('BEGIN TRANSACTION')
+                for _ in range(min(free_pages, self.vacuum_pages_per_tick)):
+                    self.conn.execute('PRAGMA incremental_vacuum(1)')
+                self.conn.commit()
+                self.vacuumed += free_pages - self.conn.execute('PRAGMA freelist_count').fetchone()[0]
+        except sqlite3.Error as e:
+            self.conn.rollback()
+            print(f'SQLite error during incremental vacuum: {e}')
 
-        return total_deleted
+    def metrics(self) -> Dict:
+        return {
+            'packet_cache': self.packet_cache.metrics(),
+            'removals': {
+                'queued': len(self.removals),
+                'removed': self.removed,
+                'vacuumed_pages': self.vacuumed,
+                'free_pages': self.conn.execute('PRAGMA freelist_count').fetchone()[0],
+            },
+        }
@@ -6,10 +6,16 @@
 #  @Pip-Library:   https://pypi.org/project/ndn-hydra
 # -------------------------------------------------------------
 import numpy as np
+import struct
 from ndn.encoding import *
 from typing import Union, Dict
 import shutil
 
+# group wire version from which nodes read favors as IEEE 754 doubles; below it favors also
+# travel as decimal strings (see GROUP_WIRE_VERSION)
+FAVOR_WIRE_VERSION = 2
+DOUBLE = struct.Struct('!d')
+
 
 class FavorParameterTypes:
     RTT = 501
@@ -19,18 +25,26 @@ class FavorParameterTypes:
     STORAGE_COST = 505
     REMAINING_STORAGE = 506
     RW_SPEED = 507
+    VALUES = 512  # even: nodes that do not know it skip it
 
 
 class FavorWeightsTypes:
     REMAINING_STORAGE = 508
     BANDWIDTH = 509
     RW_SPEED = 510
+    VALUES = 514
+
+
+# values are packed as a byte with a bit set for each non-zero value, then those values as doubles
+PARAMETER_NAMES = ('rtt', 'num_users', 'bandwidth', 'network_cost', 'storage_cost', 'remaining_storage', 'rw_speed')
+WEIGHT_NAMES = ('remaining_storage', 'bandwidth', 'rw_speed')
 
 
 class FavorWeights(TlvModel):
     remaining_storage = BytesField(FavorWeightsTypes.REMAINING_STORAGE)
     bandwidth = BytesField(FavorWeightsTypes.BANDWIDTH)
     rw_speed = BytesField(FavorWeightsTypes.RW_SPEED)
+    values = BytesField(FavorWeightsTypes.VALUES)  # packed WEIGHT_NAMES, wire version 2
 
 
 class FavorParameters(TlvModel):
@@ -41,6 +55,7 @@ class FavorParameters(TlvModel):
     storage_cost = BytesField(FavorParameterTypes.STORAGE_COST)
     remaining_storage = BytesField(FavorParameterTypes.REMAINING_STORAGE)
     rw_speed = BytesField(FavorParameterTypes.RW_SPEED)
+    values = BytesField(FavorParameterTypes.VALUES)  # packed PARAMETER_NAMES, wire version 2
 
 
 class FavorCalculator:
@@ -58,3 +73,69 @@ class FavorCalculator:
                  + favor_weights['rw_speed'] * favor_parameters['rw_speed'])
         return int(favor)
 
+
+def _encode_values(model: TlvModel, names, values: Dict[str, float], wire_version: int):
+    present = 0
+    doubles = []
+    for i, name in enumerate(names):
+        value = float(values[name])
+        if value != 0.0:
+            present |= 1 << i
+            doubles.append(value)
+    model.values = struct.pack(f'!B{len(doubles)}d', present, *doubles)
+    if wire_version < 2:
+        for name in names:
+            setattr(model, name, str(values[name]).encode())
+    return model
+
+
+def _decode_values(model: TlvModel, names) -> Dict[str, float]:
+    if model.values is not None:
+        packed = bytes(model.values)
+        doubles = iter(struct.unpack(f'!{len(packed) // DOUBLE.size}d', packed[1:]))
+        return {name: next(doubles) if packed[0] & (1 << i) else 0.0 for i, name in enumerate(names)}
+    if any(getattr(model, name) is None for name in names):
+        raise DecodeError(f'{type(model).__name__} has neither packed values nor strings')
+    return {name: float(bytes(getattr(model, name))) for name in names}
+
+
+def encode_favor_parameters(parameters: Dict[str, float], wire_version: int) -> FavorParameters:
+    """
+    :param wire_version: int. The group wire version, see GlobalView.get_wire_version.
+    """
+    return _encode_values(FavorParameters(), PARAMETER_NAMES, parameters, wire_version)
+
+
+def decode_favor_parameters(favor_parameters: FavorParameters) -> Dict[str, float]:
+    return _decode_values(favor_parameters, PARAMETER_NAMES)
+
+
+def encode_favor_weights(weights: Dict[str, float], wire_version: int) -> FavorWeights:
+    """
+    :param wire_version: int. The group wire version, see GlobalView.get_wire_version.
+    """
+    return _encode_values(FavorWeights(), WEIGHT_NAMES, weights, wire_version)
+
+
+def decode_favor_weights(favor_weights: FavorWeights) -> Dict[str, float]:
+    return _decode_values(favor_weights, WEIGHT_NAMES)
+
+
+def encode_favor(message: TlvModel, favor: float, wire_version: int) -> None:
+    """
+    Set the favor of a group message that has favor and favor_value fields.
+    :param wire_version: int. The group wire version, see GlobalView.get_wire_version.
+    """
+    message.favor_value = DOUBLE.pack(float(favor))
+    message.favor = str(favor).encode() if wire_version < 2 else None
+
+
+def decode_favor(message: TlvModel) -> float:
+    """
+    The favor of a group message that has favor and favor_value fields.
+    """
+    if message.favor_value is not None:
+        return DOUBLE.unpack(bytes(message.favor_value))[0]
+    if message.favor is None:
+        raise DecodeError(f'{type(message).__name__} has no favor')
+    return float(bytes(message.favor))
@@ -10,14 +10,16 @@
 
 import asyncio as aio
 import logging
-import random
+from contextlib import suppress
 import time
 import os
 from ndn.app import NDNApp
 from ndn.storage import Storage
 from ndn_hydra.repo.modules import *
 from ndn_hydra.repo.group_messages import *
-from ndn_hydra.repo.utils.concurrent_fetcher import concurrent_fetcher
+from ndn_hydra.repo.protocol.base_models import PacketFormats
+from ndn_hydra.repo.utils.concurrent_fetcher import concurrent_fetcher, AdaptiveWindow
+from ndn_hydra.repo.utils.striped_fetcher import striped_fetcher
 
 
 class FileFetcher:
@@ -25,9 +27,11 @@ class FileFetcher:
     A class to abstract client-to-node and node-to-node fetching.
     """
 
-    def __init__(self, app: NDNApp, global_view: GlobalView, data_storage: Storage, config: dict) -> None:
+    def __init__(self, app: NDNApp, global_view: GlobalView, data_storage: Storage,
+                 replica_selector: ReplicaSelector, config: dict) -> None:
         self.app = app
         self.global_view = global_view
+        self.replica_selector = replica_selector
         self.data_storage = data_storage
         self.config = config
         self.repo_prefix = config['repo_prefix']
@@ -35,7 +39,8 @@ class FileFetcher:
         self.store_func = None  # This function must be initialized to store properly store
         self.fetching = []
 
-    def fetch_file_from_client(self, file_name: str, packets: int, packet_size: int, fetch_path: str):
+    def fetch_file_from_client(self, file_name: str, packets: int, packet_size: int, fetch_path: str,
+                               packet_format: int = PacketFormats.ENCAPSULATED):
         if file_name in self.fetching:
             self.logger.info("\nFileFetcher [Client]: Already fetching")
             return
@@ -43,42 +48,77 @@ class FileFetcher:
             self.logger.info("\nFileFetcher: No storage function defined")
             return
         self.fetching.append(file_name)
-        aio.ensure_future(self._fetch_file_helper(file_name, packets, packet_size, fetch_path))
+        if packet_format == PacketFormats.DIRECT:
+            # The client serves the repo packets themselves, fetch them by name through its prefix
+            forwarding_hints = [[(1, fetch_path)]]
+            aio.ensure_future(self._fetch_file_helper(file_name, packets, packet_size, self.repo_prefix + file_name,
+                                                      forwarding_hints=forwarding_hints, internal=True))
+        else:
+            aio.ensure_future(self._fetch_file_helper(file_name, packets, packet_size, fetch_path))
 
-    def fetch_file_from_node(self, file_name: str, packets: int, packet_size: int):
+    def fetch_file_from_node(self, file_name: str, packets: int, packet_size: int) -> bool:
+        """
+        :return: bool. Whether a fetch was started; if not, the caller has to try again later.
+        """
         if file_name in self.fetching:
             self.logger.info("\nFileFetcher [Node]: Already fetching")
-            return
+            return False
         if not self.store_func:
             self.logger.info("\nFileFetcher: No storage function defined")
-            return
-        self.fetching.append(file_name)
-        # Randomly select a node to fetch file from
+            return False
+        # Fetch from every active node that stores the file
         file_info = self.global_view.get_file(file_name)
         on_list = file_info["stores"]
         if not on_list:
             self.logger.info("\nFileFetcher: File not in stores")
-            return
+            return False
         active_nodes = set([node['node_name'] for node in self.global_view.get_nodes()])
         on_list = [x for x in on_list if x in active_nodes]
-        selected_node = random.choice(on_list)
-        if not selected_node:
-            return
-        # Fetch file from selected node
+        if not on_list:
+            return False
+        on_list = self.replica_selector.rank(on_list)
+        # only mark as fetching once a source exists, the next store of this file triggers a retry
+        self.fetching.append(file_name)
+        # Fetch file from the selected nodes
         fetch_path = self.repo_prefix + file_name
-        forwarding_hint = [(1, Name.to_str(self.repo_prefix) + selected_node + Name.to_str(file_name))]
-        aio.ensure_future(self._fetch_file_helper(file_name, packets, packet_size, fetch_path, forwarding_hint=forwarding_hint, internal=True))
+        forwarding_hints = [[(1, Name.to_str(self.repo_prefix) + node + Name.to_str(file_name))] for node in on_list]
+        aio.ensure_future(self._fetch_file_helper(file_name, packets, packet_size, fetch_path, forwarding_hints=forwarding_hints,
+                                                  internal=True, source_nodes=on_list))
+        return True
 
-    async def _fetch_file_helper(self, file_name: str, packets: int, packet_size: int, fetch_path: str, forwarding_hint=None, internal=False):
+    async def _fetch_file_helper(self, file_name: str, packets: int, packet_size: int, fetch_path: str, forwarding_hints=None,
+                                 internal=False, source_nodes=None):
         self.logger.info(f"\n[ACT][FETCH]*  "
                          f"\n\tFile name={file_name};"
                          f"\n\tPackets={packets};"
                          f"\n\tfetch_path={fetch_path}")
         start = time.time()
 
-        async for (_, _, content, data_bytes, key) in concurrent_fetcher(self.app, fetch_path, file_name, 0,
-                                                                         packets - 1, aio.Semaphore(15), forwarding_hint=forwarding_hint):
-            self.data_storage.put_packet(key, data_bytes, internal=internal)  #TODO: check digest
+        def on_source_done(idx, srtt, alive):
+            # feed what this fetch observed of each node back into the replica selection
+            if source_nodes is None:
+                return
+            if not alive:
+                self.replica_selector.record_failure(source_nodes[idx])
+            elif srtt is not None:
+                self.replica_selector.record_rtt(source_nodes[idx], srtt)
+
+        if forwarding_hints:
+            fetcher = striped_fetcher(self.app, fetch_path, file_name, 0, packets - 1, forwarding_hints,
+                                      on_source_done=on_source_done)
+        else:
+            fetcher = concurrent_fetcher(self.app, fetch_path, file_name, 0, packets - 1, AdaptiveWindow(initial_window=15))
+        try:
+            async for (_, _, content, data_bytes, key) in fetcher:
+                self.data_storage.put_packet(key, data_bytes, internal=internal)  #TODO: check digest
+        except Exception as e:
+            self.logger.warning(f"\n[ACT][FETCH FAILED]* "
+                                f"\n\tFile name={file_name};"
+                                f"\n\terror={e}")
+            with suppress(ValueError):
+                self.fetching.remove(file_name)
+            self.global_view.retry_replication(file_name)
+            return
 
         end = time.time()
         duration = end - start
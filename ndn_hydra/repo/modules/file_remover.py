@@ -1,8 +1,5 @@
-import asyncio as aio
-from ndn_hydra.repo.modules.data_storage import DataStorage
-
 # Responsible for removing data from the data storage
 def remove_file(data_storage, file, config):
-    data_storage = DataStorage(config['data_storage_path'])
     keys = [file['file_name'] + f'/seg={seq}' for seq in range(file['packets'])]
-    aio.get_event_loop().run_in_executor(None, data_storage.remove_packets, keys)
+    # the storage stops serving the file now, and deletes it in the background
+    data_storage.enqueue_removal(keys)
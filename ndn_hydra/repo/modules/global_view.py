@@ -8,10 +8,16 @@
 #  @Pip-Library:   https://pypi.org/project/ndn-hydra
 # -------------------------------------------------------------
 
+import atexit
 import os
+import queue
 import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from sqlite3 import Error
-from typing import List, Tuple
+from typing import Callable, Dict, List, Set, Tuple, Union
 
 sql_create_nodes_tables = """
 CREATE TABLE IF NOT EXISTS nodes (
@@ -37,7 +43,8 @@ sql_create_stores_tables = """
 CREATE TABLE IF NOT EXISTS stores (
     id INTEGER PRIMARY KEY,
     file_name TEXT NOT NULL,
-    node_name NOT NULL
+    node_name NOT NULL,
+    UNIQUE (file_name, node_name)
 );
 """
 sql_create_backups_tables = """
@@ -46,20 +53,86 @@ CREATE TABLE IF NOT EXISTS backups (
     file_name TEXT NOT NULL,
     node_name NOT NULL,
     rank INTEGER NOT NULL,
-    nonce TEXT NOT NULL
+    nonce TEXT NOT NULL,
+    UNIQUE (file_name, node_name)
 );
 """
 sql_create_pending_stores_tables = """
 CREATE TABLE IF NOT EXISTS pending_stores (
     id INTEGER PRIMARY KEY,
     file_name TEXT NOT NULL,
-    node_name NOT NULL
+    node_name NOT NULL,
+    UNIQUE (file_name, node_name)
 );
 """
+# lookups by file_name are served by the (file_name, node_name) UNIQUE indexes
+sql_create_indexes = [
+    "CREATE INDEX IF NOT EXISTS stores_node_name ON stores (node_name);",
+    "CREATE INDEX IF NOT EXISTS backups_node_name ON backups (node_name);",
+    "CREATE INDEX IF NOT EXISTS backups_file_name_rank ON backups (file_name, rank);",
+    "CREATE INDEX IF NOT EXISTS pending_stores_node_name ON pending_stores (node_name);",
+]
+
+# bump when the schema changes and add the matching upgrade to GlobalView.__upgrade_schema
+SCHEMA_VERSION = 1
+
+FLUSH_POLL = 0.1  # seconds between checks that the writer is still alive while flushing
+
+# global views not closed yet, their journals are written out at exit
+_open_views = weakref.WeakSet()
+
+
+def _close_open_views():
+    for global_view in list(_open_views):
+        try:
+            global_view.close()
+        except RuntimeError as e:
+            print(e)
+
+
+atexit.register(_close_open_views)
+
+
+class NodeRecord:
+    __slots__ = ('node_name', 'favor', 'state_vector', 'expired')
+
+    def __init__(self, node_name, favor, state_vector, expired) -> None:
+        self.node_name, self.favor, self.state_vector, self.expired = node_name, favor, state_vector, expired
+
+
+class FileRecord:
+    __slots__ = ('file_name', 'desired_copies', 'packets', 'size', 'origin_node_name', 'fetch_path', 'packet_size',
+                 'expiration_time')
+
+    def __init__(self, file_name, desired_copies, packets, size, origin_node_name, fetch_path, packet_size,
+                 expiration_time) -> None:
+        self.file_name, self.desired_copies, self.packets, self.size = file_name, desired_copies, packets, size
+        self.origin_node_name, self.fetch_path, self.packet_size = origin_node_name, fetch_path, packet_size
+        self.expiration_time = expiration_time
+
+
+class BackupRecord:
+    __slots__ = ('node_name', 'rank', 'nonce')
+
+    def __init__(self, node_name, rank, nonce) -> None:
+        self.node_name, self.rank, self.nonce = node_name, rank, nonce
+
+
+class FileLocation:
+    __slots__ = ('packets', 'stores', 'active_stores')
+
+    def __init__(self, packets, stores, active_stores) -> None:
+        self.packets, self.stores, self.active_stores = packets, stores, active_stores
 
 
 class GlobalView:
-    def __init__(self, db: str):
+    """
+    The global view is held in memory and is authoritative: every read is served from
+    the in-memory model. Mutations are journaled and written behind to SQLite by a
+    writer thread, and the model is rebuilt from the database at startup.
+    """
+
+    def __init__(self, db: str, min_wire_version: int = 1):
         self.db = os.path.expanduser(db)
         if len(os.path.dirname(self.db)) > 0 and not os.path.exists(os.path.dirname(self.db)):
             try:
@@ -68,12 +141,47 @@ class GlobalView:
                 raise PermissionError(f'Could not create database directory: {self.db}') from None
             except FileExistsError:
                 pass
+        # in-memory model, mirroring the tables
+        self.nodes: Dict[str, NodeRecord] = {}
+        self.files: Dict[str, FileRecord] = {}
+        self.stores: Dict[str, Set[str]] = {}  # file_name -> node_names
+        self.backups: Dict[str, List[BackupRecord]] = {}  # file_name -> backups ordered by rank
+        self.pending_stores: Dict[str, Set[str]] = {}  # file_name -> node_names
+        # reverse indexes, node_name -> file_names
+        self.node_stores: Dict[str, Set[str]] = {}
+        self.node_backups: Dict[str, Set[str]] = {}
+        self.node_pending_stores: Dict[str, Set[str]] = {}
+        # replication deficit index: files with fewer stores than desired copies, and the
+        # files whose deficit or backup ranking changed since the last pop_replication_changes()
+        self.underreplicated: Set[str] = set()
+        self.replication_changes: Set[str] = set()
+        # backupable index: files with fewer stores and backups than twice the desired copies,
+        # and the files whose stores or backups changed since the last pop_backupable_changes()
+        self.backupable: Set[str] = set()
+        self.backupable_changes: Set[str] = set()
+        # file locations served to the read path, dropped whenever the stores of a file or the
+        # liveness of one of its stores change
+        self.locations: Dict[str, FileLocation] = {}
+        # load each node advertised in its last heartbeat, soft state that is not persisted
+        self.node_loads: Dict[str, Dict[str, float]] = {}
+        # group wire version each node advertised in its heartbeats, soft state that is not persisted
+        self.node_wire_versions: Dict[str, int] = {}
+        # group wire version every node that will ever join the group runs, pinned in the config
+        self.min_wire_version = min_wire_version
+        # persistence
+        self.__transaction_depth = 0
+        self.__batch_depth = 0
+        self.__batch = []
+        self.conn = self.__get_connection()
         self.__create_tables()
+        self.__load()
+        self.journal = queue.Queue()
+        self.writer_error = None  # what stopped the writer thread, if anything did
+        self.writer = threading.Thread(target=self.__write_behind, name='GlobalViewWriter', daemon=True)
+        self.writer.start()
+        _open_views.add(self)
 
     def __repr__(self):
-        self.connection = sqlite3.connect(self.db)
-        self.cursor = self.connection.cursor()
-
         tables = self.get_tables()
         db_repr = []
         for table in tables:
@@ -90,405 +198,704 @@ class GlobalView:
         return ["files", "stores", "backups", "nodes", "pending_stores"]
 
     def get_columns(self, table_name):
-        self.cursor.execute(f"PRAGMA table_info({table_name});")
-        return [column[1] for column in self.cursor.fetchall()]
+        return {
+            "files": ["file_name", "desired_copies", "packets", "size", "origin_node_name", "fetch_path",
+                      "packet_size", "expiration_time"],
+            "stores": ["file_name", "node_name"],
+            "backups": ["file_name", "node_name", "rank", "nonce"],
+            "nodes": ["node_name", "favor", "state_vector", "expired"],
+            "pending_stores": ["file_name", "node_name"],
+        }[table_name]
 
     def get_rows(self, table_name):
-        self.cursor.execute(f"SELECT * FROM {table_name};")
-        return self.cursor.fetchall()
+        if table_name == "files":
+            return [(f.file_name, f.desired_copies, f.packets, f.size, f.origin_node_name, f.fetch_path,
+                     f.packet_size, f.expiration_time) for f in self.files.values()]
+        if table_name == "stores":
+            return [(file_name, node_name) for file_name, node_names in self.stores.items() for node_name in sorted(node_names)]
+        if table_name == "backups":
+            return [(file_name, b.node_name, b.rank, b.nonce) for file_name, backups in self.backups.items() for b in backups]
+        if table_name == "nodes":
+            return [(n.node_name, n.favor, n.state_vector, 1 if n.expired else 0) for n in self.nodes.values()]
+        if table_name == "pending_stores":
+            return [(file_name, node_name) for file_name, node_names in self.pending_stores.items() for node_name in node_names]
+        return []
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Block until every journaled mutation has been written to the database.
+        :param timeout: float. Seconds to wait at most, None waits as long as the writer runs.
+        :return: bool. False if the timeout passed first.
+        :raises RuntimeError: the writer thread failed, with its exception as the cause.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.journal.all_tasks_done:
+            while self.journal.unfinished_tasks and self.writer.is_alive():
+                if deadline is not None and time.monotonic() >= deadline:
+                    return False
+                self.journal.all_tasks_done.wait(FLUSH_POLL)
+        self.__raise_writer_error()
+        return True
 
     def close(self):
-        self.connection.close()
+        if self.conn is None:
+            return
+        _open_views.discard(self)
+        if self.writer.is_alive():
+            self.journal.put(None)
+            self.writer.join()
+        self.conn.close()
+        self.conn = None
+        self.__raise_writer_error()
+
+    def __raise_writer_error(self):
+        if self.writer_error is not None:
+            raise RuntimeError(f'Global view writer failed, mutations were not written to {self.db}') \
+                from self.writer_error
 
     def __get_connection(self):
+        # one long-lived connection per GlobalView; sqlite3 keeps a per-connection
+        # cache of prepared statements keyed by the SQL text.
+        # after startup the connection is only used by the writer thread
         try:
-            return sqlite3.connect(self.db)
+            conn = sqlite3.connect(self.db, cached_statements=256, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            return conn
         except Error as e:
             print(e)
         return None
 
+    @contextmanager
+    def transaction(self):
+        """
+        Run every statement issued within the scope as one transaction.
+        Scopes can be nested, only the outermost one commits (or rolls back on error).
+        """
+        if self.__transaction_depth == 0 and self.conn is not None and not self.conn.in_transaction:
+            self.conn.execute('BEGIN')
+        self.__transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            self.__transaction_depth -= 1
+            if self.__transaction_depth == 0 and self.conn is not None:
+                self.conn.rollback()
+            raise
+        self.__transaction_depth -= 1
+        if self.__transaction_depth == 0 and self.conn is not None:
+            self.conn.commit()
+
     def __execute_sql(self, sql: str):
-        result = []
-        conn = self.__get_connection()
-        if conn is not None:
-            try:
-                c = conn.cursor()
-                c.execute(sql)
-                conn.commit()
-                result = c.fetchall()
-            except Error as e:
-                print(e)
-            conn.close()
-        return result
+        return self.__execute_sql_qmark(sql, ())
 
     def __execute_sql_qmark(self, sql: str, par: Tuple):
         result = []
-        conn = self.__get_connection()
-        if conn is not None:
+        if self.conn is not None:
             try:
-                c = conn.cursor()
+                c = self.conn.cursor()
                 c.execute(sql, par)
-                conn.commit()
                 result = c.fetchall()
+                if self.__transaction_depth == 0:
+                    self.conn.commit()
             except Error as e:
                 print(e)
-            conn.close()
         return result
 
+    @contextmanager
+    def batch(self):
+        """
+        Journal every mutation made within the scope as one entry, written in one transaction.
+        Each mutation stays atomic on its own. Scopes can be nested, only the outermost one journals.
+        """
+        self.__batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.__batch_depth -= 1
+            if self.__batch_depth == 0 and self.__batch:
+                self.journal.put(self.__batch)
+                self.__batch = []
+
+    def __journal(self, *statements: Tuple[str, Union[Tuple, List[Tuple]]]):
+        # one journal entry per logical mutation, or a list of them for a batch;
+        # a list of parameter tuples means executemany
+        if self.__batch_depth > 0:
+            self.__batch.append(statements)
+        else:
+            self.journal.put(statements)
+
+    def __apply_mutation(self, statements):
+        # every mutation is atomic: a failing statement rolls back the whole mutation only
+        c = self.conn.cursor()
+        c.execute("SAVEPOINT mutation")
+        try:
+            for sql, par in statements:
+                if isinstance(par, list):
+                    c.executemany(sql, par)
+                else:
+                    c.execute(sql, par)
+        except Error as e:
+            print(e)
+            c.execute("ROLLBACK TO mutation")
+        c.execute("RELEASE mutation")
+
+    def __write_behind(self):
+        try:
+            self.__write_journal()
+        except BaseException as e:
+            # flush() and close() raise it instead of waiting on a writer that is gone
+            print(e)
+            self.writer_error = e
+
+    def __write_journal(self):
+        # drains whatever has been journaled so far and writes it in one transaction
+        while True:
+            entries = [self.journal.get()]
+            while True:
+                try:
+                    entries.append(self.journal.get_nowait())
+                except queue.Empty:
+                    break
+            if self.conn is not None:
+                with self.transaction():
+                    for entry in entries:
+                        if isinstance(entry, list):
+                            for mutation in entry:
+                                self.__apply_mutation(mutation)
+                        elif entry is not None:
+                            self.__apply_mutation(entry)
+            for _ in entries:
+                self.journal.task_done()
+            if None in entries:
+                return
+
     def __create_tables(self):
-        self.__execute_sql(sql_create_nodes_tables)
-        self.__execute_sql(sql_create_files_tables)
-        self.__execute_sql(sql_create_stores_tables)
-        self.__execute_sql(sql_create_backups_tables)
-        self.__execute_sql(sql_create_pending_stores_tables)
+        with self.transaction():
+            self.__upgrade_schema()
+            self.__execute_sql(sql_create_nodes_tables)
+            self.__execute_sql(sql_create_files_tables)
+            self.__execute_sql(sql_create_stores_tables)
+            self.__execute_sql(sql_create_backups_tables)
+            self.__execute_sql(sql_create_pending_stores_tables)
+            for sql in sql_create_indexes:
+                self.__execute_sql(sql)
+            self.__execute_sql(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+    def __table_exists(self, table_name: str):
+        sql = """
+        SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?
+        """
+        return len(self.__execute_sql_qmark(sql, (table_name,))) > 0
+
+    def __upgrade_schema(self):
+        # upgrades an existing global_view.db in place, one version at a time
+        result = self.__execute_sql("PRAGMA user_version;")
+        version = result[0][0] if result else SCHEMA_VERSION
+        if version < 1:
+            # v1: UNIQUE (file_name, node_name) on stores, backups and pending_stores.
+            # tables are rebuilt, keeping the oldest row of every duplicated pair
+            for table_name, create_sql, columns in (
+                    ("stores", sql_create_stores_tables, "file_name, node_name"),
+                    ("backups", sql_create_backups_tables, "file_name, node_name, rank, nonce"),
+                    ("pending_stores", sql_create_pending_stores_tables, "file_name, node_name")):
+                if not self.__table_exists(table_name):
+                    continue
+                self.__execute_sql(f"ALTER TABLE {table_name} RENAME TO {table_name}_v0;")
+                self.__execute_sql(create_sql)
+                self.__execute_sql(f"""
+                INSERT OR IGNORE INTO {table_name} ({columns})
+                SELECT {columns} FROM {table_name}_v0 ORDER BY id
+                """)
+                self.__execute_sql(f"DROP TABLE {table_name}_v0;")
+
+    def __load(self):
+        # rebuilds the in-memory model from the database
+        for result in self.__execute_sql("SELECT node_name, favor, state_vector, expired FROM nodes"):
+            self.nodes[result[0]] = NodeRecord(result[0], result[1], result[2], result[3] != 0)
+        sql = """
+        SELECT file_name, desired_copies, packets, size, origin_node_name, fetch_path, packet_size, expiration_time
+        FROM files
+        """
+        for result in self.__execute_sql(sql):
+            self.files[result[0]] = FileRecord(*result)
+        for result in self.__execute_sql("SELECT file_name, node_name FROM stores ORDER BY id"):
+            self.__add_store(result[0], result[1])
+        for result in self.__execute_sql("SELECT file_name, node_name, rank, nonce FROM backups ORDER BY file_name, rank"):
+            self.__insert_backup(result[0], result[1], result[2], result[3])
+        for result in self.__execute_sql("SELECT file_name, node_name FROM pending_stores ORDER BY id"):
+            self.__add_pending_store(result[0], result[1])
+        for file_name in self.files:
+            self.__replication_changed(file_name)
+
+    @staticmethod
+    def __index_add(index: Dict[str, Set[str]], key: str, value: str):
+        try:
+            index[key].add(value)
+        except KeyError:
+            index[key] = {value}
+
+    @staticmethod
+    def __index_discard(index: Dict[str, Set[str]], key: str, value: str):
+        values = index.get(key)
+        if values is not None:
+            values.discard(value)
+            if not values:
+                del index[key]
+
+    def __replication_changed(self, file_name: str):
+        file = self.files.get(file_name)
+        stores = len(self.stores.get(file_name, ()))
+        if file is not None and stores < file.desired_copies:
+            self.underreplicated.add(file_name)
+        else:
+            self.underreplicated.discard(file_name)
+        if file is not None and (stores + len(self.backups.get(file_name, ()))) < (file.desired_copies * 2):
+            self.backupable.add(file_name)
+        else:
+            self.backupable.discard(file_name)
+        self.replication_changes.add(file_name)
+        self.backupable_changes.add(file_name)
+        self.locations.pop(file_name, None)
+
+    def __node_liveness_changed(self, node_name: str):
+        for file_name in self.node_stores.get(node_name, ()):
+            self.locations.pop(file_name, None)
+            # a store coming back may be the source a backup was waiting for
+            self.replication_changes.add(file_name)
+
+    def __add_store(self, file_name: str, node_name: str):
+        self.__index_add(self.stores, file_name, node_name)
+        self.__index_add(self.node_stores, node_name, file_name)
+        self.__replication_changed(file_name)
+
+    def __remove_store(self, file_name: str, node_name: str):
+        self.__index_discard(self.stores, file_name, node_name)
+        self.__index_discard(self.node_stores, node_name, file_name)
+        self.__replication_changed(file_name)
+
+    def __add_pending_store(self, file_name: str, node_name: str):
+        self.__index_add(self.pending_stores, file_name, node_name)
+        self.__index_add(self.node_pending_stores, node_name, file_name)
+        self.backupable_changes.add(file_name)
+
+    def __remove_pending_store(self, file_name: str, node_name: str):
+        self.__index_discard(self.pending_stores, file_name, node_name)
+        self.__index_discard(self.node_pending_stores, node_name, file_name)
+        self.backupable_changes.add(file_name)
+
+    def __find_backup(self, file_name: str, node_name: str):
+        for backup in self.backups.get(file_name, ()):
+            if backup.node_name == node_name:
+                return backup
+        return None
+
+    def __insert_backup(self, file_name: str, node_name: str, rank: int, nonce: str):
+        # same semantics as INSERT OR IGNORE with UNIQUE (file_name, node_name)
+        if self.__find_backup(file_name, node_name) is not None:
+            return
+        backups = self.backups.setdefault(file_name, [])
+        index = len(backups)
+        while index > 0 and backups[index - 1].rank > rank:
+            index -= 1
+        backups.insert(index, BackupRecord(node_name, rank, nonce))
+        self.__index_add(self.node_backups, node_name, file_name)
+        self.__replication_changed(file_name)
+
+    def __remove_backups(self, file_name: str, keep: Callable[[BackupRecord], bool]):
+        backups = self.backups.get(file_name)
+        if backups is None:
+            return
+        for backup in backups:
+            if not keep(backup):
+                self.__index_discard(self.node_backups, backup.node_name, file_name)
+        backups[:] = [backup for backup in backups if keep(backup)]
+        if not backups:
+            del self.backups[file_name]
+        self.__replication_changed(file_name)
 
     def __rerank_backups(self, file_name: str, node_name: str):
-        sql = """
-        SELECT DISTINCT file_name, node_name, rank
-        FROM backups
-        WHERE (file_name = ?) AND (node_name = ?)
+        backup = self.__find_backup(file_name, node_name)
+        if backup is None:
+            return
+        for other in self.backups[file_name]:
+            if other.rank > backup.rank:
+                other.rank -= 1
+        self.__replication_changed(file_name)
+
+    def __file_to_dict(self, file: FileRecord):
+        return {
+            'file_name': file.file_name,
+            'desired_copies': file.desired_copies,
+            'packets': file.packets,
+            'size': file.size,
+            'origin_node_name': file.origin_node_name,
+            'fetch_path': file.fetch_path,
+            'packet_size': file.packet_size,
+            'stores': self.get_stores(file.file_name),
+            'backups': self.get_backups(file.file_name),
+            'expiration_time': file.expiration_time,
+        }
+
+    def snapshot(self):
+        """
+        Return a copy of the whole view: the NodeRecords, and for each file a tuple of its FileRecord,
+        stores, BackupRecords (by rank) and pending stores.
         """
-        result = self.__execute_sql_qmark(sql, (file_name, node_name))
-        rank = -1
-        if len(result) == 1:
-            rank = result[0][2]
-        if rank != -1:
-            sql = """
-            UPDATE backups
-            SET rank = rank - 1
-            WHERE (file_name = ?) AND (rank > ?)
-            """
-            self.__execute_sql_qmark(sql, (file_name, rank))
+        nodes = [NodeRecord(node.node_name, node.favor, node.state_vector, node.expired) for node in self.nodes.values()]
+        files = []
+        for file in self.files.values():
+            files.append((
+                FileRecord(file.file_name, file.desired_copies, file.packets, file.size, file.origin_node_name,
+                           file.fetch_path, file.packet_size, file.expiration_time),
+                self.get_stores(file.file_name),
+                [BackupRecord(backup.node_name, backup.rank, backup.nonce) for backup in self.backups.get(file.file_name, ())],
+                self.get_pending_stores(file.file_name),
+            ))
+        return nodes, files
+
+    def restore(self, nodes: List[NodeRecord], files: List[Tuple[FileRecord, List[str], List[BackupRecord], List[str]]]):
+        """
+        Replace the whole view with a snapshot, as returned by snapshot().
+        """
+        changed = set(self.files)
+        self.nodes = {node.node_name: node for node in nodes}
+        self.files = {}
+        for index in (self.stores, self.backups, self.pending_stores,
+                      self.node_stores, self.node_backups, self.node_pending_stores):
+            index.clear()
+        self.locations.clear()
+        rows_files, rows_stores, rows_backups, rows_pending_stores = [], [], [], []
+        for file, stores, backups, pending_stores in files:
+            self.files[file.file_name] = file
+            changed.add(file.file_name)
+            rows_files.append((file.file_name, file.desired_copies, file.packets, file.size, file.origin_node_name,
+                               file.fetch_path, file.packet_size, file.expiration_time))
+            for node_name in stores:
+                self.__add_store(file.file_name, node_name)
+                rows_stores.append((file.file_name, node_name))
+            for backup in backups:
+                self.__insert_backup(file.file_name, backup.node_name, backup.rank, backup.nonce)
+                rows_backups.append((file.file_name, backup.node_name, backup.rank, backup.nonce))
+            for node_name in pending_stores:
+                self.__add_pending_store(file.file_name, node_name)
+                rows_pending_stores.append((file.file_name, node_name))
+        for file_name in changed:
+            self.__replication_changed(file_name)
+        self.__journal(
+            ("DELETE FROM nodes", ()),
+            ("DELETE FROM files", ()),
+            ("DELETE FROM stores", ()),
+            ("DELETE FROM backups", ()),
+            ("DELETE FROM pending_stores", ()),
+            ("INSERT INTO nodes (node_name, favor, state_vector, expired) VALUES (?, ?, ?, ?)",
+             [(node.node_name, node.favor, node.state_vector, int(node.expired)) for node in nodes]),
+            ("""
+            INSERT INTO files
+                (file_name, desired_copies, packets, size, origin_node_name, fetch_path, packet_size, expiration_time)
+            VALUES
+                (?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows_files),
+            ("INSERT OR IGNORE INTO stores (file_name, node_name) VALUES (?, ?)", rows_stores),
+            ("INSERT OR IGNORE INTO backups (file_name, node_name, rank, nonce) VALUES (?, ?, ?, ?)", rows_backups),
+            ("INSERT OR IGNORE INTO pending_stores (file_name, node_name) VALUES (?, ?)", rows_pending_stores),
+        )
 
     def get_node(self, node_name: str):
-        sql = """
-        SELECT DISTINCT node_name, favor, state_vector, expired
-        FROM nodes
-        WHERE node_name = ?
-        """
-        result = self.__execute_sql_qmark(sql, (node_name,))
-        if len(result) != 1:
+        node = self.nodes.get(node_name)
+        if node is None:
             return None
         return {
-            'node_name': result[0][0],
-            'favor': result[0][1],
-            'state_vector': result[0][2],
-            'expired': False if (result[0][3] == 0) else True
+            'node_name': node.node_name,
+            'favor': node.favor,
+            'state_vector': node.state_vector,
+            'expired': node.expired
         }
 
     def get_nodes(self, include_expired: bool = False):
-        if include_expired:
-            sql = """
-            SELECT DISTINCT node_name, favor, state_vector, expired
-            FROM nodes
-            """
-        else:
-            sql = """
-            SELECT DISTINCT node_name, favor, state_vector, expired
-            FROM nodes
-            WHERE expired = 0
-            """
-        results = self.__execute_sql(sql)
         nodes = []
-        for result in results:
-            nodes.append({
-                'node_name': result[0],
-                'favor': result[1],
-                'state_vector': result[2],
-                'expired': False if (result[3] == 0) else True
-            })
+        for node in self.nodes.values():
+            if include_expired or not node.expired:
+                nodes.append({
+                    'node_name': node.node_name,
+                    'favor': node.favor,
+                    'state_vector': node.state_vector,
+                    'expired': node.expired
+                })
         return nodes
 
     def get_top_k_nodes(self, k: int):
         # Get top k nodes based on the favor value
-        sql = """
-        SELECT DISTINCT node_name, favor, state_vector, expired
-        FROM nodes
-        WHERE expired = 0
-        ORDER BY favor DESC
-        LIMIT ?
-        """
-        results = self.__execute_sql_qmark(sql, (k,))
+        active_nodes = [node for node in self.nodes.values() if not node.expired]
+        active_nodes.sort(key=lambda node: node.favor, reverse=True)
         nodes = []
-        for result in results:
+        for node in active_nodes[:k]:
             nodes.append({
-                'node_name': result[0],
-                'favor': result[1],
-                'state_vector': result[2]
+                'node_name': node.node_name,
+                'favor': node.favor,
+                'state_vector': node.state_vector
             })
         return nodes
 
     def update_node(self, node_name: str, favor: float, state_vector: int):
+        node = self.nodes.get(node_name)
+        if node is None:
+            self.nodes[node_name] = NodeRecord(node_name, favor, state_vector, True)
+        else:
+            node.favor, node.state_vector = favor, state_vector
         sql = """
         INSERT OR REPLACE INTO nodes
             (node_name, favor, state_vector, expired)
         VALUES
             (?, ?, ?, COALESCE((SELECT expired FROM nodes WHERE node_name = ?), 1))
         """
-        self.__execute_sql_qmark(sql, (node_name, favor, state_vector, node_name))
+        self.__journal((sql, (node_name, favor, state_vector, node_name)))
+
+    def update_node_load(self, node_name: str, load: Dict[str, float]):
+        self.node_loads[node_name] = load
+
+    def get_node_load(self, node_name: str):
+        return self.node_loads.get(node_name)
+
+    def update_node_wire_version(self, node_name: str, wire_version: int):
+        self.node_wire_versions[node_name] = wire_version
+
+    def get_wire_version(self):
+        """
+        The wire version every node that reads the group messages reads. Nodes count as version 1
+        until they advertise another, and expired ones count too: new nodes start out expired, and
+        an expired node may come back and read the messages it missed. A node that has not joined
+        yet will replay the whole history, so it is never above the pinned min_wire_version.
+        """
+        advertised = min((self.node_wire_versions.get(node_name, 1) for node_name in self.nodes), default=1)
+        return min(advertised, self.min_wire_version)
 
     def renew_node(self, node_name: str):
+        node = self.nodes.get(node_name)
+        if node is not None:
+            if node.expired:
+                self.__node_liveness_changed(node_name)
+            node.expired = False
         sql = """
         UPDATE nodes
         SET expired = 0
         WHERE node_name = ?
         """
-        self.__execute_sql_qmark(sql, (node_name,))
+        self.__journal((sql, (node_name,)))
 
     def expire_node(self, node_name: str):
         # stores
-        sql = """
-        DELETE FROM stores WHERE node_name = ?
-        """
-        self.__execute_sql_qmark(sql, (node_name,))
+        for file_name in list(self.node_stores.get(node_name, ())):
+            self.__remove_store(file_name, node_name)
         # backups
-        sql = """
-        SELECT file_name, node_name
-        FROM backups
-        WHERE node_name = ?
-        """
-        backups = self.__execute_sql_qmark(sql, (node_name,))
-        for backup in backups:
+        for file_name in list(self.node_backups.get(node_name, ())):
             # rerank
-            self.__rerank_backups(backup[0], node_name)
-        # remove
-        sql = """
-        DELETE FROM backups WHERE node_name = ?
-        """
-        self.__execute_sql_qmark(sql, (node_name,))
+            self.__rerank_backups(file_name, node_name)
+            # remove
+            self.__remove_backups(file_name, lambda backup: backup.node_name != node_name)
         # pending_stores
-        sql = """
-        DELETE FROM pending_stores WHERE node_name = ?
-        """
-        self.__execute_sql_qmark(sql, (node_name,))
+        for file_name in list(self.node_pending_stores.get(node_name, ())):
+            self.__remove_pending_store(file_name, node_name)
         # expire node
-        sql = """
-        UPDATE nodes
-        SET expired = 1
-        WHERE node_name = ?
+        node = self.nodes.get(node_name)
+        if node is not None:
+            node.expired = True
+            self.__node_liveness_changed(node_name)
+        # rerank every file this node backed up with one set-based update
+        sql_rerank = """
+        UPDATE backups
+        SET rank = rank - 1
+        WHERE file_name IN (SELECT file_name FROM backups WHERE node_name = ?)
+            AND rank > (SELECT b.rank FROM backups AS b WHERE (b.file_name = backups.file_name) AND (b.node_name = ?))
         """
-        self.__execute_sql_qmark(sql, (node_name,))
+        self.__journal(
+            (sql_rerank, (node_name, node_name)),
+            ("DELETE FROM stores WHERE node_name = ?", (node_name,)),
+            ("DELETE FROM backups WHERE node_name = ?", (node_name,)),
+            ("DELETE FROM pending_stores WHERE node_name = ?", (node_name,)),
+            ("UPDATE nodes SET expired = 1 WHERE node_name = ?", (node_name,)),
+        )
 
     def __split_digests(self, digests: bytes, size: int):
         digests_bytes = bytes(digests)
         return [digests_bytes[i:i + size] for i in range(0, len(digests_bytes), size)]
 
     def get_file(self, file_name: str):
-        sql = """
-        SELECT DISTINCT
-            file_name, desired_copies, packets, size, origin_node_name, fetch_path, packet_size, expiration_time
-        FROM files
-        WHERE file_name = ?
-        """
-        result = self.__execute_sql_qmark(sql, (file_name,))
-        if len(result) != 1:
+        file = self.files.get(file_name)
+        if file is None:
             return None
-        return {
-            'file_name': result[0][0],
-            'desired_copies': result[0][1],
-            'packets': result[0][2],
-            'size': result[0][3],
-            'origin_node_name': result[0][4],
-            'fetch_path': result[0][5],
-            'packet_size': result[0][6],
-            'stores': self.get_stores(result[0][0]),
-            'backups': self.get_backups(result[0][0]),
-            'expiration_time': result[0][7],
-        }
+        return self.__file_to_dict(file)
 
     def get_files(self):
-        sql = """
-        SELECT DISTINCT
-            file_name, desired_copies, packets, size, origin_node_name, fetch_path, packet_size, expiration_time
-        FROM files
+        return [self.__file_to_dict(file) for file in self.files.values()]
+
+    def get_file_location(self, file_name: str):
         """
-        results = self.__execute_sql(sql)
-        files = []
-        for result in results:
-            files.append({
-                'file_name': result[0],
-                'desired_copies': result[1],
-                'packets': result[2],
-                'size': result[3],
-                'origin_node_name': result[4],
-                'fetch_path': result[5],
-                'packet_size': result[6],
-                'stores': self.get_stores(result[0]),
-                'backups': self.get_backups(result[0]),
-                'expiration_time': result[7],
-            })
-        return files
+        Return the FileLocation of a file (packets, stores, and stores on active nodes), or None.
+        Records are cached until the file's stores or the liveness of its stores change.
+        """
+        location = self.locations.get(file_name)
+        if location is None:
+            file = self.files.get(file_name)
+            if file is None:
+                return None
+            stores = self.get_stores(file_name)
+            active_stores = [node_name for node_name in stores
+                             if node_name in self.nodes and not self.nodes[node_name].expired]
+            location = self.locations[file_name] = FileLocation(file.packets, stores, active_stores)
+        return location
 
     def get_underreplicated_files(self):
-        files = self.get_files()
-        underreplicated_files = []
-        for file in files:
-            if len(file['stores']) < file['desired_copies']:
-                underreplicated_files.append(file)
-        return underreplicated_files
+        return [self.__file_to_dict(self.files[file_name]) for file_name in self.underreplicated]
+
+    def pop_replication_changes(self):
+        """
+        Return the under-replicated files whose deficit or backup ranking changed since the
+        previous call, and start tracking changes anew.
+        """
+        changes, self.replication_changes = self.replication_changes, set()
+        return [self.__file_to_dict(self.files[file_name]) for file_name in changes
+                if file_name in self.underreplicated]
+
+    def retry_replication(self, file_name: str):
+        """
+        Hand a file to the next pop_replication_changes() again, e.g. after a fetch of it could not start or failed.
+        """
+        if file_name in self.files:
+            self.replication_changes.add(file_name)
 
     def get_backupable_files(self):
-        files = self.get_files()
-        backupable_files = []
-        for file in files:
-            if (len(file['stores']) + len(file['backups'])) < (file['desired_copies'] * 2):
-                backupable_files.append(file)
-        return backupable_files
+        return [self.__file_to_dict(self.files[file_name]) for file_name in self.backupable]
+
+    def pop_backupable_changes(self):
+        """
+        Return the names of the files whose stores or backups changed since the previous call,
+        whether they are still backupable or not, and start tracking changes anew.
+        """
+        changes, self.backupable_changes = self.backupable_changes, set()
+        return changes
+
+    def is_backupable(self, file_name: str):
+        return file_name in self.backupable
+
+    def holds_file(self, file_name: str, node_name: str):
+        """
+        Whether the node stores, is fetching to store, or backs up the file.
+        """
+        return (file_name in self.node_stores.get(node_name, ())
+                or file_name in self.node_pending_stores.get(node_name, ())
+                or file_name in self.node_backups.get(node_name, ()))
 
     def add_file(self, file_name: str, size: int, origin_node_name: str, fetch_path: str, packet_size: int,
                  packets: int, desired_copies: int, expiration_time: int):
+        if file_name not in self.files:
+            self.files[file_name] = FileRecord(file_name, desired_copies, packets, size, origin_node_name, fetch_path,
+                                               packet_size, expiration_time)
+            self.__replication_changed(file_name)
         sql = """
         INSERT OR IGNORE INTO files
             (file_name, desired_copies, packets, size, origin_node_name, fetch_path, packet_size, expiration_time)
         VALUES
             (?, ?, ?, ?, ?, ?, ?, ?)
         """
-        self.__execute_sql_qmark(sql, (
-        file_name, desired_copies, packets, size, origin_node_name, fetch_path, packet_size, expiration_time))
+        self.__journal((sql, (
+        file_name, desired_copies, packets, size, origin_node_name, fetch_path, packet_size, expiration_time)))
 
     def delete_file(self, file_name: str):
         # stores
-        sql = """
-        DELETE FROM stores WHERE file_name = ?
-        """
-        self.__execute_sql_qmark(sql, (file_name,))
-        # backups
-        sql = """
-        DELETE FROM backups WHERE file_name = ?
-        """
-        self.__execute_sql_qmark(sql, (file_name,))
+        for node_name in list(self.stores.get(file_name, ())):
+            self.__remove_store(file_name, node_name)
         # backups
-        sql = """
-        SELECT DISTINCT file_name, node_name
-        FROM backups
-        WHERE file_name = ?
-        """
-        backups = self.__execute_sql_qmark(sql, (file_name,))
-        for backup in backups:
-            # rerank
-            self.__rerank_backups(file_name, backup[1])
-        # remove
-        sql = """
-        DELETE FROM backups WHERE file_name = ?
-        """
-        self.__execute_sql_qmark(sql, (file_name,))
+        self.__remove_backups(file_name, lambda backup: False)
         # pending_stores
-        sql = """
-        DELETE FROM pending_stores WHERE file_name = ?
-        """
-        self.__execute_sql_qmark(sql, (file_name,))
+        for node_name in list(self.pending_stores.get(file_name, ())):
+            self.__remove_pending_store(file_name, node_name)
         # insertions
-        sql = """
-        DELETE FROM files WHERE file_name = ?
-        """
-        self.__execute_sql_qmark(sql, (file_name,))
+        self.files.pop(file_name, None)
+        self.__replication_changed(file_name)
+        self.__journal(
+            ("DELETE FROM stores WHERE file_name = ?", (file_name,)),
+            ("DELETE FROM backups WHERE file_name = ?", (file_name,)),
+            ("DELETE FROM pending_stores WHERE file_name = ?", (file_name,)),
+            ("DELETE FROM files WHERE file_name = ?", (file_name,)),
+        )
 
     def update_file(self, file_name: str, expiration_time: int):
+        file = self.files.get(file_name)
+        if file is not None:
+            file.expiration_time = expiration_time
         sql = """
         UPDATE files
         SET expiration_time = ?
         WHERE file_name = ?
         """
-        self.__execute_sql_qmark(sql, (expiration_time, file_name))
+        self.__journal((sql, (expiration_time, file_name)))
 
     def store_file(self, file_name: str, node_name: str):
         # rerank backuped_by
         self.__rerank_backups(file_name, node_name)
         # remove from backuped_by
-        sql = """
-        DELETE FROM backups WHERE (file_name = ?) AND (node_name = ?)
-        """
-        self.__execute_sql_qmark(sql, (file_name, node_name))
+        self.__remove_backups(file_name, lambda backup: backup.node_name != node_name)
         # add to stored_by
-        sql = """
-        INSERT OR IGNORE INTO stores
-            (file_name, node_name)
-        VALUES
-            (?, ?)
+        self.__add_store(file_name, node_name)
+        sql_rerank = """
+        UPDATE backups
+        SET rank = rank - 1
+        WHERE (file_name = ?)
+            AND rank > (SELECT b.rank FROM backups AS b WHERE (b.file_name = ?) AND (b.node_name = ?))
         """
-        self.__execute_sql_qmark(sql, (file_name, node_name))
+        self.__journal(
+            (sql_rerank, (file_name, file_name, node_name)),
+            ("DELETE FROM backups WHERE (file_name = ?) AND (node_name = ?)", (file_name, node_name)),
+            ("INSERT OR IGNORE INTO stores (file_name, node_name) VALUES (?, ?)", (file_name, node_name)),
+        )
 
     def set_backups(self, file_name: str, backup_list: List[Tuple[str, str]]):
         # remove previous backups
-        sql = """
-        DELETE FROM backups WHERE (file_name = ?)
-        """
-        self.__execute_sql_qmark(sql, (file_name,))
+        self.__remove_backups(file_name, lambda backup: False)
         # add backups
-        length = len(backup_list)
-        for rank in range(length):
-            backup = backup_list[rank]
-            sql = """
-            INSERT OR IGNORE INTO backups
-                (file_name, node_name, rank, nonce)
-            VALUES
-                (?, ?, ?, ?)
-            """
-            self.__execute_sql_qmark(sql, (file_name, backup[0], rank, backup[1]))
+        rows = []
+        for rank, backup in enumerate(backup_list):
+            self.__insert_backup(file_name, backup[0], rank, backup[1])
+            rows.append((file_name, backup[0], rank, backup[1]))
+        self.__journal(
+            ("DELETE FROM backups WHERE (file_name = ?)", (file_name,)),
+            ("INSERT OR IGNORE INTO backups (file_name, node_name, rank, nonce) VALUES (?, ?, ?, ?)", rows),
+        )
 
     def add_backup(self, file_name: str, node_name: str, rank: int, nonce: str):
         # delete all backups with larger rank value
-        sql = """
-        DELETE FROM backups
-        WHERE (file_name = ?) AND rank >= ?
-        """
-        self.__execute_sql_qmark(sql, (file_name, rank))
+        self.__remove_backups(file_name, lambda backup: backup.rank < rank)
         # add this backup
-        sql = """
-        INSERT OR IGNORE INTO backups
-            (file_name, node_name, rank, nonce)
-        VALUES
-            (?, ?, ?, ?)
-        """
-        self.__execute_sql_qmark(sql, (file_name, node_name, rank, nonce))
+        self.__insert_backup(file_name, node_name, rank, nonce)
+        self.__journal(
+            ("DELETE FROM backups WHERE (file_name = ?) AND rank >= ?", (file_name, rank)),
+            ("INSERT OR IGNORE INTO backups (file_name, node_name, rank, nonce) VALUES (?, ?, ?, ?)",
+             (file_name, node_name, rank, nonce)),
+        )
 
     def get_stores(self, file_name: str):
-        sql = """
-        SELECT DISTINCT file_name, node_name
-        FROM stores
-        WHERE file_name = ?
-        ORDER BY node_name ASC
-        """
-        results = self.__execute_sql_qmark(sql, (file_name,))
-        stores = []
-        for result in results:
-            stores.append(result[1])
-        return stores
+        return sorted(self.stores.get(file_name, ()))
 
     def get_backups(self, file_name: str):
-        sql = """
-        SELECT DISTINCT file_name, node_name, rank, nonce
-        FROM backups
-        WHERE file_name = ?
-        ORDER BY rank
-        """
-        results = self.__execute_sql_qmark(sql, (file_name,))
         backups = []
-        for result in results:
+        for backup in self.backups.get(file_name, ()):
             backups.append({
-                'node_name': result[1],
-                'rank': result[2],
-                'nonce': result[3]
+                'node_name': backup.node_name,
+                'rank': backup.rank,
+                'nonce': backup.nonce
             })
         return backups
 
     def get_pending_stores(self, file_name: str):
-        sql = """
-        SELECT DISTINCT file_name, node_name
-        FROM pending_stores
-        WHERE file_name = ?
-        """
-        results = self.__execute_sql_qmark(sql, (file_name,))
-        pending_stores = []
-        for result in results:
-            pending_stores.append(result[1])
-        return pending_stores
+        return list(self.pending_stores.get(file_name, ()))
 
     def add_pending_store(self, file_name: str, node_name: str):
+        self.__add_pending_store(file_name, node_name)
         sql = """
         INSERT OR IGNORE INTO pending_stores
             (file_name, node_name)
         VALUES
             (?, ?)
         """
-        self.__execute_sql_qmark(sql, (file_name, node_name))
+        self.__journal((sql, (file_name, node_name)))
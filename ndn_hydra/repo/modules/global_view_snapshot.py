@@ -0,0 +1,159 @@
+# -------------------------------------------------------------
+# NDN Hydra Global View Snapshot
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+from typing import Dict, List, Tuple
+from ndn.encoding import *
+from ndn_hydra.repo.modules.global_view import GlobalView, NodeRecord, FileRecord, BackupRecord
+
+SNAPSHOT_FORMAT = 1  # bump when the encoding changes, nodes refuse snapshots of other formats
+
+
+class SnapshotTypes:
+    FORMAT = 601
+    VECTOR_ENTRY = 602
+    NID = 603
+    SEQNO = 604
+
+    NODE = 605
+    NODE_NAME = 606
+    FAVOR = 607
+    STATE_VECTOR = 608
+    EXPIRED = 609
+
+    FILE = 610
+    FILE_NAME = 611
+    DESIRED_COPIES = 612
+    PACKETS = 613
+    SIZE = 614
+    ORIGIN_NODE_NAME = 615
+    FETCH_PATH = 616
+    PACKET_SIZE = 617
+    EXPIRATION_TIME = 618
+    STORE = 619
+    BACKUP = 620
+    RANK = 621
+    NONCE = 622
+    PENDING_STORE = 623
+
+
+class VectorEntryTlv(TlvModel):
+    nid = BytesField(SnapshotTypes.NID)
+    seqno = UintField(SnapshotTypes.SEQNO)
+
+
+class NodeTlv(TlvModel):
+    node_name = BytesField(SnapshotTypes.NODE_NAME)
+    favor = BytesField(SnapshotTypes.FAVOR)
+    state_vector = UintField(SnapshotTypes.STATE_VECTOR)
+    expired = UintField(SnapshotTypes.EXPIRED)
+
+
+class BackupTlv(TlvModel):
+    node_name = BytesField(SnapshotTypes.NODE_NAME)
+    rank = UintField(SnapshotTypes.RANK)
+    nonce = BytesField(SnapshotTypes.NONCE)
+
+
+class FileTlv(TlvModel):
+    file_name = BytesField(SnapshotTypes.FILE_NAME)
+    desired_copies = UintField(SnapshotTypes.DESIRED_COPIES)
+    packets = UintField(SnapshotTypes.PACKETS)
+    size = UintField(SnapshotTypes.SIZE)
+    origin_node_name = BytesField(SnapshotTypes.ORIGIN_NODE_NAME)
+    fetch_path = BytesField(SnapshotTypes.FETCH_PATH)
+    packet_size = UintField(SnapshotTypes.PACKET_SIZE)
+    expiration_time = UintField(SnapshotTypes.EXPIRATION_TIME)
+    stores = RepeatedField(BytesField(SnapshotTypes.STORE))
+    backups = RepeatedField(ModelField(SnapshotTypes.BACKUP, BackupTlv))
+    pending_stores = RepeatedField(BytesField(SnapshotTypes.PENDING_STORE))
+
+
+class GlobalViewSnapshotTlv(TlvModel):
+    format = UintField(SnapshotTypes.FORMAT)
+    vector = RepeatedField(ModelField(SnapshotTypes.VECTOR_ENTRY, VectorEntryTlv))
+    # nodes and files are encoded one by one: encoding a long RepeatedField of ModelFields
+    # is quadratic in python-ndn, since every element copies the markers of the ones before it
+    nodes = RepeatedField(BytesField(SnapshotTypes.NODE))  # encoded NodeTlv
+    files = RepeatedField(BytesField(SnapshotTypes.FILE))  # encoded FileTlv
+
+
+def encode_snapshot(global_view: GlobalView, vector: Dict[str, int]) -> bytes:
+    """
+    Encode the whole global view, along with the group messages it reflects.
+    :param vector: Dict[str, int]. The last group message applied to the view, per producer.
+    """
+    nodes, files = global_view.snapshot()
+    snapshot = GlobalViewSnapshotTlv()
+    snapshot.format = SNAPSHOT_FORMAT
+    snapshot.vector = []
+    for nid, seqno in vector.items():
+        entry = VectorEntryTlv()
+        entry.nid = nid.encode()
+        entry.seqno = seqno
+        snapshot.vector.append(entry)
+    snapshot.nodes = []
+    for node in nodes:
+        node_tlv = NodeTlv()
+        node_tlv.node_name = node.node_name.encode()
+        node_tlv.favor = str(node.favor).encode()
+        node_tlv.state_vector = node.state_vector
+        node_tlv.expired = int(node.expired)
+        snapshot.nodes.append(node_tlv.encode())
+    snapshot.files = []
+    for file, stores, backups, pending_stores in files:
+        file_tlv = FileTlv()
+        file_tlv.file_name = file.file_name.encode()
+        file_tlv.desired_copies = file.desired_copies
+        file_tlv.packets = file.packets
+        file_tlv.size = file.size
+        file_tlv.origin_node_name = file.origin_node_name.encode()
+        file_tlv.fetch_path = file.fetch_path.encode()
+        file_tlv.packet_size = file.packet_size
+        file_tlv.expiration_time = file.expiration_time
+        file_tlv.stores = [node_name.encode() for node_name in stores]
+        file_tlv.backups = []
+        for backup in backups:
+            backup_tlv = BackupTlv()
+            backup_tlv.node_name = backup.node_name.encode()
+            backup_tlv.rank = backup.rank
+            backup_tlv.nonce = backup.nonce.encode()
+            file_tlv.backups.append(backup_tlv)
+        file_tlv.pending_stores = [node_name.encode() for node_name in pending_stores]
+        snapshot.files.append(file_tlv.encode())
+    return bytes(snapshot.encode())
+
+
+def decode_snapshot(raw_bytes: bytes) -> Tuple[Dict[str, int], List[NodeRecord],
+                                               List[Tuple[FileRecord, List[str], List[BackupRecord], List[str]]]]:
+    """
+    Decode a snapshot into its vector, and the records GlobalView.restore takes.
+    :raises ValueError: the snapshot is of another format.
+    """
+    snapshot = GlobalViewSnapshotTlv.parse(raw_bytes)
+    if snapshot.format != SNAPSHOT_FORMAT:
+        raise ValueError(f'Unsupported global view snapshot format {snapshot.format}')
+    vector = {bytes(entry.nid).decode(): entry.seqno for entry in snapshot.vector}
+    nodes = []
+    for node_bytes in snapshot.nodes:
+        node = NodeTlv.parse(node_bytes)
+        nodes.append(NodeRecord(bytes(node.node_name).decode(), float(bytes(node.favor).decode()),
+                                node.state_vector, node.expired != 0))
+    files = []
+    for file_bytes in snapshot.files:
+        file = FileTlv.parse(file_bytes)
+        record = FileRecord(bytes(file.file_name).decode(), file.desired_copies, file.packets, file.size,
+                            bytes(file.origin_node_name).decode(), bytes(file.fetch_path).decode(), file.packet_size,
+                            file.expiration_time)
+        stores = [bytes(node_name).decode() for node_name in file.stores]
+        backups = [BackupRecord(bytes(backup.node_name).decode(), backup.rank, bytes(backup.nonce).decode())
+                   for backup in file.backups]
+        pending_stores = [bytes(node_name).decode() for node_name in file.pending_stores]
+        files.append((record, stores, backups, pending_stores))
+    return vector, nodes, files
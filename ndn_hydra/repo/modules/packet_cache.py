@@ -0,0 +1,63 @@
+# -------------------------------------------------------------
+# NDN Hydra Packet Cache
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+class PacketCache:
+    """
+    A least-recently-used cache of stored packets, bounded by the total bytes it holds.
+    Keys are the name bytes the data storage indexes packets by.
+    """
+
+    def __init__(self, max_bytes: int):
+        """
+        :param max_bytes: byte budget of the cache, 0 disables it.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: OrderedDict = OrderedDict()  # key -> packet, least recently used first
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        data = self.entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key: bytes, data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        self.invalidate(key)
+        self.entries[key] = data
+        self.size += len(data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def invalidate(self, key: bytes):
+        data = self.entries.pop(key, None)
+        if data is not None:
+            self.size -= len(data)
+
+    def metrics(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'packets': len(self.entries),
+            'bytes': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': (self.hits / lookups) if lookups else 0.0,
+        }
@@ -0,0 +1,88 @@
+# -------------------------------------------------------------
+# NDN Hydra Read Ahead
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+import asyncio as aio
+from collections import OrderedDict
+from typing import Dict
+from ndn.storage import Storage
+
+MAX_STREAMS = 1024  # files whose access pattern is tracked at once
+
+
+class ReadStream:
+    __slots__ = ('last', 'run', 'loaded_to')
+
+    def __init__(self, seq: int) -> None:
+        self.last = seq  # highest segment read so far
+        self.run = 0  # consecutive reads close ahead of or behind the last one
+        self.loaded_to = seq  # highest segment already prefetched
+
+
+class ReadAhead:
+    """
+    Detects sequential reads of a file and has the storage prefetch the next segments
+    (DataStorage loads them into its packet cache with one range query, BlobStorage into the
+    page cache), ahead of the interests asking for them.
+    Consumers pipeline their interests, so reads within window segments of the last one
+    count as sequential even when they arrive out of order.
+    """
+
+    def __init__(self, data_storage: Storage, window: int, max_streams: int = MAX_STREAMS):
+        """
+        :param data_storage: Storage, DataStorage or BlobStorage.
+        :param window: int. Segments to keep loaded ahead of a sequential reader, 0 disables read-ahead.
+        :param max_streams: int. Files tracked at once, least recently read first out.
+        """
+        self.data_storage = data_storage
+        self.window = window if hasattr(data_storage, 'prefetch_packets') else 0
+        self.max_streams = max_streams
+        self.streams: OrderedDict = OrderedDict()  # file_name -> ReadStream, least recently read first
+        self.loaded = 0
+
+    def on_read(self, file_name: str, seq: int, packets: int):
+        """
+        Record a read of a segment, and schedule loading the next ones if the file is read sequentially.
+        :param file_name: str. The file read.
+        :param seq: int. The segment read.
+        :param packets: int. Number of segments of the file.
+        """
+        if not self.window:
+            return
+        stream = self.streams.pop(file_name, None)
+        if stream is None:
+            stream = ReadStream(seq)
+        elif abs(seq - stream.last) <= self.window:
+            stream.run += 1
+            stream.last = max(stream.last, seq)
+        else:
+            stream.last, stream.run, stream.loaded_to = seq, 0, seq
+        self.streams[file_name] = stream
+        if len(self.streams) > self.max_streams:
+            self.streams.popitem(last=False)
+
+        # refill once the reader is half way through what was prefetched
+        if stream.run < 2 or stream.last + self.window // 2 < stream.loaded_to:
+            return
+        start = max(stream.loaded_to, stream.last) + 1
+        end = min(stream.last + self.window, packets - 1)
+        if start > end:
+            return
+        stream.loaded_to = end
+        # load after the current interest is answered
+        aio.get_event_loop().call_soon(self._load, file_name, start, end)
+
+    def _load(self, file_name: str, start: int, end: int):
+        self.loaded += self.data_storage.prefetch_packets(file_name, start, end)
+
+    def metrics(self) -> Dict:
+        return {
+            'streams': len(self.streams),
+            'loaded': self.loaded,
+        }
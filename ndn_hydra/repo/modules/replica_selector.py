@@ -0,0 +1,76 @@
+# -------------------------------------------------------------
+# NDN Hydra Replica Selector
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+import random
+import time
+from collections import deque
+from typing import Dict, Iterable, List
+from ndn_hydra.repo.modules.global_view import GlobalView
+
+FAILURE_MEMORY = 300  # seconds a serve failure counts against a node
+
+
+class ReplicaSelector:
+    """
+    Orders the nodes storing a file from the most to the least preferable source.
+    Nodes are scored by the load they advertise in their heartbeats (rtt, num_users, bandwidth),
+    the RTT this node measured while fetching from them, and their recent serve failures.
+    """
+
+    def __init__(self, global_view: GlobalView, node_name: str, failure_memory: float = FAILURE_MEMORY):
+        """
+        :param global_view: Global View, holding the load advertised by each node.
+        :param node_name: str. This node, always ranked first when it stores the file.
+        :param failure_memory: float. Seconds a serve failure counts against a node.
+        """
+        self.global_view = global_view
+        self.node_name = node_name
+        self.failure_memory = failure_memory
+        self.rtts: Dict[str, float] = {}  # node_name -> smoothed RTT measured by this node, ms
+        self.failures: Dict[str, deque] = {}  # node_name -> times of recent serve failures
+
+    def record_rtt(self, node_name: str, rtt: float):
+        """
+        :param rtt: float. RTT in milliseconds measured while fetching from the node.
+        """
+        srtt = self.rtts.get(node_name)
+        self.rtts[node_name] = rtt if srtt is None else 0.875 * srtt + 0.125 * rtt
+
+    def record_failure(self, node_name: str):
+        self.failures.setdefault(node_name, deque()).append(time.monotonic())
+
+    def recent_failures(self, node_name: str) -> int:
+        failures = self.failures.get(node_name)
+        if not failures:
+            return 0
+        horizon = time.monotonic() - self.failure_memory
+        while failures and failures[0] < horizon:
+            failures.popleft()
+        return len(failures)
+
+    def score(self, node_name: str) -> float:
+        """
+        Expected cost of fetching from a node, lower is better. Every recent failure doubles it.
+        """
+        load = self.global_view.get_node_load(node_name) or {}
+        rtt = self.rtts.get(node_name, load.get('rtt', 0.0))
+        return ((1 + rtt) * (1 + load.get('num_users', 0.0)) / (1 + load.get('bandwidth', 0.0))
+                * (2 ** self.recent_failures(node_name)))
+
+    def rank(self, node_names: Iterable[str]) -> List[str]:
+        """
+        Return the nodes ordered by preference. Ties are broken randomly to spread the load.
+        """
+        candidates = [node_name for node_name in node_names if node_name != self.node_name]
+        random.shuffle(candidates)
+        candidates.sort(key=self.score)
+        if self.node_name in node_names:
+            candidates.insert(0, self.node_name)
+        return candidates
@@ -0,0 +1,106 @@
+# -------------------------------------------------------------
+# NDN Hydra Sync Catch-Up
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+import asyncio as aio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+CATCH_UP_WINDOW = 16  # group messages fetched concurrently per producer
+CATCH_UP_RETRIES = 2  # retries of a group message before it is skipped
+
+
+class ProducerCatchUp:
+    __slots__ = ('nid', 'next_seqno', 'high_seqno', 'worker', 'started', 'applied', 'failed')
+
+    def __init__(self, nid: str, low_seqno: int, high_seqno: int) -> None:
+        self.nid = nid
+        self.next_seqno = low_seqno  # next message to apply
+        self.high_seqno = high_seqno  # last message known to exist
+        self.worker = None
+        self.started = time.monotonic()
+        self.applied = 0
+        self.failed = 0
+
+
+class SyncCatchUp:
+    """
+    Fetches the group messages a node missed, with a window of concurrent fetches per producer.
+    Messages of a producer are still applied one at a time, in seqno order. A message that cannot
+    be fetched after the retries is skipped, so a lost message never stalls its producer.
+    """
+
+    def __init__(self, fetch: Callable[[str, int, int], Awaitable[Optional[bytes]]],
+                 apply: Callable[[str, int, bytes], None], window: int = CATCH_UP_WINDOW,
+                 retries: int = CATCH_UP_RETRIES):
+        """
+        :param fetch: async (nid, seqno, retries) -> the message, or None if it could not be fetched.
+        :param apply: (nid, seqno, message) -> None, called in seqno order for each producer.
+        :param window: int. Messages fetched concurrently per producer.
+        :param retries: int. Retries of a message before it is skipped.
+        """
+        self.fetch = fetch
+        self.apply = apply
+        self.window = window
+        self.retries = retries
+        self.producers: Dict[str, ProducerCatchUp] = {}
+        self.applied = 0
+        self.failed = 0
+        self.logger = logging.getLogger()
+
+    def add(self, nid: str, low_seqno: int, high_seqno: int):
+        """
+        Catch up with the messages low_seqno to high_seqno (inclusive) of a producer.
+        Ranges reported while a producer is still being caught up with extend it.
+        """
+        producer = self.producers.get(nid)
+        if producer is None:
+            producer = self.producers[nid] = ProducerCatchUp(nid, low_seqno, high_seqno)
+        else:
+            producer.high_seqno = max(producer.high_seqno, high_seqno)
+        if producer.worker is None:
+            producer.worker = aio.ensure_future(self._catch_up(producer))
+
+    async def _catch_up(self, producer: ProducerCatchUp):
+        pending = deque()  # (seqno, fetch task), in seqno order
+        next_fetch = producer.next_seqno
+        try:
+            while pending or next_fetch <= producer.high_seqno:
+                while len(pending) < self.window and next_fetch <= producer.high_seqno:
+                    pending.append((next_fetch, aio.ensure_future(self.fetch(producer.nid, next_fetch, self.retries))))
+                    next_fetch += 1
+                seqno, task = pending.popleft()
+                message_bytes = await task
+                producer.next_seqno = seqno + 1
+                if message_bytes is None:
+                    producer.failed += 1
+                    self.failed += 1
+                    self.logger.warning(f'\nCatch-up: skipped message {seqno} of {producer.nid}')
+                    continue
+                self.apply(producer.nid, seqno, message_bytes)
+                producer.applied += 1
+                self.applied += 1
+        finally:
+            for _, task in pending:
+                task.cancel()
+            del self.producers[producer.nid]
+        duration = max(time.monotonic() - producer.started, 1e-6)
+        self.logger.info(f'\nCatch-up: {producer.nid} caught up to {producer.next_seqno - 1}; '
+                         f'applied={producer.applied}; skipped={producer.failed}; '
+                         f'throughput={producer.applied / duration:0.1f} msg/s')
+
+    def metrics(self) -> Dict:
+        return {
+            'producers': len(self.producers),
+            'outstanding': sum(p.high_seqno - p.next_seqno + 1 for p in self.producers.values()),
+            'applied': self.applied,
+            'skipped': self.failed,
+        }
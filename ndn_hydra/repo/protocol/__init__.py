@@ -6,6 +6,6 @@
 #  @Pip-Library:   https://pypi.org/project/ndn-hydra
 # -------------------------------------------------------------
 
-from .base_models import File, FileList, InsertCommand, DeleteCommand, CommandStatus
+from .base_models import File, FileList, InsertCommand, DeleteCommand, CommandStatus, PacketFormats
 from .status_code import StatusCode
 from .tlv import HydraTlvTypes
\ No newline at end of file
@@ -12,11 +12,17 @@ from ndn.encoding import TlvModel, ModelField, NameField, UintField, RepeatedFie
 from ndn_hydra.repo.protocol.tlv import HydraTlvTypes
 
 
+class PacketFormats:
+    ENCAPSULATED = 0  # the client publishes each repo packet wrapped in a packet under its own prefix
+    DIRECT = 1  # the client publishes the repo packets themselves, reached through a forwarding hint
+
+
 class File(TlvModel):
     file_name = NameField()
     packets = UintField(HydraTlvTypes.PACKETS)
     packet_size = UintField(HydraTlvTypes.PACKET_SIZE)
     size = UintField(HydraTlvTypes.SIZE)
+    packet_format = UintField(HydraTlvTypes.PACKET_FORMAT)
 
 
 class FileList(TlvModel):
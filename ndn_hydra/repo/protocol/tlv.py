@@ -16,4 +16,6 @@ class HydraTlvTypes:
     PACKET_SIZE = 204
     SIZE = 205
     STATUS_CODE = 206
-    CMD_URI= 207
\ No newline at end of file
+    CMD_URI= 207
+    PACKET_FORMAT = 208  # even and above 31: nodes that do not know it skip it
+    BATCHED_MESSAGE = 209
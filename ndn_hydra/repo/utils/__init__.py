@@ -7,4 +7,5 @@
 # -------------------------------------------------------------
 
 from .pubsub import PubSub
-from .concurrent_fetcher import concurrent_fetcher
+from .concurrent_fetcher import concurrent_fetcher, AdaptiveWindow
+from .striped_fetcher import striped_fetcher
@@ -14,16 +14,116 @@
 
 import asyncio as aio
 import logging
+import time
 from ndn.app import NDNApp
 from ndn.types import InterestNack, InterestTimeout
-from ndn.encoding import Name, NonStrictName, Component
+from ndn.encoding import Name, NonStrictName, Component, NackReason
 from tqdm.asyncio import tqdm
-from typing import Optional
+from typing import Optional, Union
+
+
+class AdaptiveWindow:
+    """
+    An AIMD congestion window that can be passed to concurrent_fetcher in place of a semaphore.
+    The window grows by one per data packet in slow start and by 1/cwnd per data packet afterwards,
+    and is halved at most once per round trip on a timeout or a congestion NACK.
+    The retransmission timeout follows RFC 6298 (SRTT + 4 * RTTVAR) and is used as Interest lifetime.
+    """
+
+    def __init__(self, initial_window: float = 4, min_window: float = 1, max_window: float = 128,
+                 initial_rto: int = 4000, min_rto: int = 200, max_rto: int = 16000, max_retries: int = 5):
+        """
+        :param initial_window: number of Interests in flight before the first RTT sample.
+        :param min_window: lower bound of the window.
+        :param max_window: upper bound of the window.
+        :param initial_rto: retransmission timeout (ms) before the first RTT sample.
+        :param min_rto: lower bound of the retransmission timeout (ms).
+        :param max_rto: upper bound of the retransmission timeout (ms).
+        :param max_retries: attempts per segment before the fetch fails.
+        """
+        self.cwnd = float(initial_window)
+        self.ssthresh = float(max_window)
+        self.min_window = float(min_window)
+        self.max_window = float(max_window)
+        self.rto = initial_rto
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        self.max_retries = max_retries
+        self.srtt = None
+        self.rttvar = None
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.changed = aio.Event()
+
+    async def acquire(self) -> bool:
+        while self.in_flight >= int(self.cwnd):
+            self.changed.clear()
+            await self.changed.wait()
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self.changed.set()
+
+    def on_data(self, rtt: float, retransmitted: bool = False):
+        """
+        Grow the window and, unless the Interest was retransmitted (Karn), take an RTT sample.
+        :param rtt: seconds between sending the Interest and receiving the data.
+        :param retransmitted: whether the data answers a retransmitted Interest.
+        """
+        if not retransmitted:
+            rtt *= 1000
+            if self.srtt is None:
+                self.srtt, self.rttvar = rtt, rtt / 2
+            else:
+                self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+                self.srtt = 0.875 * self.srtt + 0.125 * rtt
+            # a retransmitted Interest keeps the backed off timeout until a clean sample comes in
+            self.rto = int(min(max(self.srtt + 4 * self.rttvar, self.min_rto), self.max_rto))
+        if self.cwnd < self.ssthresh:
+            self.cwnd += 1
+        else:
+            self.cwnd += 1 / self.cwnd
+        self.cwnd = min(self.cwnd, self.max_window)
+        self.changed.set()
+
+    def on_timeout(self):
+        """
+        Shrink the window and back off the retransmission timeout.
+        """
+        self._decrease()
+        self.rto = min(self.rto * 2, self.max_rto)
+
+    def on_nack(self, reason: int) -> float:
+        """
+        React to a NACK and return how long (seconds) to wait before retransmitting.
+        :param reason: NackReason of the NACK.
+        """
+        if reason == NackReason.DUPLICATE:
+            # the nonce collided with a looping Interest, a new one can go out right away
+            return 0.0
+        if reason == NackReason.CONGESTION:
+            self._decrease()
+            return (self.srtt if self.srtt is not None else self.min_rto) / 1000
+        # NO_ROUTE or unknown: routes may still be converging
+        return self.rto / 1000
+
+    def _decrease(self):
+        # at most one multiplicative decrease per round trip
+        now = time.monotonic()
+        if now - self.last_decrease < (self.srtt if self.srtt is not None else self.rto) / 1000:
+            return
+        self.last_decrease = now
+        self.ssthresh = max(self.cwnd / 2, self.min_window)
+        self.cwnd = self.ssthresh
 
 
 # An async-generator to fetch data packets concurrently.
 async def concurrent_fetcher(app: NDNApp, name: NonStrictName, file_name: NonStrictName, start_block_id: int,
-                             end_block_id: Optional[int], semaphore: aio.Semaphore, **kwargs):
+                             end_block_id: Optional[int], semaphore: Union[aio.Semaphore, AdaptiveWindow], **kwargs):
+    window = semaphore if isinstance(semaphore, AdaptiveWindow) else None
+    max_trials = window.max_retries if window else 3
     cur_id = start_block_id
     final_id = end_block_id if end_block_id is not None else 0x7fffffff
     is_failed = False
@@ -38,7 +138,7 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, file_name: NonStr
 
     async def _retry(seq: int):
         """
-        Retry 3 times fetching data of the given sequence number or fail.
+        Retry fetching data of the given sequence number up to max_trials times or fail.
         :param seq: block_id of data
         """
         nonlocal app, name, file_name, semaphore, is_failed, received_or_fail, final_id
@@ -50,15 +150,19 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, file_name: NonStr
         trial_times = 0
         while True:
             trial_times += 1
-            if trial_times > 3:
+            if trial_times > max_trials:
                 semaphore.release()
                 is_failed = True
                 received_or_fail.set()
                 return
             try:
                 # logging.info('Express Interest: {}'.format(Name.to_str(int_name)))
+                sent = time.monotonic()
                 data_name, meta_info, content, data_bytes = await app.express_interest(
-                    int_name, need_raw_packet=True, can_be_prefix=False, must_be_fresh=False, lifetime=4000, **kwargs)
+                    int_name, need_raw_packet=True, can_be_prefix=False, must_be_fresh=False,
+                    lifetime=window.rto if window else 4000, **kwargs)
+                if window:
+                    window.on_data(time.monotonic() - sent, retransmitted=trial_times > 1)
 
                 # Save data and update final_id
                 # logging.info('Received data: {}'.format(Name.to_str(data_name)))
@@ -69,8 +173,12 @@ async def concurrent_fetcher(app: NDNApp, name: NonStrictName, file_name: NonStr
                 break
             except InterestNack as e:
                 logging.info(f'\nNacked with reason={e.reason} {Name.to_str(int_name)}')
+                if window:
+                    await aio.sleep(window.on_nack(e.reason))
             except InterestTimeout:
                 logging.info(f'\nTimeout {Name.to_str(int_name)}')
+                if window:
+                    window.on_timeout()
         semaphore.release()
         received_or_fail.set()
 
@@ -0,0 +1,195 @@
+# -------------------------------------------------------------
+# NDN Hydra Striped Segment Fetcher
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+import asyncio as aio
+import logging
+import time
+from collections import deque
+from ndn.app import NDNApp
+from ndn.types import InterestNack, InterestTimeout
+from ndn.encoding import Name, NonStrictName, Component
+from tqdm.asyncio import tqdm
+from typing import Callable, Dict, List, Optional, Set
+from ndn_hydra.repo.utils.concurrent_fetcher import AdaptiveWindow
+
+
+class _Source:
+    """
+    One replica a striped fetch pulls segments from.
+    """
+    __slots__ = ('hint', 'window', 'failures', 'segments', 'bytes', 'last_data', 'alive')
+
+    def __init__(self, hint: List, window: AdaptiveWindow):
+        self.hint = hint
+        self.window = window
+        self.failures = 0  # consecutive failures
+        self.segments = 0
+        self.bytes = 0
+        self.last_data = time.monotonic()
+        self.alive = True
+
+
+# An async-generator to fetch data packets concurrently from several replicas.
+async def striped_fetcher(app: NDNApp, name: NonStrictName, file_name: NonStrictName, start_block_id: int,
+                          end_block_id: Optional[int], forwarding_hints: List[List], initial_window: int = 15,
+                          max_source_failures: int = 5, source_timeout: float = 4.0,
+                          on_source_done: Callable[[int, Optional[float], bool], None] = None, **kwargs):
+    """
+    Segments are handed out one at a time to whichever replica has room in its own congestion window,
+    so faster replicas (higher observed throughput, larger windows) pull proportionally more of the file.
+    A segment that fails at one replica is retried at another, and a replica that fails
+    max_source_failures times in a row without answering anything for source_timeout seconds
+    is dropped (the last replica is never dropped).
+    Data is yielded in order, with the same tuples as concurrent_fetcher.
+    Once the fetch ends, on_source_done (if given) is called with the index of each replica in
+    forwarding_hints, its smoothed RTT in milliseconds (None without a sample), and whether it kept serving
+    (False if it was dropped, or was still failing when the fetch gave up).
+    """
+    sources = [_Source(hint, AdaptiveWindow(initial_window=initial_window)) for hint in forwarding_hints]
+    cur_id = start_block_id
+    final_id = end_block_id if end_block_id is not None else 0x7fffffff
+    max_trials = sources[0].window.max_retries * len(sources) if sources else 0
+    is_failed = not sources
+    is_done = False
+    tasks = []
+    workers = []
+    recv_window = cur_id - 1
+    seq_to_data_packet = dict()  # Buffer for out-of-order delivery
+    retries = deque()  # segments to request again
+    trials: Dict[int, int] = {}
+    failed_at: Dict[int, Set[int]] = {}  # seq -> indexes of sources that failed it
+    received_or_fail = aio.Event()
+    work = aio.Event()
+
+    # Progress bar
+    total_blocks = final_id - start_block_id + 1
+    progress_bar = tqdm(total=total_blocks, desc='Fetching data', unit='block')
+
+    def _alive() -> Set[int]:
+        return {i for i, src in enumerate(sources) if src.alive}
+
+    def _next_seq(idx: int) -> Optional[int]:
+        """
+        Pick the next segment for a source, preferring retries this source has not failed yet.
+        """
+        nonlocal cur_id
+        alive = _alive()
+        for seq in retries:
+            tried = failed_at.get(seq, set())
+            if idx not in tried or alive <= tried:
+                retries.remove(seq)
+                return seq
+        if cur_id <= final_id:
+            cur_id += 1
+            return cur_id - 1
+        return None
+
+    def _on_failure(idx: int, src: _Source, seq: int):
+        nonlocal is_failed
+        src.failures += 1
+        failed_at.setdefault(seq, set()).add(idx)
+        silent = time.monotonic() - src.last_data
+        if src.failures >= max_source_failures and silent >= source_timeout and len(_alive()) > 1:
+            src.alive = False
+            logging.info(f'\nStriped fetch dropped source {src.hint}')
+        if trials[seq] >= max_trials:
+            is_failed = True
+        else:
+            retries.append(seq)
+        work.set()
+
+    async def _fetch(idx: int, src: _Source, seq: int):
+        """
+        Fetch one segment from one source.
+        :param idx: index of the source
+        :param src: the source
+        :param seq: block_id of data
+        """
+        nonlocal final_id
+        int_name = Name.normalize(name) + [Component.from_segment(seq)]
+        key = Name.normalize(file_name) + [Component.from_segment(seq)]
+        trials[seq] = trials.get(seq, 0) + 1
+        try:
+            sent = time.monotonic()
+            data_name, meta_info, content, data_bytes = await app.express_interest(
+                int_name, need_raw_packet=True, can_be_prefix=False, must_be_fresh=False,
+                lifetime=src.window.rto, forwarding_hint=src.hint, **kwargs)
+            src.window.on_data(time.monotonic() - sent, retransmitted=trials[seq] > 1)
+            src.failures = 0
+            src.last_data = time.monotonic()
+            src.segments += 1
+            src.bytes += len(data_bytes)
+            seq_to_data_packet[seq] = (data_name, meta_info, content, data_bytes, key)
+            if meta_info is not None and meta_info.final_block_id is not None:
+                final_id = Component.to_number(meta_info.final_block_id)
+            progress_bar.update()
+        except InterestNack as e:
+            logging.info(f'\nNacked with reason={e.reason} {Name.to_str(int_name)}')
+            await aio.sleep(src.window.on_nack(e.reason))
+            _on_failure(idx, src, seq)
+        except InterestTimeout:
+            logging.info(f'\nTimeout {Name.to_str(int_name)}')
+            src.window.on_timeout()
+            _on_failure(idx, src, seq)
+        src.window.release()
+        received_or_fail.set()
+
+    async def _dispatch_tasks(idx: int, src: _Source):
+        """
+        Dispatch _fetch() tasks for one source as its window allows.
+        """
+        while True:
+            await src.window.acquire()
+            seq = None
+            if not (is_done or is_failed) and src.alive:
+                seq = _next_seq(idx)
+            if seq is None:
+                src.window.release()
+                if is_done or is_failed or not src.alive:
+                    return
+                # wait for a segment to be handed back by another source
+                work.clear()
+                await work.wait()
+                continue
+            tasks.append(aio.get_event_loop().create_task(_fetch(idx, src, seq)))
+
+    start = time.time()
+    for idx, src in enumerate(sources):
+        workers.append(aio.get_event_loop().create_task(_dispatch_tasks(idx, src)))
+    while not is_failed:
+        await received_or_fail.wait()
+        received_or_fail.clear()
+        # Re-assemble bytes in order
+        while recv_window + 1 in seq_to_data_packet:
+            yield seq_to_data_packet[recv_window + 1]
+            del seq_to_data_packet[recv_window + 1]
+            recv_window += 1
+        if recv_window == final_id:
+            break
+    is_done = True
+    work.set()
+    await aio.gather(*tasks)
+    if is_failed:
+        # New data may return during gather(), need to check again
+        while recv_window + 1 in seq_to_data_packet:
+            yield seq_to_data_packet[recv_window + 1]
+            del seq_to_data_packet[recv_window + 1]
+            recv_window += 1
+    for worker in workers:
+        worker.cancel()
+    progress_bar.close()
+
+    duration = max(time.time() - start, 1e-6)
+    for src in sources:
+        logging.info(f'\nStriped fetch source {src.hint}: segments={src.segments}; '
+                     f'throughput={src.bytes / duration / 1000:0.1f} KB/s; alive={src.alive}')
+    if on_source_done is not None:
+        for idx, src in enumerate(sources):
+            on_source_done(idx, src.window.srtt, src.alive and not (is_failed and src.failures > 0))
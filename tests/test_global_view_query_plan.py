@@ -0,0 +1,77 @@
+# -------------------------------------------------------------
+# NDN Hydra Global View Query Plan Tests
+# -------------------------------------------------------------
+#  @Project: NDN Hydra
+#  @Authors: Please check AUTHORS.rst
+#  @Source-Code:   https://github.com/tntech-ngin/ndn-hydra
+#  @Documentation: https://ndn-hydra.readthedocs.io
+#  @Pip-Library:   https://pypi.org/project/ndn-hydra
+# -------------------------------------------------------------
+
+import sqlite3
+import pytest
+from ndn_hydra.repo.modules.global_view import GlobalView
+
+
+@pytest.fixture
+def journaled(tmp_path):
+    """
+    A global view with a few files, and the statements every mutation journals.
+    """
+    global_view = GlobalView(str(tmp_path / 'global_view.db'))
+    for node_name in ('/n0', '/n1', '/n2', '/n3'):
+        global_view.update_node(node_name, 1.0, 0)
+        global_view.renew_node(node_name)
+    for i in range(20):
+        file_name = f'/file{i}'
+        global_view.add_file(file_name, 100, '/n0', '/client', 8000, packets=1, desired_copies=3, expiration_time=0)
+        global_view.set_backups(file_name, [('/n1', 'a'), ('/n2', 'b'), ('/n3', 'c')])
+        global_view.store_file(file_name, '/n0')
+    global_view.flush()
+
+    statements = []
+    put = global_view.journal.put
+
+    def record(entry):
+        for mutation in (entry if isinstance(entry, list) else [entry] if entry is not None else []):
+            statements.extend(mutation)
+        put(entry)
+
+    global_view.journal.put = record
+    global_view.add_pending_store('/file0', '/n3')
+    global_view.store_file('/file1', '/n1')
+    global_view.add_backup('/file2', '/n3', 1, 'd')
+    global_view.update_file('/file3', 10)
+    global_view.delete_file('/file4')
+    global_view.expire_node('/n2')
+    global_view.flush()
+    yield global_view, statements
+    global_view.close()
+
+
+def test_lookups_use_indexes(journaled):
+    global_view, statements = journaled
+    conn = sqlite3.connect(global_view.db)
+    checked = 0
+    for sql, par in statements:
+        if 'WHERE' not in sql:
+            continue
+        par = par[0] if isinstance(par, list) else par
+        plan = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, par)]
+        assert plan, sql
+        for detail in plan:
+            # "SCAN <table>" is a full table scan, "SEARCH <table> USING ..." an index lookup
+            assert not detail.startswith('SCAN'), f'{detail}: {" ".join(sql.split())}'
+        checked += 1
+    conn.close()
+    assert checked >= 10
+
+
+def test_unique_constraints(journaled):
+    global_view, _ = journaled
+    conn = sqlite3.connect(global_view.db)
+    for table in ('stores', 'backups', 'pending_stores'):
+        indexes = [row[1] for row in conn.execute(f'PRAGMA index_list({table})') if row[2]]
+        columns = [[info[2] for info in conn.execute(f'PRAGMA index_info({index})')] for index in indexes]
+        assert ['file_name', 'node_name'] in columns, table
+    conn.close()